@@ -0,0 +1,521 @@
+#!/usr/bin/python
+"""
+Benchmark:
+---------
+
+Offline throughput benchmark. Generates a synthetic ADAM feed of earthquakes,
+cyclones and floods with matching event details, zips and CSVs modelled on
+tests/fixtures/input, serves them together with a stub HDX API from a local
+HTTP server and times parse_feed, parse_eventtypes_feeds, generate_dataset
+and the publish loop separately. The time taken to import run.py is measured
+with python -X importtime. Results are written as JSON.
+
+    python benchmark.py --events 60 --zip-size 5000000 --output bench.json
+
+"""
+import argparse
+import email
+import json
+import logging
+import random
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+from urllib.parse import urlsplit
+from uuid import uuid4
+from zipfile import ZIP_STORED, ZipFile
+
+from hdx.api.configuration import Configuration
+from hdx.api.locations import Locations
+from hdx.data.resource import Resource
+from hdx.data.vocabulary import Vocabulary
+from hdx.location.country import Country
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.retriever import Retrieve
+from hdx.utilities.saver import save_json
+from hdx.utilities.useragent import UserAgent
+from showcase_publisher import ShowcasePublisher
+from wfp import ADAM
+
+logger = logging.getLogger(__name__)
+
+countries = ("ETH", "SOM", "PHL", "IDN", "KEN", "BGD", "MOZ", "HTI")
+tags = (
+    "geodata",
+    "affected population",
+    "earthquake-tsunami",
+    "cyclones-hurricanes-typhoons",
+    "earthquakes",
+    "cyclones",
+    "floods",
+)
+formats = {
+    "geojson": "geojson",
+    "geotiff": "geotiff",
+    "tiff": "geotiff",
+    "geopackage": "geopackage",
+    "gpkg": "geopackage",
+    "txt": "txt",
+    "csv": "csv",
+    "shp": "shp",
+}
+
+
+class SyntheticADAM:
+    """Generates a synthetic ADAM feed and the files it refers to
+
+    Args:
+        folder (str): Folder in which to write files
+        base_url (str): Url from which the files will be served
+        no_events (int): Number of events. Event types are assigned in turn.
+        zip_size (int): Size in bytes of the largest member of each zip
+        csv_rows (int): Number of rows in each population CSV
+        episodes (int): Number of episodes per cyclone. Defaults to 3.
+        seed (int): Random seed. Defaults to 0.
+    """
+
+    def __init__(
+        self, folder, base_url, no_events, zip_size, csv_rows, episodes=3, seed=0
+    ):
+        self.folder = folder
+        self.base_url = base_url
+        self.no_events = no_events
+        self.zip_size = zip_size
+        self.csv_rows = csv_rows
+        self.episodes = episodes
+        self.random = random.Random(seed)
+        self.files = {}
+
+    def add_file(self, urlpath, filename, data):
+        path = join(self.folder, filename)
+        mode = "wb" if isinstance(data, bytes) else "w"
+        with open(path, mode) as output:
+            output.write(data)
+        self.files[urlpath] = path
+        return f"{self.base_url}{urlpath}"
+
+    def add_json(self, urlpath, filename, data):
+        return self.add_file(urlpath, filename, json.dumps(data))
+
+    def add_zip(self, urlpath, filename, members):
+        path = join(self.folder, filename)
+        with ZipFile(path, "w", ZIP_STORED) as zipfile:
+            for name, size in members.items():
+                zipfile.writestr(name, self.random.randbytes(size))
+        self.files[urlpath] = path
+        return f"{self.base_url}{urlpath}"
+
+    def add_csv(self, urlpath, filename, countryiso):
+        rows = [",ADM0_NAME,ADM1_NAME,ADM2_NAME,3_MMI,4_MMI,5_MMI,6_MMI"]
+        for i in range(self.csv_rows):
+            values = ",".join(f"{self.random.random() * 10000:.1f}" for _ in range(4))
+            rows.append(f"{i},{countryiso},Admin1 {i // 10},Admin2 {i},{values}")
+        return self.add_file(urlpath, filename, "\n".join(rows))
+
+    def generate_flood(self, i, countryiso, day):
+        guid = f"FL-202311{day:02d}-{countryiso}-{i:02d}"
+        members = {
+            f"{guid}.json": self.zip_size // 10,
+            f"{guid}.tiff": self.zip_size,
+            f"{guid}.gpkg": self.zip_size // 5,
+            "metadata.txt": 4000,
+        }
+        zip_url = self.add_zip(f"/data/{guid}.zip", f"{guid}.zip", members)
+        properties = {
+            "eventid": guid,
+            "country": countryiso,
+            "iso3": countryiso,
+            "effective_date": f"2023-11-{day:02d}",
+            "flood_area": 576683.0 + i,
+            "population": 320755 + i,
+            "dashboard_url": f"{self.base_url}/data/{guid}.pdf",
+            "analysis_output": zip_url,
+        }
+        details = {"type": "Feature", "properties": properties}
+        url = self.add_json(f"/events/floods/{guid}", f"floods-{guid}.json", details)
+        return [(guid, "Flood", url)]
+
+    def generate_cyclone(self, i, countryiso, day):
+        event_id = 1001000 + i
+        shapefile = self.add_zip(
+            f"/data/{event_id}_shp.zip",
+            f"{event_id}_shp.zip",
+            {"Tracks.shp": self.zip_size, "Tracks.dbf": self.zip_size // 10},
+        )
+        features = []
+        for episode_id in range(1, self.episodes + 1):
+            properties = {
+                "event_id": event_id,
+                "episode_id": episode_id,
+                "iso3": countryiso,
+                "countries": countryiso,
+                "storm_status": "Tropical Storm",
+                "population_impact": 1000 * i,
+                "published_at": f"2023-11-{day:02d}T12:00:00",
+                "from_date": f"2023-11-{day:02d}T00:00:00",
+                "to_date": f"2023-11-{day:02d}T18:00:00",
+                "url": {
+                    "wind": f"{self.base_url}/data/{event_id}_wind.jpg",
+                    "rainfall": f"{self.base_url}/data/{event_id}_rain.jpg",
+                    "shapefile": shapefile,
+                },
+            }
+            features.append({"type": "Feature", "properties": properties})
+        details = {"type": "FeatureCollection", "features": list(reversed(features))}
+        url = self.add_json(
+            f"/events/cyclones/{event_id}", f"cyclones-{event_id}.json", details
+        )
+        return [
+            (f"{event_id}_{episode_id}", "Tropical Storm", url)
+            for episode_id in range(1, self.episodes + 1)
+        ]
+
+    def generate_earthquake(self, i, countryiso, day):
+        event_id = f"eq_bench{i:05d}"
+        csv_url = self.add_csv(
+            f"/data/sm_bench{i:05d}_pop_estimation.csv",
+            f"sm-bench{i:05d}-pop-estimation.csv",
+            countryiso,
+        )
+        properties = {
+            "event_id": event_id,
+            "place": f"Place {i}",
+            "iso3": countryiso,
+            "mag": 6.0 + (i % 10) / 10,
+            "depth": 10.0,
+            "population_impact": 100 * i,
+            "latitude": -6.3878,
+            "longitude": 129.7638,
+            "published_at": f"2023-11-{day:02d}T04:52:52",
+            "url": {
+                "map": f"{self.base_url}/data/{event_id}.jpg",
+                "shakemap": f"{self.base_url}/data/sm_bench{i:05d}.jpg",
+                "population_csv": csv_url,
+            },
+        }
+        details = {"type": "Feature", "properties": properties}
+        url = self.add_json(
+            f"/events/earthquakes/{event_id}", f"earthquakes-{event_id}.json", details
+        )
+        shakemap_url = f"{self.base_url}/events/earthquakes/sm_bench{i:05d}"
+        return [
+            (event_id, "Earthquake", url),
+            (f"sm_bench{i:05d}", "Earthquake (Shake Map)", shakemap_url),
+        ]
+
+    def generate(self):
+        """Generate feed and all files it refers to
+
+        Returns:
+            Dict[str, str]: Mapping from url path to file path
+        """
+        generators = (
+            self.generate_flood,
+            self.generate_cyclone,
+            self.generate_earthquake,
+        )
+        feed = []
+        for i in range(self.no_events):
+            countryiso = countries[i % len(countries)]
+            day = 9 + i % 8
+            generator = generators[i % len(generators)]
+            for guid, event_type, url in generator(i, countryiso, day):
+                feed.append(
+                    {
+                        "title": f"{event_type} in {countryiso}",
+                        "eventType": event_type,
+                        "guid": guid,
+                        "eventISO3": countryiso,
+                        "eventDetails": url,
+                        "pubDate": f"2023-11-{day:02d}T12:00:00",
+                    }
+                )
+        self.add_json("/events/feed", "feed.json", feed)
+        return self.files
+
+
+class StubHDX:
+    """Minimal in-memory stand-in for the CKAN actions used when publishing"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.datasets = {}
+        self.showcases = {}
+        self.calls = {}
+        self.bytes_uploaded = 0
+
+    @staticmethod
+    def parse_multipart(content_type, body):
+        message = email.message_from_bytes(
+            b"Content-Type: " + content_type.encode("ascii") + b"\r\n\r\n" + body
+        )
+        fields = {}
+        files = {}
+        for part in message.get_payload():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                files[name] = len(part.get_payload(decode=True))
+            else:
+                fields[name] = part.get_payload(decode=True).decode("utf-8")
+        return fields, files
+
+    def store_dataset(self, dataset):
+        dataset.setdefault("id", str(uuid4()))
+        dataset["state"] = "active"
+        for resource in dataset.get("resources", []):
+            resource.setdefault("id", str(uuid4()))
+            resource["package_id"] = dataset["id"]
+            if resource.get("url") in (None, "updated_by_file_upload_step"):
+                resource["url"] = f"http://stub/{dataset['id']}/{resource['name']}"
+        self.datasets[dataset["id"]] = dataset
+        self.datasets[dataset["name"]] = dataset
+        return dataset
+
+    def revise(self, fields, files):
+        match = json.loads(fields["match"])
+        update = json.loads(fields.get("update", "{}"))
+        key = match.get("id") or match.get("name")
+        dataset = self.datasets.get(key, {"name": key})
+        dataset.update(update)
+        self.bytes_uploaded += sum(files.values())
+        return {"package": self.store_dataset(dataset)}
+
+    def action(self, name, data):
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            if name == "package_revise":
+                return self.revise(*data)
+            if name in ("package_create", "package_update"):
+                return self.store_dataset(dict(data))
+            if name == "package_show":
+                dataset = self.datasets.get(data.get("id"))
+                return dataset
+            if name == "ckanext_showcase_show":
+                return self.showcases.get(data.get("id"))
+            if name == "ckanext_showcase_create":
+                showcase = dict(data)
+                showcase["id"] = str(uuid4())
+                self.showcases[showcase["name"]] = showcase
+                self.showcases[showcase["id"]] = showcase
+                return showcase
+            if name.endswith("_list"):
+                return []
+            return dict(data) if isinstance(data, dict) else {}
+
+
+def make_handler(files, hdx):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def send_json(self, status, data):
+            body = json.dumps(data).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = urlsplit(self.path).path
+            filepath = files.get(path)
+            if filepath is None:
+                self.send_error(404)
+                return
+            with open(filepath, "rb") as input:
+                body = input.read()
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            path = urlsplit(self.path).path
+            action = path.rsplit("/", 1)[-1]
+            length = int(self.headers.get("Content-Length", 0))
+            body = self.rfile.read(length)
+            content_type = self.headers.get("Content-Type", "")
+            if content_type.startswith("multipart/form-data"):
+                data = StubHDX.parse_multipart(content_type, body)
+            elif body:
+                data = json.loads(body)
+            else:
+                data = {}
+            result = hdx.action(action, data)
+            if result is None:
+                error = {"__type": "Not Found Error", "message": "Not found"}
+                self.send_json(404, {"success": False, "error": error})
+            else:
+                self.send_json(200, {"success": True, "result": result})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def setup_hdx(base_url):
+    Configuration._create(
+        hdx_url=base_url,
+        hdx_key="12345",
+        user_agent="benchmark",
+        project_config_yaml=join("config", "project_configuration.yaml"),
+    )
+    UserAgent.set_global("benchmark")
+    Country.countriesdata(use_live=False)
+    Locations.set_validlocations(
+        [{"name": x.lower(), "title": x.lower()} for x in countries]
+    )
+    Resource.set_formatsdict(formats)
+    Vocabulary._tags_dict = {tag: {"Action to Take": "ok"} for tag in tags}
+    Vocabulary._approved_vocabulary = {
+        "tags": [{"name": tag} for tag in tags],
+        "id": "4e61d464-4943-4e97-973a-84673c1aaa87",
+        "name": "approved",
+    }
+    configuration = Configuration.read()
+    configuration["url"] = f"{base_url}/events/"
+    return configuration
+
+
+def get_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def get_import_time(module="run"):
+    """Get the seconds spent importing a module and the modules it imports
+    in a fresh interpreter as reported by python -X importtime
+
+    Args:
+        module (str): Module to import. Defaults to run.
+
+    Returns:
+        Optional[float]: Cumulative import time in seconds or None if unknown
+    """
+    try:
+        stderr = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stderr
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    # Lines are "import time: self [us] | cumulative | imported package"
+    for line in stderr.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module and fields[2][1] != " ":
+            return int(fields[1]) / 1000000
+    return None
+
+
+def run_benchmark(no_events, zip_size, csv_rows, episodes=3):
+    """Run benchmark returning results dictionary
+
+    Args:
+        no_events (int): Number of synthetic events
+        zip_size (int): Size in bytes of largest zip member
+        csv_rows (int): Number of rows in population CSVs
+        episodes (int): Number of episodes per cyclone. Defaults to 3.
+
+    Returns:
+        Dict: Benchmark results
+    """
+    hdx = StubHDX()
+    files = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(files, hdx))
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    timings = {}
+    try:
+        with temp_dir(
+            "benchmark_wfp_adam", delete_on_success=True, delete_on_failure=True
+        ) as folder:
+            generator = SyntheticADAM(
+                folder, base_url, no_events, zip_size, csv_rows, episodes
+            )
+            files.update(generator.generate())
+            configuration = setup_hdx(base_url)
+            with Download(user_agent="benchmark") as downloader:
+                retriever = Retrieve(downloader, folder, folder, folder, False, False)
+                adam = ADAM(configuration, retriever, parse_date("2023-11-17"), folder)
+                start = time.perf_counter()
+                adam.parse_feed(parse_date("2023-11-01"))
+                timings["parse_feed"] = time.perf_counter() - start
+                start = time.perf_counter()
+                adam.parse_eventtypes_feeds()
+                timings["parse_eventtypes_feeds"] = time.perf_counter() - start
+                events = adam.get_events()
+                generated = []
+                start = time.perf_counter()
+                for event in events:
+                    dataset, showcases = adam.generate_dataset(event)
+                    if not dataset:
+                        continue
+                    dataset.update_from_yaml(join("config", "hdx_dataset_static.yaml"))
+                    generated.append((dataset, showcases))
+                timings["generate_dataset"] = time.perf_counter() - start
+                start = time.perf_counter()
+                # The stub HDX API is not rate limited
+                publisher = ShowcasePublisher(
+                    max_workers=configuration["showcases"]["workers"],
+                    rate=1000,
+                    burst=1000,
+                )
+                for dataset, showcases in generated:
+                    dataset.create_in_hdx(
+                        remove_additional_resources=True,
+                        hxl_update=False,
+                        updated_by_script="benchmark",
+                        batch=str(uuid4()),
+                    )
+                    publisher.add(dataset, showcases)
+                publisher.finish()
+                timings["publish"] = time.perf_counter() - start
+    finally:
+        server.shutdown()
+        server.server_close()
+    total = sum(timings.values())
+    return {
+        "commit": get_commit(),
+        "parameters": {
+            "events": no_events,
+            "zip_size": zip_size,
+            "csv_rows": csv_rows,
+            "episodes": episodes,
+        },
+        "datasets": len(generated),
+        "import_time": get_import_time(),
+        "timings": timings,
+        "total": total,
+        "datasets_per_second": len(generated) / total if total else None,
+        "bytes_uploaded": hdx.bytes_uploaded,
+        "hdx_calls": hdx.calls,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="WFP ADAM scraper benchmark")
+    parser.add_argument("--events", type=int, default=30)
+    parser.add_argument("--zip-size", type=int, default=1000000)
+    parser.add_argument("--csv-rows", type=int, default=1000)
+    parser.add_argument("--episodes", type=int, default=3)
+    parser.add_argument("--output", default=None)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+    results = run_benchmark(args.events, args.zip_size, args.csv_rows, args.episodes)
+    if args.output:
+        save_json(results, args.output, pretty=True)
+    else:
+        print(json.dumps(results, indent=2))
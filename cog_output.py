@@ -0,0 +1,171 @@
+#!/usr/bin/python
+"""
+COG output:
+----------
+
+Converts rasters (read through GDAL, so zip members can be read in place with
+/vsizip/) to Cloud-Optimized GeoTIFFs with internal tiles, compression and
+overviews so that clients can read any part of them with range requests.
+GDAL reads and writes the raster a block at a time and summary statistics are
+computed tile by tile, so memory use does not grow with the size of the
+raster. Requires the optional package rasterio.
+
+"""
+import logging
+from os import remove
+from os.path import exists
+
+logger = logging.getLogger(__name__)
+
+rasterio = None
+
+
+def import_dependencies():
+    """Import the optional dependencies, which are slow to import, the first
+    time they are needed
+
+    Returns:
+        bool: True if the dependencies are available
+    """
+    global rasterio
+    if rasterio is not None:
+        return True
+    try:
+        import rasterio
+        import rasterio.shutil
+    except ImportError:
+        return False
+    return True
+
+
+class COGConverter:
+    """Converts rasters to Cloud-Optimized GeoTIFFs
+
+    Args:
+        enabled (bool): Whether to convert rasters
+        blocksize (int): Width and height of internal tiles in pixels. Defaults to 512.
+        compress (str): Compression method. Defaults to DEFLATE.
+        statistics (bool): Whether to compute summary statistics. Defaults to False.
+    """
+
+    def __init__(self, enabled, blocksize=512, compress="DEFLATE", statistics=False):
+        if enabled and not import_dependencies():
+            logger.warning("rasterio is needed for Cloud-Optimized GeoTIFF output!")
+            enabled = False
+        self.enabled = enabled
+        self.blocksize = blocksize
+        self.compress = compress
+        self.statistics = statistics
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """Create converter from cog_output section of project configuration
+
+        Args:
+            configuration (Configuration): HDX configuration
+
+        Returns:
+            COGConverter: Converter
+        """
+        cog_info = configuration["cog_output"]
+        return cls(
+            cog_info["enabled"],
+            cog_info["blocksize"],
+            cog_info["compress"],
+            cog_info["statistics"],
+        )
+
+    def convert(self, source, path):
+        """Convert source to a Cloud-Optimized GeoTIFF. Errors are logged so
+        that the original raster can be used instead.
+
+        Args:
+            source (str): Path of raster readable by GDAL
+            path (str): Path of output
+
+        Returns:
+            Optional[Dict]: Statistics (empty if not computed) or None if not converted
+        """
+        if not self.enabled:
+            return None
+        try:
+            rasterio.shutil.copy(
+                source,
+                path,
+                driver="COG",
+                BLOCKSIZE=self.blocksize,
+                COMPRESS=self.compress,
+                PREDICTOR="YES",
+                OVERVIEWS="AUTO",
+                BIGTIFF="IF_SAFER",
+                NUM_THREADS="ALL_CPUS",
+            )
+            if not self.statistics:
+                return {}
+            return self.get_statistics(path)
+        except Exception as ex:
+            logger.exception(f"Could not convert {source} to COG: {ex}")
+            if exists(path):
+                remove(path)
+            return None
+
+    @staticmethod
+    def get_statistics(path):
+        """Get summary statistics of the first band of a raster, reading it a
+        tile at a time and ignoring nodata pixels
+
+        Args:
+            path (str): Path of raster
+
+        Returns:
+            Dict: Size, resolution and valid pixel count, minimum, maximum and mean
+        """
+        count = 0
+        total = 0.0
+        minimum = None
+        maximum = None
+        with rasterio.open(path) as dataset:
+            for _, window in dataset.block_windows(1):
+                values = dataset.read(1, window=window, masked=True).compressed()
+                if values.size == 0:
+                    continue
+                count += values.size
+                total += float(values.sum(dtype="float64"))
+                tile_minimum = float(values.min())
+                tile_maximum = float(values.max())
+                if minimum is None or tile_minimum < minimum:
+                    minimum = tile_minimum
+                if maximum is None or tile_maximum > maximum:
+                    maximum = tile_maximum
+            return {
+                "width": dataset.width,
+                "height": dataset.height,
+                "resolution": dataset.res,
+                "crs": dataset.crs.to_string() if dataset.crs else None,
+                "valid_pixels": count,
+                "min": minimum,
+                "max": maximum,
+                "mean": total / count if count else None,
+            }
+
+    @staticmethod
+    def get_description(name, statistics):
+        """Get description of raster statistics for dataset notes
+
+        Args:
+            name (str): Name of raster
+            statistics (Dict): Statistics from get_statistics
+
+        Returns:
+            str: Description
+        """
+        description = (
+            f"{name} is {statistics['width']:,} by {statistics['height']:,} pixels"
+        )
+        if not statistics["valid_pixels"]:
+            return f"{description} with no data."
+        return (
+            f"{description} with {statistics['valid_pixels']:,} valid pixels ranging "
+            f"from {statistics['min']:g} to {statistics['max']:g} "
+            f"(mean {statistics['mean']:.3g})."
+        )
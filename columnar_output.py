@@ -0,0 +1,183 @@
+#!/usr/bin/python
+"""
+Columnar output:
+---------------
+
+Converts vector files (read through GDAL, so zip members can be read in place
+with /vsizip/) to FlatGeobuf with a spatial index and/or GeoParquet with a
+bounding box covering column. Features are converted in batches so memory use
+does not grow with the size of the file. Requires the optional packages
+pyogrio, pyarrow and shapely.
+
+"""
+import json
+import logging
+
+logger = logging.getLogger(__name__)
+
+pa = pq = shapely = open_arrow = write_arrow = None
+
+descriptions = {"flatgeobuf": "FlatGeobuf File", "geoparquet": "GeoParquet File"}
+extensions = {"flatgeobuf": "fgb", "geoparquet": "parquet"}
+
+
+def import_dependencies():
+    """Import the optional dependencies, which are slow to import, the first
+    time they are needed
+
+    Returns:
+        bool: True if the dependencies are available
+    """
+    global pa, pq, shapely, open_arrow, write_arrow
+    if open_arrow is not None:
+        return True
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        import shapely
+        from pyogrio.raw import open_arrow, write_arrow
+    except ImportError:
+        return False
+    return True
+
+
+class ColumnarConverter:
+    """Converts vector files to columnar formats
+
+    Args:
+        formats (List[str]): Formats to output: flatgeobuf and/or geoparquet
+        batch_size (int): Number of features per batch. Defaults to 10000.
+    """
+
+    def __init__(self, formats, batch_size=10000):
+        if formats and not import_dependencies():
+            logger.warning(
+                "pyogrio, pyarrow and shapely are needed for columnar output!"
+            )
+            formats = []
+        for output_format in formats:
+            if output_format not in descriptions:
+                raise ValueError(f"Unknown columnar format {output_format}!")
+        self.formats = formats
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """Create converter from columnar_output section of project
+        configuration
+
+        Args:
+            configuration (Configuration): HDX configuration
+
+        Returns:
+            ColumnarConverter: Converter
+        """
+        columnar_info = configuration["columnar_output"]
+        return cls(columnar_info["formats"], columnar_info["batch_size"])
+
+    def convert(self, source, path_stem):
+        """Convert source to each configured format. Errors are logged and the
+        format skipped.
+
+        Args:
+            source (str): Path of source readable by GDAL
+            path_stem (str): Path of output without extension
+
+        Returns:
+            List[Tuple[str, str]]: (path, description) of output files
+        """
+        outputs = []
+        for output_format in self.formats:
+            path = f"{path_stem}.{extensions[output_format]}"
+            try:
+                if output_format == "flatgeobuf":
+                    self.to_flatgeobuf(source, path)
+                else:
+                    self.to_geoparquet(source, path)
+            except Exception as ex:
+                logger.exception(f"Could not convert {source} to {output_format}: {ex}")
+                continue
+            outputs.append((path, descriptions[output_format]))
+        return outputs
+
+    def to_flatgeobuf(self, source, path):
+        with open_arrow(source, use_pyarrow=True, batch_size=self.batch_size) as (
+            meta,
+            reader,
+        ):
+            write_arrow(
+                reader,
+                path,
+                driver="FlatGeobuf",
+                geometry_name=meta["geometry_name"] or "wkb_geometry",
+                geometry_type=meta["geometry_type"],
+                crs=meta["crs"],
+                layer_options={"SPATIAL_INDEX": "YES"},
+            )
+
+    def to_geoparquet(self, source, path):
+        with open_arrow(source, use_pyarrow=True, batch_size=self.batch_size) as (
+            meta,
+            reader,
+        ):
+            geometry_name = meta["geometry_name"] or "wkb_geometry"
+            field = reader.schema.field(geometry_name)
+            column_info = {
+                "encoding": "WKB",
+                "geometry_types": [],
+                "covering": {
+                    "bbox": {
+                        "xmin": ["bbox", "xmin"],
+                        "ymin": ["bbox", "ymin"],
+                        "xmax": ["bbox", "xmax"],
+                        "ymax": ["bbox", "ymax"],
+                    }
+                },
+            }
+            extension_metadata = (field.metadata or {}).get(b"ARROW:extension:metadata")
+            if extension_metadata:
+                crs = json.loads(extension_metadata).get("crs")
+                if crs:
+                    column_info["crs"] = crs
+            geo = {
+                "version": "1.1.0",
+                "primary_column": "geometry",
+                "columns": {"geometry": column_info},
+            }
+            writer = None
+            try:
+                for batch in reader:
+                    table = self.add_bbox(batch, geometry_name)
+                    if writer is None:
+                        schema = table.schema.with_metadata({"geo": json.dumps(geo)})
+                        writer = pq.ParquetWriter(path, schema, compression="zstd")
+                    # Each batch is a row group whose bbox statistics let
+                    # readers skip row groups outside a bounding box
+                    writer.write_table(table.cast(writer.schema))
+            finally:
+                if writer is not None:
+                    writer.close()
+            if writer is None:
+                raise ValueError(f"{source} has no features!")
+
+    @staticmethod
+    def add_bbox(batch, geometry_name):
+        wkb = batch.column(geometry_name)
+        geometries = shapely.from_wkb(wkb.to_numpy(zero_copy_only=False))
+        bounds = shapely.bounds(geometries)
+        bbox = pa.StructArray.from_arrays(
+            [pa.array(bounds[:, i]) for i in range(4)],
+            names=["xmin", "ymin", "xmax", "ymax"],
+        )
+        columns = []
+        names = []
+        for name, column in zip(batch.schema.names, batch.columns):
+            if name == geometry_name:
+                # Plain binary rather than the geoarrow extension type
+                column = column.cast(pa.binary())
+                name = "geometry"
+            columns.append(column)
+            names.append(name)
+        columns.append(bbox)
+        names.append("bbox")
+        return pa.Table.from_arrays(columns, names=names)
@@ -0,0 +1,133 @@
+#!/usr/bin/python
+"""
+Country index:
+-------------
+
+Index of the country information needed by the scraper: the set of high
+income ISO3 codes excluded from the feed and a mapping from ISO3 code to
+country name. The index is persisted so that runs do not need to load the
+countries data.
+
+"""
+import hashlib
+import json
+import logging
+from datetime import timedelta
+from os.path import exists
+
+from hdx.utilities.dateparse import iso_string_from_datetime, parse_date
+
+logger = logging.getLogger(__name__)
+
+
+class CountryIndex:
+    """Country lookup index
+
+    Args:
+        high_income (Iterable[str]): ISO3 codes of high income countries
+        names (Dict[str, str]): Mapping from ISO3 code to country name
+        source_hash (Optional[str]): Hash of source data. Defaults to None.
+        checked (Optional[datetime]): When source data was last checked. Defaults to None.
+    """
+
+    def __init__(self, high_income, names, source_hash=None, checked=None):
+        self.high_income = frozenset(high_income)
+        self.names = names
+        self.source_hash = source_hash
+        self.checked = checked
+
+    @classmethod
+    def from_countriesdata(cls, checked=None):
+        """Build index from hdx-python-country data
+
+        Args:
+            checked (Optional[datetime]): When source data was read. Defaults to None.
+
+        Returns:
+            CountryIndex: Country index
+        """
+        # Imported here as the countries data is slow to import and only
+        # needed when the index is rebuilt
+        from hdx.location.country import Country
+
+        high_income = []
+        names = {}
+        for countryiso in sorted(Country.countriesdata()["countries"]):
+            countryinfo = Country.get_country_info_from_iso3(countryiso)
+            income_level = countryinfo.get("#indicator+incomelevel") or ""
+            if income_level.lower() == "high":
+                high_income.append(countryiso)
+            names[countryiso] = Country.get_country_name_from_iso3(countryiso)
+        source = json.dumps([high_income, names], sort_keys=True)
+        source_hash = hashlib.sha256(source.encode("utf-8")).hexdigest()
+        return cls(high_income, names, source_hash, checked)
+
+    @classmethod
+    def load_saved(cls, path):
+        """Load index saved to path
+
+        Args:
+            path (str): Path to JSON file holding index
+
+        Returns:
+            Optional[CountryIndex]: Country index or None if there is no file
+        """
+        if not exists(path):
+            return None
+        with open(path, encoding="utf-8") as fp:
+            data = json.load(fp)
+        return cls(
+            data["high_income"],
+            data["names"],
+            data["source_hash"],
+            parse_date(data["checked"]),
+        )
+
+    def is_fresh(self, today, max_age_days):
+        return today - self.checked < timedelta(days=max_age_days)
+
+    @classmethod
+    def load(cls, path, today, max_age_days):
+        """Load index from path if it was checked against the countries data
+        less than max_age_days ago. Otherwise rebuild it from the countries
+        data, saving it to path if the data has changed or the check date
+        needs updating.
+
+        Args:
+            path (str): Path to JSON file holding index
+            today (datetime): Today's date
+            max_age_days (int): Maximum days between checks of countries data
+
+        Returns:
+            CountryIndex: Country index
+        """
+        index = cls.load_saved(path)
+        if index and index.is_fresh(today, max_age_days):
+            return index
+        new_index = cls.from_countriesdata(today)
+        if index and index.source_hash == new_index.source_hash:
+            logger.info("Country data unchanged")
+        else:
+            logger.info("Country data changed, updating country index")
+        new_index.save(path)
+        return new_index
+
+    def save(self, path):
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(
+                {
+                    "source_hash": self.source_hash,
+                    "checked": iso_string_from_datetime(self.checked),
+                    "high_income": sorted(self.high_income),
+                    "names": self.names,
+                },
+                fp,
+                indent=2,
+                sort_keys=True,
+            )
+
+    def is_high_income(self, countryiso):
+        return countryiso in self.high_income
+
+    def get_country_name(self, countryiso):
+        return self.names.get(countryiso)
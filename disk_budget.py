@@ -0,0 +1,114 @@
+#!/usr/bin/python
+"""
+Disk budget:
+-----------
+
+Tracks the bytes that each event's downloaded, extracted and converted files
+take up in the temporary folder of a run and deletes them as soon as the event
+has been published. No new events are built ahead while disk usage is over a
+high water mark, so peak disk usage depends on how many events are in flight
+rather than on how many events there are.
+
+"""
+import logging
+import threading
+from os import remove, rmdir
+from os.path import abspath, dirname, getsize, isfile
+
+logger = logging.getLogger(__name__)
+
+
+class DiskBudget:
+    """Disk budget for files of events under a folder. Files outside the
+    folder, eg. saved data, are never tracked or deleted.
+
+    Args:
+        folder (str): Folder whose files are tracked
+        high_water_mark (int): Bytes above which no events are built ahead. 0 for no limit.
+    """
+
+    def __init__(self, folder, high_water_mark):
+        self.folder = abspath(folder)
+        self.high_water_mark = high_water_mark
+        self.lock = threading.Lock()
+        self.files = {}
+        self.usage = 0
+        self.peak = 0
+        self.bytes_deleted = 0
+
+    @classmethod
+    def from_configuration(cls, configuration, folder):
+        """Create disk budget from disk_budget section of project configuration
+
+        Args:
+            configuration (Configuration): HDX configuration
+            folder (str): Folder whose files are tracked
+
+        Returns:
+            DiskBudget: Disk budget
+        """
+        budget_info = configuration["disk_budget"]
+        return cls(folder, budget_info["high_water_mark_mb"] * 1048576)
+
+    def is_over(self):
+        """Check if disk usage is over the high water mark
+
+        Returns:
+            bool: True if over high water mark
+        """
+        with self.lock:
+            return bool(self.high_water_mark) and self.usage >= self.high_water_mark
+
+    def add(self, event_id, path):
+        """Track a file of an event if it is in the folder
+
+        Args:
+            event_id (str): Event id
+            path (str): Path of file
+
+        Returns:
+            int: Size of file or 0 if not tracked
+        """
+        path = abspath(path)
+        if not path.startswith(f"{self.folder}/") or not isfile(path):
+            return 0
+        size = getsize(path)
+        with self.lock:
+            files = self.files.setdefault(event_id, {})
+            self.usage += size - files.get(path, 0)
+            files[path] = size
+            self.peak = max(self.peak, self.usage)
+        return size
+
+    def release(self, event_id):
+        """Delete the tracked files of an event along with any folders that
+        are left empty
+
+        Args:
+            event_id (str): Event id
+
+        Returns:
+            int: Bytes deleted
+        """
+        with self.lock:
+            files = self.files.pop(event_id, {})
+        deleted = 0
+        folders = set()
+        for path, size in files.items():
+            try:
+                remove(path)
+                deleted += size
+            except FileNotFoundError:
+                pass
+            folders.add(dirname(path))
+        for folder in sorted(folders, reverse=True):
+            while folder.startswith(f"{self.folder}/"):
+                try:
+                    rmdir(folder)
+                except OSError:
+                    break
+                folder = dirname(folder)
+        with self.lock:
+            self.usage -= sum(files.values())
+            self.bytes_deleted += deleted
+        return deleted
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+"""
+Episode:
+-------
+
+Compact record of a feed episode holding only the fields the scraper needs.
+Episode ids are ordered numerically where possible so that eg. episode 10 is
+later than episode 9.
+
+"""
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+
+def episode_order(episode_id: str) -> Tuple[int, int, str]:
+    """Get sort key for episode id ordering numeric ids numerically and
+    before any non-numeric ids, which are ordered as strings
+
+    Args:
+        episode_id (str): Episode id
+
+    Returns:
+        Tuple[int, int, str]: Sort key
+    """
+    if episode_id.isdigit():
+        return 0, int(episode_id), episode_id
+    return 1, 0, episode_id
+
+
+@dataclass(slots=True)
+class Episode:
+    """Feed episode. properties, name, title and description are filled in
+    from the event details.
+    """
+
+    guid: str
+    event_id: str
+    episode_id: Optional[str]
+    event_type: str
+    countryiso: str
+    pub_date: str
+    event_details: str
+    properties: Optional[Dict] = None
+    name: Optional[str] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+
+    def is_later_than(self, other: "Episode") -> bool:
+        """Whether this episode is later than another episode of the same
+        event. An episode without an episode id is never later.
+
+        Args:
+            other (Episode): Other episode
+
+        Returns:
+            bool: True if this episode is later
+        """
+        if self.episode_id is None:
+            return False
+        if other.episode_id is None:
+            return True
+        return episode_order(self.episode_id) > episode_order(other.episode_id)
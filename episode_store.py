@@ -0,0 +1,362 @@
+#!/usr/bin/python
+"""
+Episode store:
+-------------
+
+SQLite store of the state of every feed episode keyed by guid: when it was
+fetched, built and published along with hashes of the event details and of the
+generated dataset. This lets a run process only episodes that have not been
+published, resume after a failure without publishing twice and pick up
+episodes that arrive late. It also holds the last build date. The database
+is a working copy that can be saved to and rebuilt from a JSON snapshot, which
+is what gets committed as it can be diffed.
+
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from os.path import exists, getmtime
+
+from fingerprints import hash_file
+from hdx.utilities.dateparse import iso_string_from_datetime, now_utc, parse_date
+
+logger = logging.getLogger(__name__)
+
+
+def hash_json(data):
+    """Get SHA-256 hash of JSON serialisable data
+
+    Args:
+        data (Any): Data to hash
+
+    Returns:
+        str: Hex digest
+    """
+    data = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def hash_dataset(dataset, fingerprints=None):
+    """Get SHA-256 hash of a dataset's metadata, its resources' metadata and
+    the contents of any files to upload. Digests of files already hashed by
+    the resource fingerprints are reused.
+
+    Args:
+        dataset (Dataset): Dataset to hash
+        fingerprints (Optional[ResourceFingerprints]): Resource fingerprints. Defaults to None.
+
+    Returns:
+        str: Hex digest
+    """
+    resources = []
+    for resource in dataset.get_resources():
+        path = resource.get_file_to_upload()
+        if not path:
+            file_hash = None
+        elif fingerprints:
+            file_hash = fingerprints.get_digest(dataset["name"], resource["name"], path)
+        else:
+            file_hash = hash_file(path)
+        resources.append([resource.data, file_hash])
+    return hash_json([dataset.data, resources])
+
+
+class EpisodeStore:
+    """Persistent store of episode state. Use as a context manager so that the
+    database is closed, and saved to the snapshot if there is one, at the end.
+    The database is rebuilt from the snapshot if it does not exist or is older
+    than the snapshot eg. after a fresh checkout. Episodes published up to a
+    last build date imported from legacy_path were published before the store
+    existed, so they are treated as published.
+
+    Args:
+        path (str): Path of SQLite database
+        legacy_path (Optional[str]): Text file holding last build date to import. Defaults to None.
+        snapshot_path (Optional[str]): JSON file holding snapshot of database. Defaults to None.
+    """
+
+    tables = ("episodes", "meta", "showcases", "failed_showcases")
+
+    def __init__(self, path, legacy_path=None, snapshot_path=None):
+        self.path = path
+        self.snapshot_path = snapshot_path
+        load_snapshot = (
+            snapshot_path
+            and exists(snapshot_path)
+            and (not exists(path) or getmtime(path) < getmtime(snapshot_path))
+        )
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None, timeout=30
+        )
+        self.connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS episodes (
+                guid TEXT PRIMARY KEY,
+                event_id TEXT NOT NULL,
+                episode_id TEXT,
+                pub_date TEXT,
+                status TEXT NOT NULL,
+                details_hash TEXT,
+                dataset_hash TEXT,
+                fetched TEXT,
+                built TEXT,
+                published TEXT
+            );
+            CREATE INDEX IF NOT EXISTS episodes_event_id ON episodes (event_id);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS showcases (name TEXT PRIMARY KEY, hash TEXT);
+            CREATE TABLE IF NOT EXISTS failed_showcases (
+                name TEXT PRIMARY KEY,
+                dataset_id TEXT NOT NULL,
+                dataset_name TEXT NOT NULL,
+                data TEXT NOT NULL
+            );
+            """
+        )
+        if load_snapshot:
+            self.load(snapshot_path)
+        if legacy_path and exists(legacy_path) and self.get_last_build_date() is None:
+            with open(legacy_path, encoding="utf-8") as fp:
+                last_build_date = parse_date(fp.read().strip())
+            logger.info(
+                f"Importing last build date {last_build_date} from {legacy_path}"
+            )
+            self.set_last_build_date(last_build_date)
+            self.execute(
+                "INSERT INTO meta VALUES ('legacy_build_date', ?)",
+                (iso_string_from_datetime(last_build_date),),
+            )
+        rows = self.execute("SELECT value FROM meta WHERE key = 'legacy_build_date'")
+        self.legacy_build_date = parse_date(rows[0][0]) if rows else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def execute(self, sql, parameters=()):
+        with self.lock:
+            return self.connection.execute(sql, parameters).fetchall()
+
+    def load(self, snapshot_path):
+        """Replace the contents of the database with a JSON snapshot
+
+        Args:
+            snapshot_path (str): Path of JSON snapshot
+
+        Returns:
+            None
+        """
+        logger.info(f"Loading episode state from {snapshot_path}")
+        with open(snapshot_path, encoding="utf-8") as fp:
+            snapshot = json.load(fp)
+        with self.lock:
+            with self.connection:
+                self.connection.execute("BEGIN")
+                for table in self.tables:
+                    self.connection.execute(f"DELETE FROM {table}")
+                    for row in snapshot.get(table, []):
+                        columns = ", ".join(row)
+                        placeholders = ", ".join("?" * len(row))
+                        self.connection.execute(
+                            f"INSERT INTO {table} ({columns}) VALUES ({placeholders})",
+                            tuple(row.values()),
+                        )
+
+    def save(self):
+        """Save the database to the JSON snapshot, if there is one, with one
+        object per row ordered by primary key so that changes can be diffed
+
+        Returns:
+            None
+        """
+        if not self.snapshot_path:
+            return
+        snapshot = {}
+        with self.lock:
+            for table in self.tables:
+                cursor = self.connection.execute(f"SELECT * FROM {table} ORDER BY 1")
+                columns = [column[0] for column in cursor.description]
+                snapshot[table] = [dict(zip(columns, row)) for row in cursor]
+        with open(self.snapshot_path, "w", encoding="utf-8") as fp:
+            json.dump(snapshot, fp, indent=2, sort_keys=True)
+
+    def get_last_build_date(self):
+        rows = self.execute("SELECT value FROM meta WHERE key = 'last_build_date'")
+        if not rows:
+            return None
+        return parse_date(rows[0][0])
+
+    def set_last_build_date(self, last_build_date):
+        self.execute(
+            "INSERT OR REPLACE INTO meta VALUES ('last_build_date', ?)",
+            (iso_string_from_datetime(last_build_date),),
+        )
+
+    def get_published(self, event_id):
+        """Get guids and episode ids of the published episodes of an event
+
+        Args:
+            event_id (str): Event id
+
+        Returns:
+            List[Tuple[str, Optional[str]]]: (guid, episode id) of published episodes
+        """
+        return self.execute(
+            "SELECT guid, episode_id FROM episodes "
+            "WHERE event_id = ? AND status = 'published'",
+            (event_id,),
+        )
+
+    def published_by_legacy(self, episode):
+        """Check if an episode was published before the store was created ie.
+        on or before the last build date imported from the legacy file. If so,
+        it is recorded as published.
+
+        Args:
+            episode (Episode): Episode
+
+        Returns:
+            bool: True if the episode was published before the store was created
+        """
+        if self.legacy_build_date is None:
+            return False
+        if parse_date(episode.pub_date) > self.legacy_build_date:
+            return False
+        self.execute(
+            "INSERT INTO episodes (guid, event_id, episode_id, pub_date, status, "
+            "published) VALUES (?, ?, ?, ?, 'published', ?) "
+            "ON CONFLICT (guid) DO NOTHING",
+            (
+                episode.guid,
+                episode.event_id,
+                episode.episode_id,
+                episode.pub_date,
+                iso_string_from_datetime(now_utc()),
+            ),
+        )
+        return True
+
+    def mark_fetched(self, episode, details):
+        """Record that the details of an episode have been fetched. Does
+        nothing if the episode has already been published.
+
+        Args:
+            episode (Episode): Episode
+            details (Dict): Event details
+
+        Returns:
+            None
+        """
+        self.execute(
+            "INSERT INTO episodes (guid, event_id, episode_id, pub_date, status, "
+            "details_hash, fetched) VALUES (?, ?, ?, ?, 'fetched', ?, ?) "
+            "ON CONFLICT (guid) DO UPDATE SET status = 'fetched', "
+            "details_hash = excluded.details_hash, fetched = excluded.fetched "
+            "WHERE status != 'published'",
+            (
+                episode.guid,
+                episode.event_id,
+                episode.episode_id,
+                episode.pub_date,
+                hash_json(details),
+                iso_string_from_datetime(now_utc()),
+            ),
+        )
+
+    def mark_built(self, guid, dataset_hash):
+        """Record that the dataset for an episode has been built
+
+        Args:
+            guid (str): Episode guid
+            dataset_hash (str): Hash of dataset from hash_dataset
+
+        Returns:
+            bool: True if a published episode of the event has the same dataset hash
+        """
+        self.execute(
+            "UPDATE episodes SET status = 'built', dataset_hash = ?, built = ? "
+            "WHERE guid = ? AND status != 'published'",
+            (dataset_hash, iso_string_from_datetime(now_utc()), guid),
+        )
+        rows = self.execute(
+            "SELECT 1 FROM episodes WHERE status = 'published' AND dataset_hash = ? "
+            "AND event_id = (SELECT event_id FROM episodes WHERE guid = ?)",
+            (dataset_hash, guid),
+        )
+        return len(rows) != 0
+
+    def mark_published(self, guid):
+        self.execute(
+            "UPDATE episodes SET status = 'published', published = ? WHERE guid = ?",
+            (iso_string_from_datetime(now_utc()), guid),
+        )
+
+    def get_showcase_hash(self, name):
+        rows = self.execute("SELECT hash FROM showcases WHERE name = ?", (name,))
+        if not rows:
+            return None
+        return rows[0][0]
+
+    def set_showcase_hash(self, name, showcase_hash):
+        self.execute(
+            "INSERT OR REPLACE INTO showcases VALUES (?, ?)", (name, showcase_hash)
+        )
+        self.execute("DELETE FROM failed_showcases WHERE name = ?", (name,))
+
+    def mark_showcase_failed(self, showcase_data, dataset):
+        """Record that publishing a showcase failed so that it is retried in
+        the next run even if its dataset is not published again
+
+        Args:
+            showcase_data (Dict): Showcase metadata
+            dataset (Dataset): Dataset created in HDX to which showcase belongs
+
+        Returns:
+            None
+        """
+        self.execute(
+            "INSERT OR REPLACE INTO failed_showcases VALUES (?, ?, ?, ?)",
+            (
+                showcase_data["name"],
+                dataset["id"],
+                dataset["name"],
+                json.dumps(showcase_data, default=str),
+            ),
+        )
+
+    def get_failed_showcases(self):
+        """Get showcases that failed to publish. They are removed once they
+        have been published and their hash set.
+
+        Returns:
+            List[Tuple[Dict, Dict]]: (showcase metadata, dataset id and name) of failed showcases
+        """
+        rows = self.execute(
+            "SELECT data, dataset_id, dataset_name FROM failed_showcases ORDER BY name"
+        )
+        return [
+            (json.loads(data), {"id": dataset_id, "name": dataset_name})
+            for data, dataset_id, dataset_name in rows
+        ]
+
+    def get_unpublished(self):
+        """Get guids of episodes that were fetched or built but not published
+        eg. because a run failed
+
+        Returns:
+            List[str]: Guids of unpublished episodes
+        """
+        rows = self.execute(
+            "SELECT guid FROM episodes WHERE status != 'published' ORDER BY guid"
+        )
+        return [row[0] for row in rows]
+
+    def close(self):
+        self.save()
+        with self.lock:
+            self.connection.close()
@@ -0,0 +1,198 @@
+#!/usr/bin/python
+"""
+Resource fingerprints:
+---------------------
+
+Stores the SHA-256 hash and size of every file uploaded to HDX keyed by dataset
+name and resource name, so that byte-identical files need not be uploaded
+again.
+
+"""
+import hashlib
+import json
+import logging
+import threading
+from os.path import exists, getsize
+
+logger = logging.getLogger(__name__)
+
+
+def hash_file(path, chunk_size=1048576):
+    """Get SHA-256 hash of file, reading it in chunks
+
+    Args:
+        path (str): Path to file
+        chunk_size (int): Size of chunks to read. Defaults to 1048576.
+
+    Returns:
+        str: Hex digest
+    """
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+class ResourceFingerprints:
+    """Persistent store of fingerprints of uploaded resources. Use as a
+    context manager so that the store is saved at the end.
+
+    Args:
+        path (str): Path of JSON file in which fingerprints are stored
+    """
+
+    def __init__(self, path):
+        self.path = path
+        if exists(path):
+            with open(path, encoding="utf-8") as fp:
+                self.fingerprints = json.load(fp)
+        else:
+            self.fingerprints = {}
+        self.pending = {}
+        self.recorded = set()
+        self.lock = threading.Lock()
+        self.skipped = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.save()
+
+    @staticmethod
+    def get_key(dataset_name, resource_name):
+        return f"{dataset_name}/{resource_name}"
+
+    def check_member(self, dataset_name, resource_name, zipinfo):
+        """Check if a zip member is identical to the file previously uploaded
+        for a resource by comparing the size and CRC from the zip central
+        directory, so that the member need not be extracted. If it is, return
+        the HDX url of the uploaded file.
+
+        Args:
+            dataset_name (str): Dataset name
+            resource_name (str): Resource name
+            zipinfo (ZipInfo): Zip member
+
+        Returns:
+            Optional[str]: HDX url of file if unchanged or None
+        """
+        key = self.get_key(dataset_name, resource_name)
+        with self.lock:
+            fingerprint = self.fingerprints.get(key)
+            if not fingerprint:
+                return None
+            if fingerprint.get("crc") != zipinfo.CRC:
+                return None
+            if fingerprint["size"] != zipinfo.file_size:
+                return None
+            self.skipped += 1
+        logger.info(f"{resource_name} is unchanged, skipping upload")
+        return fingerprint["url"]
+
+    def check(self, dataset_name, resource_name, path, crc=None):
+        """Check if a file is identical to the one previously uploaded for
+        a resource. If it is, return the HDX url of the uploaded file.
+        Otherwise remember its fingerprint so that it can be recorded with
+        record once uploaded.
+
+        Args:
+            dataset_name (str): Dataset name
+            resource_name (str): Resource name
+            path (str): Path to file
+            crc (Optional[int]): CRC of file if it came from a zip. Defaults to None.
+
+        Returns:
+            Optional[str]: HDX url of file if unchanged or None
+        """
+        key = self.get_key(dataset_name, resource_name)
+        size = getsize(path)
+        with self.lock:
+            fingerprint = self.fingerprints.get(key)
+        # Only hash the file if the size has not changed
+        if fingerprint and fingerprint["size"] == size:
+            digest = hash_file(path)
+            if fingerprint["hash"] == digest:
+                with self.lock:
+                    self.skipped += 1
+                logger.info(f"{resource_name} is unchanged, skipping upload")
+                return fingerprint["url"]
+        else:
+            digest = hash_file(path)
+        fingerprint = {"hash": digest, "size": size}
+        if crc is not None:
+            fingerprint["crc"] = crc
+        with self.lock:
+            self.pending[key] = fingerprint
+        return None
+
+    def get_digest(self, dataset_name, resource_name, path):
+        """Get SHA-256 hash of a file to upload for a resource, reusing the
+        hash computed by check if there is one
+
+        Args:
+            dataset_name (str): Dataset name
+            resource_name (str): Resource name
+            path (str): Path to file
+
+        Returns:
+            str: Hex digest
+        """
+        key = self.get_key(dataset_name, resource_name)
+        with self.lock:
+            fingerprint = self.pending.get(key)
+        if fingerprint and fingerprint["size"] == getsize(path):
+            return fingerprint["hash"]
+        return hash_file(path)
+
+    def record(self, dataset):
+        """Record fingerprints of files uploaded for a dataset that has been
+        created or updated in HDX.
+
+        Args:
+            dataset (Dataset): Dataset that has been created in HDX
+
+        Returns:
+            None
+        """
+        dataset_name = dataset["name"]
+        with self.lock:
+            for resource in dataset.get_resources():
+                key = self.get_key(dataset_name, resource["name"])
+                fingerprint = self.pending.pop(key, None)
+                url = resource.get("url")
+                if fingerprint and url:
+                    fingerprint["url"] = url
+                    self.fingerprints[key] = fingerprint
+                    self.recorded.add(key)
+
+    def get_recorded(self):
+        """Get fingerprints recorded since the store was loaded
+
+        Returns:
+            Dict: Fingerprints recorded
+        """
+        with self.lock:
+            return {key: self.fingerprints[key] for key in self.recorded}
+
+    def merge(self, fingerprints):
+        """Merge fingerprints recorded by another process, which are from
+        get_recorded so that only fingerprints of files it uploaded are
+        merged. Processes must record fingerprints of different datasets.
+
+        Args:
+            fingerprints (Dict): Fingerprints recorded by other process
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.fingerprints.update(fingerprints)
+            self.recorded.update(fingerprints)
+
+    def save(self):
+        with self.lock:
+            with open(self.path, "w", encoding="utf-8") as fp:
+                json.dump(self.fingerprints, fp, indent=2, sort_keys=True)
+        logger.info(f"Skipped upload of {self.skipped} unchanged files")
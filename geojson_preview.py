@@ -0,0 +1,611 @@
+#!/usr/bin/python
+"""
+GeoJSON preview:
+---------------
+
+Simplifies GeoJSON to make a small file for the HDX preview. Each line and ring
+is held as a NumPy coordinate array as soon as its geometry has been parsed.
+Simplification preserves topology: lines and rings are cut into arcs at the
+junctions where they meet other lines or rings and each arc is simplified once
+with the Douglas-Peucker algorithm, so boundaries shared by neighbouring
+polygons stay identical and no gaps or overlaps open up between them.
+Coordinates are rounded to a fixed number of decimal places. Rings that vanish
+when rounded are dropped. A polygon that would become invalid, eg. with
+crossing rings or a hole outside its exterior, keeps its arcs unsimplified and
+if that is still invalid, keeps its original coordinates. A polygon too large
+to check within a bounded number of edge comparisons cannot be simplified.
+
+"""
+import json
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def to_arrays(coordinates):
+    """Convert arrays of positions in GeoJSON coordinates to NumPy arrays
+
+    Args:
+        coordinates (List): GeoJSON coordinates
+
+    Returns:
+        Union[List, np.ndarray]: Coordinates with arrays of positions as NumPy arrays
+    """
+    if not coordinates or not isinstance(coordinates[0], list):
+        return coordinates
+    if coordinates[0] and not isinstance(coordinates[0][0], list):
+        return np.asarray(coordinates, dtype=float)
+    return [to_arrays(x) for x in coordinates]
+
+
+def load_geojson(fp):
+    """Read GeoJSON from fp. The coordinates of each geometry are converted
+    to NumPy arrays as soon as the geometry has been parsed so that the
+    coordinates of the file are never all held as lists of floats, which
+    take several times the memory.
+
+    Args:
+        fp (IO): File object to read GeoJSON from
+
+    Returns:
+        Dict: GeoJSON
+    """
+
+    def object_hook(obj):
+        if "type" in obj and "coordinates" in obj:
+            obj["coordinates"] = to_arrays(obj["coordinates"])
+        return obj
+
+    return json.load(fp, object_hook=object_hook)
+
+
+def douglas_peucker(points, tolerance):
+    """Get mask of points to keep when simplifying a line with the
+    Douglas-Peucker algorithm
+
+    Args:
+        points (np.ndarray): Array of shape (n, 2) or more columns
+        tolerance (float): Maximum distance of removed points from simplified line
+
+    Returns:
+        np.ndarray: Boolean mask of points to keep
+    """
+    no_points = len(points)
+    keep = np.zeros(no_points, dtype=bool)
+    keep[0] = keep[-1] = True
+    xs = points[:, 0]
+    ys = points[:, 1]
+    stack = [(0, no_points - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        dx = xs[end] - xs[start]
+        dy = ys[end] - ys[start]
+        segment_xs = xs[start + 1 : end] - xs[start]
+        segment_ys = ys[start + 1 : end] - ys[start]
+        length = np.hypot(dx, dy)
+        if length == 0:
+            # Closed ring so use distance from the end point
+            distances = np.hypot(segment_xs, segment_ys)
+        else:
+            distances = np.abs(dx * segment_ys - dy * segment_xs) / length
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            index += start + 1
+            keep[index] = True
+            stack.append((start, index))
+            stack.append((index, end))
+    return keep
+
+
+def round_points(points, precision):
+    """Round points, removing consecutive duplicate points created by
+    rounding
+
+    Args:
+        points (np.ndarray): Array of points
+        precision (int): Number of decimal places
+
+    Returns:
+        np.ndarray: Rounded points
+    """
+    points = np.round(points, precision)
+    changed = np.any(points[1:] != points[:-1], axis=1)
+    return points[np.concatenate(([True], changed))]
+
+
+def remove_duplicates(points):
+    """Remove consecutive duplicate points
+
+    Args:
+        points (np.ndarray): Array of points
+
+    Returns:
+        np.ndarray: Points without consecutive duplicates
+    """
+    changed = np.any(points[1:] != points[:-1], axis=1)
+    return points[np.concatenate(([True], changed))]
+
+
+def iter_lines(geometry):
+    """Iterate over the lines and rings of a GeoJSON geometry
+
+    Args:
+        geometry (Optional[Dict]): GeoJSON geometry
+
+    Returns:
+        Iterator[Tuple[List, bool]]: (coordinates, whether they are a ring)
+    """
+    if not geometry:
+        return
+    geometry_type = geometry["type"]
+    if geometry_type == "GeometryCollection":
+        for child in geometry["geometries"]:
+            yield from iter_lines(child)
+        return
+    coordinates = geometry["coordinates"]
+    if geometry_type == "LineString":
+        yield coordinates, False
+    elif geometry_type == "MultiLineString":
+        for line in coordinates:
+            yield line, False
+    elif geometry_type == "Polygon":
+        for ring in coordinates:
+            yield ring, True
+    elif geometry_type == "MultiPolygon":
+        for polygon in coordinates:
+            for ring in polygon:
+                yield ring, True
+
+
+def orientation(a, b, c):
+    """Get sign of the turn from a to b to c where each of a, b and c is a
+    point or an array of points
+
+    Returns:
+        np.ndarray: 1 for anticlockwise, -1 for clockwise and 0 for collinear
+    """
+    return np.sign(
+        (b[..., 0] - a[..., 0]) * (c[..., 1] - a[..., 1])
+        - (b[..., 1] - a[..., 1]) * (c[..., 0] - a[..., 0])
+    )
+
+
+def is_inside(point, ring):
+    """Check if a point is inside a ring by ray casting
+
+    Args:
+        point (np.ndarray): Point
+        ring (np.ndarray): Closed ring
+
+    Returns:
+        bool: True if point is inside ring
+    """
+    x, y = point[0], point[1]
+    x1, y1 = ring[:-1, 0], ring[:-1, 1]
+    x2, y2 = ring[1:, 0], ring[1:, 1]
+    crosses = (y1 > y) != (y2 > y)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_intersect = x1 + (y - y1) * (x2 - x1) / (y2 - y1)
+    return bool(np.count_nonzero(crosses & (x < x_intersect)) % 2)
+
+
+def iter_candidates(no_candidates, chunk_size=262144):
+    """Iterate in chunks over pairs of positions i and j where j is one of
+    the no_candidates[i] positions following i
+
+    Args:
+        no_candidates (np.ndarray): Number of following positions to pair with each position
+        chunk_size (int): Approximate number of pairs in each chunk. Defaults to 262144.
+
+    Returns:
+        Iterator[Tuple[np.ndarray, np.ndarray]]: First and second positions of pairs
+    """
+    cumulative = np.cumsum(no_candidates)
+    no_positions = len(no_candidates)
+    first = 0
+    while first < no_positions:
+        done = cumulative[first - 1] if first else 0
+        last = int(np.searchsorted(cumulative, done + chunk_size, side="right"))
+        last = max(last, first + 1)
+        counts = no_candidates[first:last]
+        i = np.repeat(np.arange(first, last), counts)
+        offsets = np.arange(len(i)) - np.repeat(np.cumsum(counts) - counts, counts)
+        yield i, i + 1 + offsets
+        first = last
+
+
+def is_valid_polygon(rings, max_comparisons=None):
+    """Check that a polygon is valid: each ring is closed with at least four
+    positions, no two edges cross or touch other than consecutive edges of a
+    ring and every hole is inside the exterior. Rings touching at a point are
+    treated as invalid. Edges are binned in a grid of cells the size of the
+    median edge and only edges sharing a cell are compared, so the cost grows
+    with the number of edges rather than its square.
+
+    Args:
+        rings (List[np.ndarray]): Exterior followed by holes
+        max_comparisons (Optional[int]): Maximum cells and edge pairs to check. Defaults to None (no limit).
+
+    Returns:
+        Optional[bool]: True if polygon is valid or None if it needs more than max_comparisons
+    """
+    starts = []
+    ends = []
+    ring_ids = []
+    indices = []
+    counts = []
+    for ring_id, ring in enumerate(rings):
+        if len(ring) < 4 or not np.array_equal(ring[0], ring[-1]):
+            return False
+        no_edges = len(ring) - 1
+        starts.append(ring[:-1, :2])
+        ends.append(ring[1:, :2])
+        ring_ids.append(np.full(no_edges, ring_id))
+        indices.append(np.arange(no_edges))
+        counts.append(np.full(no_edges, no_edges))
+    starts = np.concatenate(starts)
+    ends = np.concatenate(ends)
+    ring_ids = np.concatenate(ring_ids)
+    indices = np.concatenate(indices)
+    counts = np.concatenate(counts)
+    lows = np.minimum(starts, ends)
+    highs = np.maximum(starts, ends)
+    origin = lows.min(axis=0)
+    extent = float(np.max(highs.max(axis=0) - origin))
+    # Cells no smaller than needed for 2^20 cells along each axis
+    cell_size = max(float(np.median(np.max(highs - lows, axis=1))), extent / 2**20)
+    if cell_size == 0:
+        cell_size = 1
+    first_cells = np.floor((lows - origin) / cell_size).astype(np.int64)
+    last_cells = np.floor((highs - origin) / cell_size).astype(np.int64)
+    no_cells = last_cells - first_cells + 1
+    no_edge_cells = no_cells[:, 0] * no_cells[:, 1]
+    no_memberships = int(no_edge_cells.sum())
+    exterior = rings[0]
+    no_comparisons = no_memberships + (len(rings) - 1) * len(exterior)
+    if max_comparisons is not None and no_comparisons > max_comparisons:
+        return None
+    # Cells covered by the bounding box of each edge
+    edges = np.repeat(np.arange(len(starts)), no_edge_cells)
+    offsets = np.arange(no_memberships) - np.repeat(
+        np.cumsum(no_edge_cells) - no_edge_cells, no_edge_cells
+    )
+    heights = no_cells[edges, 1]
+    xs = first_cells[edges, 0] + offsets // heights
+    ys = first_cells[edges, 1] + offsets % heights
+    cells = xs * (int(last_cells[:, 1].max()) + 1) + ys
+    order = np.argsort(cells, kind="stable")
+    cells = cells[order]
+    edges = edges[order]
+    # Pair each edge with the edges after it in the same cell
+    stops = np.searchsorted(cells, cells, side="right")
+    no_candidates = stops - np.arange(no_memberships) - 1
+    no_comparisons += int(no_candidates.sum())
+    if max_comparisons is not None and no_comparisons > max_comparisons:
+        return None
+    for i, j in iter_candidates(no_candidates):
+        i = edges[i]
+        j = edges[j]
+        candidates = np.all(lows[j] <= highs[i], axis=1) & np.all(
+            highs[j] >= lows[i], axis=1
+        )
+        # Consecutive edges of a ring share an end point
+        next_edge = (indices[j] == indices[i] + 1) | (indices[i] == indices[j] + 1)
+        last = counts[i] - 1
+        closing_edge = ((indices[i] == 0) & (indices[j] == last)) | (
+            (indices[j] == 0) & (indices[i] == last)
+        )
+        candidates &= ~((ring_ids[j] == ring_ids[i]) & (next_edge | closing_edge))
+        i = i[candidates]
+        j = j[candidates]
+        a, b = starts[i], ends[i]
+        c, d = starts[j], ends[j]
+        side_c = orientation(a, b, c)
+        side_d = orientation(a, b, d)
+        side_a = orientation(c, d, a)
+        side_b = orientation(c, d, b)
+        if np.any((side_c * side_d <= 0) & (side_a * side_b <= 0)):
+            return False
+    return all(is_inside(hole[0], exterior) for hole in rings[1:])
+
+
+def arc_key(arc):
+    """Get key identifying an arc whichever direction it is traversed in.
+    The arc is put in canonical direction, which is the lesser of it and its
+    reverse compared position by position.
+
+    Args:
+        arc (np.ndarray): Points of arc
+
+    Returns:
+        Tuple[Tuple, bool]: (key, whether arc is in canonical direction)
+    """
+    reverse = arc[::-1]
+    differ = np.nonzero(arc != reverse)
+    forward = True
+    if len(differ[0]):
+        i, j = differ[0][0], differ[1][0]
+        forward = bool(arc[i, j] < reverse[i, j])
+    points = arc if forward else reverse
+    return (points.shape, points.tobytes()), forward
+
+
+class GeoJSONSimplifier:
+    """Simplifies GeoJSON geometries preserving topology. Call
+    simplify_geometries with all the geometries of a file so that lines and
+    rings shared between them are simplified in the same way.
+
+    Args:
+        tolerance (float): Simplification tolerance in coordinate units
+        precision (int): Number of decimal places to round coordinates to
+        max_comparisons (Optional[int]): Maximum cells and edge pairs to check for each polygon. Defaults to None (no limit).
+    """
+
+    def __init__(self, tolerance, precision, max_comparisons=None):
+        self.tolerance = tolerance
+        self.precision = precision
+        self.max_comparisons = max_comparisons
+        self.junctions = np.empty((0, 2))
+        self.junction_keys = np.empty(0, dtype=complex)
+        self.arcs = {}
+        self.frozen = set()
+        self.invalid = 0
+        self.positions_in = 0
+        self.positions_out = 0
+
+    def find_junctions(self, geometries):
+        """Find the points where lines and rings meet. A point is a junction
+        if it is the end of a line or if it has different neighbours in
+        different lines or rings.
+
+        Args:
+            geometries (List[Optional[Dict]]): GeoJSON geometries
+
+        Returns:
+            None
+        """
+        neighbours = []
+        junctions = [np.empty((0, 2))]
+        for geometry in geometries:
+            for coordinates, is_ring in iter_lines(geometry):
+                points = np.asarray(coordinates, dtype=float)
+                if len(points) == 0:
+                    continue
+                points = points[:, :2]
+                if is_ring:
+                    points = points[:-1]
+                    previous = np.roll(points, 1, axis=0)
+                    next = np.roll(points, -1, axis=0)
+                else:
+                    junctions.append(points[[0, -1]])
+                    previous = points[:-2]
+                    next = points[2:]
+                    points = points[1:-1]
+                # Order each pair of neighbours so it is the same whichever
+                # direction the line or ring is traversed in
+                swap = (previous[:, 0] > next[:, 0]) | (
+                    (previous[:, 0] == next[:, 0]) & (previous[:, 1] > next[:, 1])
+                )
+                first = np.where(swap[:, None], next, previous)
+                second = np.where(swap[:, None], previous, next)
+                neighbours.append(np.hstack((points, first, second)))
+        if neighbours:
+            # Points with more than one distinct pair of neighbours
+            rows = np.unique(np.concatenate(neighbours), axis=0)
+            same = np.all(rows[1:, :2] == rows[:-1, :2], axis=1)
+            junctions.append(rows[1:, :2][same])
+        self.junctions = np.unique(np.concatenate(junctions), axis=0)
+        self.junction_keys = self.junctions[:, 0] + 1j * self.junctions[:, 1]
+
+    def is_junction(self, points):
+        return np.isin(points[:, 0] + 1j * points[:, 1], self.junction_keys)
+
+    def split_line(self, coordinates):
+        points = np.asarray(coordinates, dtype=float)
+        cuts = np.nonzero(self.is_junction(points[1:-1]))[0] + 1
+        cuts = [0] + cuts.tolist() + [len(points) - 1]
+        return [points[first : last + 1] for first, last in zip(cuts, cuts[1:])]
+
+    def split_ring(self, coordinates):
+        points = np.asarray(coordinates, dtype=float)[:-1]
+        cuts = np.nonzero(self.is_junction(points))[0]
+        if len(cuts):
+            start = int(cuts[0])
+        else:
+            # Start rings without junctions at the same point so that
+            # identical rings eg. an island and a hole are split identically
+            start = int(np.lexsort(points.T[::-1])[0])
+        points = np.concatenate((points[start:], points[: start + 1]))
+        cuts = (cuts - start).tolist() + [len(points) - 1]
+        if cuts[0] != 0:
+            cuts.insert(0, 0)
+        return [points[first : last + 1] for first, last in zip(cuts, cuts[1:])]
+
+    def simplify_arc(self, arc):
+        """Simplify an arc. Each arc is simplified once whichever direction it
+        is traversed in so that lines and rings sharing it stay identical.
+
+        Args:
+            arc (np.ndarray): Points of arc
+
+        Returns:
+            np.ndarray: Simplified and rounded points
+        """
+        key, forward = arc_key(arc)
+        points = self.arcs.get(key)
+        if points is None:
+            points = arc if forward else arc[::-1]
+            if len(points) > 2 and key not in self.frozen:
+                keep = douglas_peucker(points, self.tolerance)
+                if np.array_equal(arc[0], arc[-1]) and np.count_nonzero(keep) < 4:
+                    # Do not collapse the ring, only remove collinear points
+                    keep = douglas_peucker(points, 0)
+                points = points[keep]
+            points = round_points(points, self.precision)
+            self.arcs[key] = points
+        if forward:
+            return points
+        return points[::-1]
+
+    def join_arcs(self, arcs):
+        parts = [self.simplify_arc(arcs[0])]
+        parts.extend(self.simplify_arc(arc)[1:] for arc in arcs[1:])
+        return remove_duplicates(np.concatenate(parts))
+
+    def simplify_line(self, coordinates):
+        self.positions_in += len(coordinates)
+        if len(coordinates) < 2:
+            return None
+        points = self.join_arcs(self.split_line(coordinates))
+        if len(points) < 2:
+            return None
+        self.positions_out += len(points)
+        return points.tolist()
+
+    def join_rings(self, rings_arcs):
+        rings = []
+        for ring_arcs in rings_arcs:
+            points = self.join_arcs(ring_arcs)
+            if len(points) < 4:
+                if not rings:
+                    # Exterior vanished
+                    return None
+                continue
+            rings.append(points)
+        return rings
+
+    def is_valid(self, rings):
+        valid = is_valid_polygon(rings, self.max_comparisons)
+        if valid is None:
+            no_positions = sum(len(ring) for ring in rings)
+            raise ValueError(
+                f"Polygon with {no_positions} positions is too large to check!"
+            )
+        return valid
+
+    def simplify_polygon(self, rings):
+        self.positions_in += sum(len(ring) for ring in rings)
+        rings_arcs = [self.split_ring(ring) for ring in rings]
+        simplified = self.join_rings(rings_arcs)
+        if simplified is not None and not self.is_valid(simplified):
+            # Keep the arcs of the polygon unsimplified, which changes any
+            # other polygons that share them
+            for ring_arcs in rings_arcs:
+                for arc in ring_arcs:
+                    key, _ = arc_key(arc)
+                    self.arcs.pop(key, None)
+                    self.frozen.add(key)
+            simplified = self.join_rings(rings_arcs)
+            if simplified is not None and not self.is_valid(simplified):
+                self.invalid += 1
+                simplified = [np.asarray(ring, dtype=float) for ring in rings]
+        if simplified is None:
+            return None
+        self.positions_out += sum(len(ring) for ring in simplified)
+        return [ring.tolist() for ring in simplified]
+
+    def simplify_geometry(self, geometry):
+        """Simplify GeoJSON geometry
+
+        Args:
+            geometry (Optional[Dict]): GeoJSON geometry
+
+        Returns:
+            Optional[Dict]: Simplified geometry or None if nothing remains
+        """
+        if not geometry:
+            return None
+        geometry_type = geometry["type"]
+        if geometry_type == "GeometryCollection":
+            geometries = map(self.simplify_geometry, geometry["geometries"])
+            geometries = [x for x in geometries if x is not None]
+            if not geometries:
+                return None
+            return {"type": geometry_type, "geometries": geometries}
+        coordinates = geometry["coordinates"]
+        if geometry_type == "Point":
+            coordinates = round_points(np.array([coordinates]), self.precision)
+            coordinates = coordinates[0].tolist()
+        elif geometry_type == "MultiPoint":
+            if not coordinates:
+                return None
+            points = np.asarray(coordinates, dtype=float)
+            coordinates = np.round(points, self.precision).tolist()
+        elif geometry_type == "LineString":
+            coordinates = self.simplify_line(coordinates)
+        elif geometry_type == "MultiLineString":
+            lines = (self.simplify_line(line) for line in coordinates)
+            coordinates = [line for line in lines if line is not None]
+        elif geometry_type == "Polygon":
+            coordinates = self.simplify_polygon(coordinates)
+        elif geometry_type == "MultiPolygon":
+            polygons = (self.simplify_polygon(polygon) for polygon in coordinates)
+            coordinates = [polygon for polygon in polygons if polygon is not None]
+        else:
+            raise ValueError(f"Unknown geometry type {geometry_type}!")
+        if not coordinates:
+            return None
+        return {"type": geometry_type, "coordinates": coordinates}
+
+    def simplify_geometries(self, geometries):
+        """Simplify GeoJSON geometries preserving the topology between them
+
+        Args:
+            geometries (List[Optional[Dict]]): GeoJSON geometries
+
+        Returns:
+            List[Optional[Dict]]: Simplified geometries (None where nothing remains)
+        """
+        self.find_junctions(geometries)
+        while True:
+            # Arcs left unsimplified to keep a polygon valid change the
+            # polygons that share them so simplify again until none are added
+            no_frozen = len(self.frozen)
+            self.invalid = 0
+            self.positions_in = 0
+            self.positions_out = 0
+            simplified = [self.simplify_geometry(x) for x in geometries]
+            if len(self.frozen) == no_frozen:
+                return simplified
+
+    def simplify(self, fp, path):
+        """Simplify GeoJSON read from fp, writing the result to path. Features
+        whose geometries vanish are dropped.
+
+        Args:
+            fp (IO): File object to read GeoJSON from
+            path (str): Path to write simplified GeoJSON to
+
+        Returns:
+            str: path
+        """
+        geojson = load_geojson(fp)
+        if geojson.get("type") == "FeatureCollection":
+            features = geojson["features"]
+            geometries = [feature.get("geometry") for feature in features]
+            simplified = self.simplify_geometries(geometries)
+            geojson["features"] = []
+            for feature, geometry in zip(features, simplified):
+                if geometry is None:
+                    continue
+                feature["geometry"] = geometry
+                geojson["features"].append(feature)
+        elif geojson.get("type") == "Feature":
+            geometries = [geojson.get("geometry")]
+            geojson["geometry"] = self.simplify_geometries(geometries)[0]
+        else:
+            geojson = self.simplify_geometries([geojson])[0]
+        with open(path, "w") as output:
+            json.dump(geojson, output, separators=(",", ":"), default=np.ndarray.tolist)
+        logger.info(
+            f"Simplified {self.positions_in} positions to {self.positions_out} in {path}"
+        )
+        if self.invalid:
+            logger.warning(
+                f"Kept original coordinates of {self.invalid} polygons in {path}"
+            )
+        return path
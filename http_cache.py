@@ -0,0 +1,408 @@
+#!/usr/bin/python
+"""
+HTTP cache:
+----------
+
+Persistent on-disk cache of downloaded files. Files are stored by the SHA-256
+of their content and revalidated with conditional requests using the ETag and
+Last-Modified headers returned when they were downloaded. Entries are evicted
+by age and then least recently used first when the cache exceeds its size.
+Within a run, requests for the same URL share a single download.
+
+"""
+import logging
+import threading
+import time
+from os import link, makedirs, remove, replace
+from os.path import basename, dirname, exists, expanduser, getsize, join
+from shutil import copyfile
+from uuid import uuid4
+
+from fingerprints import hash_file
+from hdx.utilities.base_downloader import DownloadError
+from hdx.utilities.loader import load_json
+from hdx.utilities.retriever import Retrieve
+from hdx.utilities.saver import save_json
+from ranged_download import RangedDownloader
+
+logger = logging.getLogger(__name__)
+
+
+def link_or_copy(source, path):
+    """Hardlink source to path, copying if hardlinks are not possible eg.
+    across file systems.
+
+    Args:
+        source (str): Existing file
+        path (str): Path to create
+
+    Returns:
+        str: path
+    """
+    if exists(path):
+        remove(path)
+    try:
+        link(source, path)
+    except OSError:
+        copyfile(source, path)
+    return path
+
+
+class HTTPCache:
+    """Persistent content-addressed cache of HTTP downloads. Use as a context
+    manager so that the index is saved and statistics logged at the end.
+
+    Args:
+        folder (str): Folder in which to store cache
+        max_size (int): Maximum total size of cached files in bytes
+        max_age (float): Maximum age in seconds since a file was last used
+        ranged_downloader (Optional[RangedDownloader]): Downloader for file bodies. Defaults to None (default RangedDownloader).
+    """
+
+    def __init__(self, folder, max_size, max_age, ranged_downloader=None):
+        self.folder = expanduser(folder)
+        self.blobs_folder = join(self.folder, "blobs")
+        makedirs(self.blobs_folder, exist_ok=True)
+        self.index_path = join(self.folder, "index.json")
+        if exists(self.index_path):
+            self.index = load_json(self.index_path)
+        else:
+            self.index = {}
+        self.max_size = max_size
+        self.max_age = max_age
+        if ranged_downloader is None:
+            ranged_downloader = RangedDownloader()
+        self.ranged_downloader = ranged_downloader
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """Create cache from http_cache section of project configuration
+
+        Args:
+            configuration (Configuration): HDX configuration
+
+        Returns:
+            HTTPCache: Cache
+        """
+        cache_info = configuration["http_cache"]
+        return cls(
+            cache_info["folder"],
+            cache_info["max_size_mb"] * 1024 * 1024,
+            cache_info["max_age_days"] * 86400,
+            RangedDownloader.from_configuration(configuration),
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def blob_path(self, digest):
+        return join(self.blobs_folder, digest)
+
+    def get_entry(self, url):
+        with self.lock:
+            entry = self.index.get(url)
+            if entry and exists(self.blob_path(entry["hash"])):
+                return entry
+            return None
+
+    def download_file(self, downloader, url, path):
+        """Download url to path, reusing the cached copy if the server reports
+        that it has not been modified.
+
+        Args:
+            downloader (Download): Downloader to use
+            url (str): URL to download
+            path (str): Path for downloaded file
+
+        Returns:
+            str: Path of downloaded file
+        """
+        entry = self.get_entry(url)
+        headers = {}
+        if entry:
+            if entry["etag"]:
+                headers["If-None-Match"] = entry["etag"]
+            if entry["last_modified"]:
+                headers["If-Modified-Since"] = entry["last_modified"]
+        response = downloader.setup(url, stream=True, headers=headers)
+        if entry and response.status_code == 304:
+            response.close()
+            with self.lock:
+                entry["accessed"] = time.time()
+                self.hits += 1
+                self.bytes_saved += entry["size"]
+            logger.info(f"Using cached {url}")
+            return link_or_copy(self.blob_path(entry["hash"]), path)
+        temp_path = join(self.folder, f"{uuid4().hex}.part")
+        try:
+            self.ranged_downloader.download(downloader.session, response, temp_path)
+        except Exception as ex:
+            if exists(temp_path):
+                remove(temp_path)
+            if isinstance(ex, DownloadError):
+                raise
+            raise DownloadError(
+                f"Download of {url} failed in retrieval of stream!"
+            ) from ex
+        digest = hash_file(temp_path)
+        size = getsize(temp_path)
+        blob_path = self.blob_path(digest)
+        replace(temp_path, blob_path)
+        now = time.time()
+        with self.lock:
+            self.index[url] = {
+                "hash": digest,
+                "size": size,
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                "stored": now,
+                "accessed": now,
+            }
+            self.misses += 1
+        return link_or_copy(blob_path, path)
+
+    def evict(self):
+        """Remove entries unused for longer than max_age and then the least
+        recently used entries until the cache fits in max_size.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            cutoff = time.time() - self.max_age
+            entries = sorted(self.index.items(), key=lambda x: x[1]["accessed"])
+            sizes = {entry["hash"]: entry["size"] for _, entry in entries}
+            total_size = sum(sizes.values())
+            for url, entry in entries:
+                if entry["accessed"] >= cutoff and total_size <= self.max_size:
+                    break
+                del self.index[url]
+                digest = entry["hash"]
+                if any(x["hash"] == digest for x in self.index.values()):
+                    continue
+                total_size -= entry["size"]
+                blob_path = self.blob_path(digest)
+                if exists(blob_path):
+                    remove(blob_path)
+
+    def merge(self, index, hits=0, misses=0, bytes_saved=0):
+        """Merge index entries and statistics from a cache used in another
+        process. Only the process that merges should close the cache so that
+        the index is saved once.
+
+        Args:
+            index (Dict): Index of other cache
+            hits (int): Hits of other cache. Defaults to 0.
+            misses (int): Misses of other cache. Defaults to 0.
+            bytes_saved (int): Bytes saved by other cache. Defaults to 0.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            for url, entry in index.items():
+                current = self.index.get(url)
+                if current is None or entry["accessed"] > current["accessed"]:
+                    self.index[url] = entry
+            self.hits += hits
+            self.misses += misses
+            self.bytes_saved += bytes_saved
+
+    def save(self):
+        """Evict old entries and save the index.
+
+        Returns:
+            None
+        """
+        self.evict()
+        with self.lock:
+            save_json(self.index, self.index_path)
+
+    def close(self):
+        """Evict old entries, save the index and log statistics.
+
+        Returns:
+            None
+        """
+        self.save()
+        logger.info(
+            f"HTTP cache: {self.hits} hits, {self.misses} misses, {self.bytes_saved} bytes saved"
+        )
+
+
+class SingleFlight:
+    """Deduplication of downloads within a run keyed by URL. The first request
+    for a URL downloads it while concurrent requests for it wait. Those and
+    later requests are given a hardlink to the downloaded file, in a folder of
+    its own if the path requested is the same, so that each requester can
+    delete its file independently. A failed download is shared by the
+    requests waiting for it but later requests try again.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = {}
+        self.copies = 0
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+
+    def download(self, url, path, download):
+        """Download url to path unless it is being or has been downloaded
+
+        Args:
+            url (str): URL to download
+            path (str): Path for downloaded file
+            download (Callable[[str], str]): Function that downloads url to a path
+
+        Returns:
+            str: Path of downloaded file
+        """
+        with self.lock:
+            call = self.calls.get(url)
+            # The file may have been deleted eg. after its event was published
+            owner = call is None or (call["done"].is_set() and not exists(call["path"]))
+            if owner:
+                call = {"done": threading.Event(), "path": None, "error": None}
+                self.calls[url] = call
+        if owner:
+            try:
+                call["path"] = download(path)
+            except Exception as ex:
+                call["error"] = ex
+                with self.lock:
+                    if self.calls.get(url) is call:
+                        del self.calls[url]
+                raise
+            finally:
+                call["done"].set()
+            with self.lock:
+                self.misses += 1
+            return call["path"]
+        call["done"].wait()
+        if call["error"]:
+            raise call["error"]
+        source = call["path"]
+        if path == source:
+            with self.lock:
+                self.copies += 1
+                folder = join(dirname(path), f"copy-{self.copies}")
+            makedirs(folder, exist_ok=True)
+            path = join(folder, basename(path))
+        try:
+            link_or_copy(source, path)
+        except FileNotFoundError:
+            return self.download(url, path, download)
+        size = getsize(path)
+        with self.lock:
+            self.hits += 1
+            self.bytes_saved += size
+        logger.info(f"Reusing download of {url}")
+        return path
+
+
+class CachingRetrieve(Retrieve):
+    """Retrieve that downloads through an HTTPCache and a SingleFlight unless
+    using saved data. Takes the same arguments as Retrieve plus the cache and
+    single flight to use.
+
+    Args:
+        cache (Optional[HTTPCache]): Cache to use. Defaults to None (no cache).
+        single_flight (Optional[SingleFlight]): Single flight to use. Defaults to None (no deduplication).
+    """
+
+    def __init__(self, *args, cache=None, single_flight=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.single_flight = single_flight
+
+    def clone(self, downloader):
+        return CachingRetrieve(
+            downloader,
+            fallback_dir=self.fallback_dir,
+            saved_dir=self.saved_dir,
+            temp_dir=self.temp_dir,
+            save=self.save,
+            use_saved=self.use_saved,
+            prefix=self.prefix,
+            delete=False,
+            log_level=self.log_level,
+            cache=self.cache,
+            single_flight=self.single_flight,
+        )
+
+    def download_file(
+        self,
+        url,
+        filename=None,
+        logstr=None,
+        fallback=False,
+        log_level=None,
+        **kwargs,
+    ):
+        if (
+            self.use_saved
+            or (self.cache is None and self.single_flight is None)
+            or kwargs
+        ):
+            return super().download_file(
+                url, filename, logstr, fallback, log_level, **kwargs
+            )
+        if log_level is None:
+            log_level = self.log_level
+        filename, _ = self.get_filename(url, filename)
+        if self.save:
+            folder = self.saved_dir
+        else:
+            folder = self.temp_dir
+        output_path = join(folder, filename)
+
+        def download(path):
+            if self.cache is None:
+                return self.downloader.download_file(url, path=path)
+            return self.cache.download_file(self.downloader, url, path)
+
+        try:
+            logger.log(
+                log_level,
+                f"Downloading {logstr or filename} from {self.get_url_logstr(url)} into {output_path}",
+            )
+            if self.single_flight is None:
+                return download(output_path)
+            return self.single_flight.download(url, output_path, download)
+        except DownloadError:
+            if not fallback:
+                raise
+            fallback_path = join(self.fallback_dir, filename)
+            logger.exception(
+                f"{logstr or filename} download failed, using static data {fallback_path}!"
+            )
+            return fallback_path
+
+    def download_json(
+        self,
+        url,
+        filename=None,
+        logstr=None,
+        fallback=False,
+        log_level=None,
+        **kwargs,
+    ):
+        if (
+            self.use_saved
+            or (self.cache is None and self.single_flight is None)
+            or kwargs
+        ):
+            return super().download_json(
+                url, filename, logstr, fallback, log_level, **kwargs
+            )
+        filename, _ = self.get_filename(url, filename, ("json",), file_prefix="")
+        path = self.download_file(url, filename, logstr, fallback, log_level)
+        return load_json(path)
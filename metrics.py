@@ -0,0 +1,232 @@
+#!/usr/bin/python
+"""
+Metrics:
+-------
+
+Records timing spans per stage and event along with I/O counters (bytes
+downloaded and uploaded, retries) and produces a JSON report of the run. Spans
+can also be exported as OpenTelemetry-style JSON lines.
+
+"""
+import json
+import logging
+import math
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+from hdx.utilities.saver import save_json
+
+logger = logging.getLogger(__name__)
+
+
+def percentile(values, fraction):
+    """Get percentile of values using the nearest rank method
+
+    Args:
+        values (List[float]): Sorted values
+        fraction (float): Percentile as fraction eg. 0.95
+
+    Returns:
+        float: Percentile
+    """
+    index = max(math.ceil(fraction * len(values)) - 1, 0)
+    return values[index]
+
+
+class Metrics:
+    """Collects spans and counters for a run. Safe to use from multiple
+    threads.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread_local = threading.local()
+        self.trace_id = secrets.token_hex(16)
+        self.start_time = time.time()
+        self.spans = []
+        self.counters = {}
+        self.response_hook = None
+
+    def add(self, counter, value=1):
+        """Add value to counter
+
+        Args:
+            counter (str): Counter name eg. bytes_downloaded
+            value (int): Value to add. Defaults to 1.
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def merge(self, spans, counters):
+        """Add spans and counters recorded by another Metrics eg. in a worker
+        process
+
+        Args:
+            spans (List[Dict]): Spans to add
+            counters (Dict[str, int]): Counters to add
+
+        Returns:
+            None
+        """
+        with self.lock:
+            self.spans.extend(spans)
+            for counter, value in counters.items():
+                self.counters[counter] = self.counters.get(counter, 0) + value
+
+    @contextmanager
+    def span(self, name, event_id=None, **attributes):
+        """Context manager timing a span of work. Spans opened inside another
+        span on the same thread are recorded as its children.
+
+        Args:
+            name (str): Stage name
+            event_id (Optional[str]): Event the work is for. Defaults to None.
+            **attributes: Any other attributes to record
+
+        Returns:
+            Dict: Span dictionary
+        """
+        stack = getattr(self.thread_local, "stack", None)
+        if stack is None:
+            stack = self.thread_local.stack = []
+        span = {
+            "name": name,
+            "span_id": secrets.token_hex(8),
+            "parent_span_id": stack[-1]["span_id"] if stack else None,
+            "event_id": event_id,
+            "attributes": attributes,
+            "thread": threading.current_thread().name,
+            "start": time.time(),
+        }
+        stack.append(span)
+        start = time.perf_counter()
+        try:
+            yield span
+        except Exception as ex:
+            span["error"] = repr(ex)
+            raise
+        finally:
+            span["duration"] = time.perf_counter() - start
+            stack.pop()
+            with self.lock:
+                self.spans.append(span)
+
+    def install(self, session):
+        """Add a hook to a requests session counting bytes downloaded (from
+        the Content-Length header) and retries made by urllib3
+
+        Args:
+            session (requests.Session): Session to instrument
+
+        Returns:
+            None
+        """
+
+        def response_hook(response, *args, **kwargs):
+            self.add("requests")
+            length = response.headers.get("Content-Length")
+            if length and length.isdigit():
+                self.add("bytes_downloaded", int(length))
+            retries = getattr(response.raw, "retries", None)
+            if retries and retries.history:
+                self.add("retries", len(retries.history))
+
+        self.response_hook = response_hook
+        session.hooks["response"].append(response_hook)
+
+    def uninstall(self, session):
+        """Remove the hook added by install from a requests session
+
+        Args:
+            session (requests.Session): Session to stop instrumenting
+
+        Returns:
+            None
+        """
+        hooks = session.hooks["response"]
+        if self.response_hook in hooks:
+            hooks.remove(self.response_hook)
+
+    def report(self, no_slowest=10):
+        """Generate report with count, total, p50, p95 and max duration per
+        stage, the slowest events and counters
+
+        Args:
+            no_slowest (int): Number of slowest events to include. Defaults to 10.
+
+        Returns:
+            Dict: Report
+        """
+        with self.lock:
+            spans = list(self.spans)
+            counters = dict(self.counters)
+        durations = {}
+        events = {}
+        for span in spans:
+            durations.setdefault(span["name"], []).append(span["duration"])
+            event_id = span["event_id"]
+            if event_id is None:
+                continue
+            event = events.setdefault(event_id, {"event_id": event_id, "total": 0})
+            event[span["name"]] = event.get(span["name"], 0) + span["duration"]
+            # Child spans eg. downloads are already included in their parent
+            if not span["parent_span_id"]:
+                event["total"] += span["duration"]
+        stages = {}
+        for name, values in durations.items():
+            values = sorted(values)
+            stages[name] = {
+                "count": len(values),
+                "total": sum(values),
+                "p50": percentile(values, 0.5),
+                "p95": percentile(values, 0.95),
+                "max": values[-1],
+            }
+        slowest = sorted(events.values(), key=lambda x: x["total"], reverse=True)
+        return {
+            "wall_time": time.time() - self.start_time,
+            "stages": stages,
+            "slowest_events": slowest[:no_slowest],
+            "counters": counters,
+        }
+
+    def save_report(self, path, extra=None):
+        report = self.report()
+        if extra:
+            report.update(extra)
+        save_json(report, path, pretty=True)
+        logger.info(f"Metrics report saved to {path}")
+        return report
+
+    def export_spans(self, path):
+        """Export spans as OpenTelemetry-style JSON lines
+
+        Args:
+            path (str): Path of file to write
+
+        Returns:
+            None
+        """
+        with self.lock:
+            spans = list(self.spans)
+        with open(path, "w") as output:
+            for span in sorted(spans, key=lambda x: x["start"]):
+                attributes = {"thread": span["thread"], **span["attributes"]}
+                if span["event_id"] is not None:
+                    attributes["event_id"] = span["event_id"]
+                otel_span = {
+                    "traceId": self.trace_id,
+                    "spanId": span["span_id"],
+                    "parentSpanId": span["parent_span_id"] or "",
+                    "name": span["name"],
+                    "startTimeUnixNano": int(span["start"] * 1e9),
+                    "endTimeUnixNano": int((span["start"] + span["duration"]) * 1e9),
+                    "attributes": attributes,
+                    "status": {"code": "ERROR" if "error" in span else "OK"},
+                }
+                output.write(f"{json.dumps(otel_span)}\n")
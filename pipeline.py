@@ -0,0 +1,55 @@
+#!/usr/bin/python
+"""
+Pipeline:
+--------
+
+Builds datasets on worker threads ahead of the publishing loop.
+
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+
+def pipelined(info, events, key, build, max_workers=1, max_inflight=1, throttle=None):
+    """Iterate over events through progress_storing_folder, running build on
+    each event in a pool of worker threads ahead of the caller. At most
+    max_inflight events are being built or are waiting to be consumed at any
+    time, so workers block (backpressure) when the caller falls behind.
+    Results are yielded strictly in event order and progress is only stored
+    when an event is yielded, so a crash resumes at the first event that was
+    not consumed. While throttle returns True, no events are submitted ahead
+    of the event about to be yielded.
+
+    Args:
+        info (Dict): Dictionary from wheretostart_tempdir_batch
+        events (List[Dict]): Events to process
+        key (str): Key identifying an event, used for storing progress
+        build (Callable[[Dict], Any]): Function to run on each event
+        max_workers (int): Number of build worker threads. Defaults to 1.
+        max_inflight (int): Maximum events built ahead. Defaults to 1.
+        throttle (Optional[Callable[[], bool]]): Function returning True to stop building ahead. Defaults to None.
+
+    Returns:
+        Iterator[Tuple[Dict, Dict, Any]]: (info, event, build result)
+    """
+    # Imported here as hdx.utilities.path is slow to import
+    from hdx.utilities.path import progress_storing_folder
+
+    positions = {event[key]: i for i, event in enumerate(events)}
+    max_inflight = max(max_inflight, 1)
+    futures = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        try:
+            for info, event in progress_storing_folder(info, events, key):
+                index = positions[event[key]]
+                for ahead in events[index : index + max_inflight]:
+                    if ahead is not event and throttle and throttle():
+                        break
+                    if ahead[key] not in futures:
+                        futures[ahead[key]] = executor.submit(build, ahead)
+                yield info, event, futures.pop(event[key]).result()
+        finally:
+            for future in futures.values():
+                future.cancel()
@@ -0,0 +1,163 @@
+#!/usr/bin/python
+"""
+Population summary:
+------------------
+
+Summarises the population estimation CSV of an earthquake in a single pass,
+reading it in chunks of rows which are converted to NumPy arrays so that
+memory use does not grow with the size of the file. Totals are kept for each
+shaking intensity (MMI) column and for each admin 1 area.
+
+"""
+import csv
+import logging
+import re
+from itertools import islice
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+intensity_regex = re.compile(r"^(\d+)_MMI$")
+admin_headers = ("ADM0_NAME", "ADM1_NAME")
+admin_hxltags = {"ADM0_NAME": "#country+name", "ADM1_NAME": "#adm1+name"}
+
+
+class PopulationSummary:
+    """Population totals by intensity and admin area
+
+    Args:
+        admin_headers (List[str]): Headers of admin name columns to group by
+        intensity_headers (List[str]): Headers of intensity columns
+    """
+
+    def __init__(self, admin_headers, intensity_headers):
+        self.admin_headers = admin_headers
+        self.intensity_headers = intensity_headers
+        self.intensities = [
+            int(intensity_regex.match(x).group(1)) for x in intensity_headers
+        ]
+        self.rows = 0
+        self.totals = np.zeros(len(intensity_headers))
+        self.admin_totals = {}
+
+    @classmethod
+    def read(cls, path, chunk_size=10000):
+        """Summarise population estimation CSV
+
+        Args:
+            path (str): Path to population estimation CSV
+            chunk_size (int): Number of rows to convert at a time. Defaults to 10000.
+
+        Returns:
+            Optional[PopulationSummary]: Summary or None if CSV has no intensity columns
+
+        Raises:
+            ValueError: If CSV cannot be parsed
+        """
+        with open(path, newline="", encoding="utf-8") as fp:
+            reader = csv.reader(fp)
+            headers = next(reader, [])
+            intensity_indices = [
+                i for i, header in enumerate(headers) if intensity_regex.match(header)
+            ]
+            if not intensity_indices:
+                logger.warning(f"{path} has no intensity columns to summarise!")
+                return None
+            admin_indices = [headers.index(x) for x in admin_headers if x in headers]
+            summary = cls(
+                [headers[i] for i in admin_indices],
+                [headers[i] for i in intensity_indices],
+            )
+            try:
+                while True:
+                    rows = list(islice(reader, chunk_size))
+                    if not rows:
+                        break
+                    table = np.array(rows, dtype=object)
+                    summary.add(table[:, admin_indices], table[:, intensity_indices])
+            except (csv.Error, IndexError) as ex:
+                # Rows of differing lengths give a 1d array that cannot be indexed
+                raise ValueError(f"Could not summarise {path}: {ex}") from ex
+        return summary
+
+    def add(self, admins, values):
+        """Add a chunk of rows to the totals
+
+        Args:
+            admins (np.ndarray): Admin names of shape (rows, admin columns)
+            values (np.ndarray): Population values of shape (rows, intensity columns)
+
+        Returns:
+            None
+        """
+        values = np.where(values == "", "0", values).astype(float)
+        self.rows += len(values)
+        self.totals += values.sum(axis=0)
+        if not self.admin_headers:
+            return
+        keys, inverse = np.unique(admins.astype(str), axis=0, return_inverse=True)
+        key_totals = np.zeros((len(keys), len(self.intensity_headers)))
+        np.add.at(key_totals, inverse.reshape(-1), values)
+        for key, totals in zip(keys, key_totals):
+            key = tuple(key)
+            admin_totals = self.admin_totals.get(key)
+            if admin_totals is None:
+                self.admin_totals[key] = totals
+            else:
+                admin_totals += totals
+
+    def get_total(self):
+        return round(self.totals.sum())
+
+    def get_description(self, no_areas=3):
+        """Get description of headline numbers for dataset notes
+
+        Args:
+            no_areas (int): Number of most exposed admin areas to list. Defaults to 3.
+
+        Returns:
+            str: Description
+        """
+        intensities = ", ".join(
+            f"MMI {intensity}: {round(total):,}"
+            for intensity, total in zip(self.intensities, self.totals)
+        )
+        description = f"Estimated population exposed by intensity is {intensities} (total {self.get_total():,})."
+        areas = sorted(
+            self.admin_totals.items(), key=lambda x: x[1].sum(), reverse=True
+        )
+        areas = [
+            f"{', '.join(reversed(key))} ({round(totals.sum()):,})"
+            for key, totals in areas[:no_areas]
+            if totals.sum() > 0
+        ]
+        if areas:
+            description = f"{description} Most exposed areas are {'; '.join(areas)}."
+        return description
+
+    def save(self, path):
+        """Save totals by admin area as HXL tagged CSV suitable for
+        QuickCharts
+
+        Args:
+            path (str): Path to save CSV to
+
+        Returns:
+            str: path
+        """
+        hxltags = [admin_hxltags[x] for x in self.admin_headers]
+        hxltags.extend(f"#affected+mmi_{x}" for x in self.intensities)
+        hxltags.append("#affected+total")
+        with open(path, "w", newline="", encoding="utf-8") as fp:
+            writer = csv.writer(fp)
+            writer.writerow(
+                list(self.admin_headers) + self.intensity_headers + ["Total"]
+            )
+            writer.writerow(hxltags)
+            for key in sorted(self.admin_totals):
+                totals = self.admin_totals[key]
+                writer.writerow(
+                    list(key) + [round(x) for x in totals] + [round(totals.sum())]
+                )
+        return path
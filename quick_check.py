@@ -0,0 +1,114 @@
+#!/usr/bin/python
+"""
+Quick check:
+-----------
+
+Checks the feed for new episodes without initialising the HDX publishing
+machinery, whose imports take most of the start up time of a run. The project
+configuration is read from a snapshot that is rebuilt whenever the YAML file
+changes and the feed is streamed with a plain requests session.
+
+"""
+import hashlib
+import logging
+import pickle
+from datetime import timedelta
+from os import makedirs, replace
+from os.path import dirname, exists
+
+import ijson
+from wfp import ADAM
+
+logger = logging.getLogger(__name__)
+
+
+def load_project_configuration(path, snapshot_path):
+    """Load project configuration from snapshot if the YAML file it was made
+    from is unchanged. Otherwise parse the YAML file and save a new snapshot.
+
+    Args:
+        path (str): Path of project configuration YAML file
+        snapshot_path (str): Path of snapshot
+
+    Returns:
+        Dict: Project configuration
+    """
+    with open(path, "rb") as fp:
+        contents = fp.read()
+    source_hash = hashlib.sha256(contents).hexdigest()
+    if exists(snapshot_path):
+        try:
+            with open(snapshot_path, "rb") as fp:
+                snapshot = pickle.load(fp)
+            if snapshot["source_hash"] == source_hash:
+                return snapshot["configuration"]
+        except (OSError, pickle.UnpicklingError, EOFError, KeyError) as ex:
+            logger.warning(f"Ignoring unreadable snapshot {snapshot_path}: {ex}")
+    from ruamel.yaml import YAML
+
+    configuration = YAML(typ="safe").load(contents)
+    folder = dirname(snapshot_path)
+    if folder:
+        makedirs(folder, exist_ok=True)
+    temp_path = f"{snapshot_path}.tmp"
+    with open(temp_path, "wb") as fp:
+        pickle.dump({"source_hash": source_hash, "configuration": configuration}, fp)
+    replace(temp_path, snapshot_path)
+    logger.info(f"Project configuration snapshot saved to {snapshot_path}")
+    return configuration
+
+
+def has_unfinished_work(store):
+    """Check whether a previous run left work that only a full run retries:
+    showcases that failed to publish or episodes that were fetched or built but
+    not published.
+
+    Args:
+        store (EpisodeStore): Episode store
+
+    Returns:
+        bool: True if there are failed showcases or unpublished episodes
+    """
+    failed_showcases = store.get_failed_showcases()
+    if failed_showcases:
+        logger.info(f"{len(failed_showcases)} failed showcases to retry")
+        return True
+    unpublished = store.get_unpublished()
+    if unpublished:
+        logger.info(f"{len(unpublished)} unpublished episodes to retry")
+        return True
+    return False
+
+
+def count_new_episodes(configuration, store, country_index, today, user_agent):
+    """Count events in the feed since the last build date whose latest episode
+    has not been published. The feed is read with the same lookback and the
+    same rules as a full run.
+
+    Args:
+        configuration (Dict): Project configuration
+        store (EpisodeStore): Episode store
+        country_index (CountryIndex): Country index
+        today (datetime): Today's date
+        user_agent (str): User agent to send
+
+    Returns:
+        int: Number of events with new episodes
+    """
+    import requests
+
+    adam = ADAM(
+        configuration, None, today, None, country_index=country_index, store=store
+    )
+    lookback = timedelta(days=configuration["feed_lookback_days"])
+    previous_build_date = store.get_last_build_date() - lookback
+    url = adam.get_feed_url(previous_build_date.date().isoformat(), adam.today)
+    with requests.get(
+        url, headers={"User-Agent": user_agent}, stream=True, timeout=60
+    ) as response:
+        response.raise_for_status()
+        response.raw.decode_content = True
+        items = ijson.items(response.raw, "item", use_float=True)
+        adam.add_feed_items(items, previous_build_date)
+    adam.drop_published()
+    return len(adam.latest_episodes)
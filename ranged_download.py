@@ -0,0 +1,255 @@
+#!/usr/bin/python
+"""
+Ranged download:
+---------------
+
+Downloads files so that a dropped connection does not restart the download:
+the download resumes from the partial file with an HTTP Range request. Large
+files are downloaded in parallel byte ranges. The size of the result is
+checked against Content-Length and zip files are checked against the CRCs in
+their central directory.
+
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from os.path import getsize
+from zipfile import BadZipFile, ZipFile, is_zipfile
+
+from hdx.utilities.base_downloader import DownloadError
+from requests.exceptions import RequestException
+from urllib3.exceptions import HTTPError
+
+logger = logging.getLogger(__name__)
+
+# Errors raised when a connection drops part way through a response
+connection_errors = (RequestException, HTTPError, ConnectionError)
+
+
+def verify_zip(path):
+    """Check that every member of a zip file matches the CRC in its central
+    directory
+
+    Args:
+        path (str): Path to zip file
+
+    Returns:
+        None
+    """
+    try:
+        with ZipFile(path) as zipfile:
+            bad_member = zipfile.testzip()
+    except BadZipFile as ex:
+        raise DownloadError(f"{path} is not a valid zip file!") from ex
+    if bad_member:
+        raise DownloadError(f"{bad_member} in {path} failed CRC check!")
+
+
+class RangedDownloader:
+    """Downloads with resume on dropped connections and parallel byte ranges
+    for large files.
+
+    Args:
+        max_retries (int): Maximum resumes per file or part. Defaults to 5.
+        part_size (int): Size in bytes of parallel parts. Defaults to 33554432.
+        max_parts (int): Maximum parts downloaded at once. Defaults to 4.
+        parallel_min_size (int): Minimum file size for parallel parts. Defaults to 67108864.
+        chunk_size (int): Size of chunks to read. Defaults to 65536.
+        backoff (float): Seconds to wait before first resume, doubling each time. Defaults to 0.5.
+    """
+
+    def __init__(
+        self,
+        max_retries=5,
+        part_size=33554432,
+        max_parts=4,
+        parallel_min_size=67108864,
+        chunk_size=65536,
+        backoff=0.5,
+    ):
+        self.max_retries = max_retries
+        self.part_size = part_size
+        self.max_parts = max_parts
+        self.parallel_min_size = parallel_min_size
+        self.chunk_size = chunk_size
+        self.backoff = backoff
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """Create downloader from downloads section of project configuration
+
+        Args:
+            configuration (Configuration): HDX configuration
+
+        Returns:
+            RangedDownloader: Downloader
+        """
+        downloads_info = configuration["downloads"]
+        return cls(
+            downloads_info["max_retries"],
+            downloads_info["part_size_mb"] * 1024 * 1024,
+            downloads_info["max_parts"],
+            downloads_info["parallel_min_size_mb"] * 1024 * 1024,
+        )
+
+    def wait(self, retry):
+        time.sleep(self.backoff * 2 ** (retry - 1))
+
+    def get_range(self, session, url, start, end, validator):
+        headers = {"Range": f"bytes={start}-{end}"}
+        if validator:
+            # Get the whole file rather than a range of a different version
+            headers["If-Range"] = validator
+        response = session.get(url, headers=headers, stream=True)
+        response.raise_for_status()
+        return response
+
+    def write_response(self, response, output, position, end=None):
+        """Write response to output from position, stopping at end if given.
+
+        Returns:
+            int: Position after last byte written
+        """
+        output.seek(position)
+        for chunk in response.iter_content(chunk_size=self.chunk_size):
+            if not chunk:
+                continue
+            if end is not None:
+                chunk = chunk[: end + 1 - position]
+            output.write(chunk)
+            position += len(chunk)
+            if end is not None and position > end:
+                break
+        return position
+
+    @staticmethod
+    def get_size(response):
+        """Get size of response body from Content-Length. The size is unknown
+        if there is no Content-Length, eg. for chunked responses, or if the
+        body is encoded.
+
+        Args:
+            response (requests.Response): Response
+
+        Returns:
+            Optional[int]: Size of body or None if unknown
+        """
+        size = response.headers.get("Content-Length")
+        if size is None or response.headers.get("Content-Encoding"):
+            return None
+        return int(size)
+
+    def download(self, session, response, path):
+        """Download the body of response (from a GET with stream=True) to
+        path, resuming or splitting into parallel ranges if the server
+        supports them.
+
+        Args:
+            session (requests.Session): Session to use for Range requests
+            response (requests.Response): Response whose body to download
+            path (str): Path to write to
+
+        Returns:
+            None
+        """
+        url = response.url
+        headers = response.headers
+        size = self.get_size(response)
+        ranges = headers.get("Accept-Ranges") == "bytes" and size is not None
+        validator = headers.get("ETag") or headers.get("Last-Modified")
+        if ranges and self.max_parts > 1 and size >= self.parallel_min_size:
+            response.close()
+            self.download_parts(session, url, size, validator, path)
+        else:
+            size = self.download_stream(
+                session, url, response, size, ranges, validator, path
+            )
+        if size is not None and getsize(path) != size:
+            raise DownloadError(
+                f"Download of {url} has size {getsize(path)} not {size}!"
+            )
+        if is_zipfile(path):
+            verify_zip(path)
+
+    def download_stream(self, session, url, response, size, ranges, validator, path):
+        position = 0
+        retry = 0
+        with open(path, "wb") as output:
+            while True:
+                try:
+                    position = self.write_response(response, output, position)
+                    if size is None or position >= size:
+                        return size
+                    # Server closed connection cleanly but early
+                    raise ConnectionError(f"Got {position} of {size} bytes")
+                except connection_errors as ex:
+                    response.close()
+                    position = output.tell()
+                    retry += 1
+                    if not ranges or retry > self.max_retries:
+                        raise DownloadError(
+                            f"Download of {url} failed in retrieval of stream!"
+                        ) from ex
+                    logger.warning(
+                        f"Resuming download of {url} from byte {position} ({retry}/{self.max_retries}): {ex}"
+                    )
+                    self.wait(retry)
+                    try:
+                        response = self.get_range(
+                            session, url, position, size - 1, validator
+                        )
+                    except connection_errors:
+                        continue
+                    if response.status_code != 206:
+                        # File changed on the server so start again
+                        logger.warning(f"{url} has changed, restarting download")
+                        position = 0
+                        output.truncate(0)
+                        size = self.get_size(response)
+                        if size is None:
+                            # Cannot resume without knowing the size
+                            ranges = False
+
+    def download_part(self, session, url, start, end, validator, path):
+        position = start
+        retry = 0
+        with open(path, "r+b") as output:
+            while position <= end:
+                try:
+                    response = self.get_range(session, url, position, end, validator)
+                    if response.status_code != 206:
+                        response.close()
+                        raise DownloadError(
+                            f"Range request for {url} returned {response.status_code}!"
+                        )
+                    with response:
+                        position = self.write_response(response, output, position, end)
+                except connection_errors as ex:
+                    position = output.tell()
+                    retry += 1
+                    if retry > self.max_retries:
+                        raise DownloadError(
+                            f"Download of bytes {start}-{end} of {url} failed!"
+                        ) from ex
+                    logger.warning(
+                        f"Resuming bytes {position}-{end} of {url} ({retry}/{self.max_retries}): {ex}"
+                    )
+                    self.wait(retry)
+
+    def download_parts(self, session, url, size, validator, path):
+        with open(path, "wb") as output:
+            output.truncate(size)
+        parts = [
+            (start, min(start + self.part_size, size) - 1)
+            for start in range(0, size, self.part_size)
+        ]
+        logger.info(f"Downloading {url} in {len(parts)} parts")
+        with ThreadPoolExecutor(max_workers=self.max_parts) as executor:
+            futures = [
+                executor.submit(
+                    self.download_part, session, url, start, end, validator, path
+                )
+                for start, end in parts
+            ]
+            for future in futures:
+                future.result()
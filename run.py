@@ -4,74 +4,734 @@ Top level script. Calls other functions that generate datasets that this script
 
 """
 import logging
-from os.path import expanduser, join
-
-from hdx.api.configuration import Configuration
-from hdx.facades.infer_arguments import facade
-from hdx.utilities.dateparse import iso_string_from_datetime, now_utc, parse_date
-from hdx.utilities.downloader import Download
-from hdx.utilities.path import progress_storing_folder, wheretostart_tempdir_batch
-from hdx.utilities.retriever import Retrieve
-from hdx.utilities.state import State
+import signal
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from multiprocessing import get_context
+from os import getenv, makedirs
+from os.path import expanduser, getsize, join
+from shutil import rmtree
+from time import perf_counter
+from typing import Optional
+
+from country_index import CountryIndex
+from disk_budget import DiskBudget
+from episode_store import EpisodeStore, hash_dataset
+from fingerprints import ResourceFingerprints
+from hdx.utilities.dateparse import now_utc, parse_date
+from metrics import Metrics
+from pipeline import pipelined
+from sharding import EventLeases, partition_events
+from watch import AdaptiveInterval
 from wfp import ADAM
 
 logger = logging.getLogger(__name__)
 
 lookup = "hdx-scraper-wfp-adam"
 updated_by_script = "HDX Scraper: WFP ADAM"
+project_config_yaml = join("config", "project_configuration.yaml")
+# Seconds spent importing the HDX publishing machinery and from the end of
+# the module imports until the feed was requested. The cost of the module
+# imports themselves is measured by benchmark.py.
+started = perf_counter()
+startup = {"import_time": 0.0}
+
+
+def mark_first_request():
+    startup.setdefault("time_to_first_request", perf_counter() - started)
 
 
-def main(save: bool = False, use_saved: bool = False) -> None:
-    """Generate datasets and create them in HDX
+def main(
+    save: bool = False,
+    use_saved: bool = False,
+    backfill_start: Optional[str] = None,
+    backfill_end: Optional[str] = None,
+    shards: int = 1,
+    shard_by: str = "event_type",
+    watch: bool = False,
+) -> None:
+    """Generate datasets and create them in HDX. The state of each episode is
+    kept in episode_state.sqlite, which is saved to episode_state.json, so
+    that only episodes not yet published are processed. If backfill_start is given, the feed from backfill_start to
+    backfill_end is fetched in concurrent date windows instead of the feed
+    since the last build date, and the last build date is left unchanged. If
+    shards is more than 1, events are partitioned by event type or country
+    between that many worker processes whose results are merged at the end.
+    If watch is True, the feed is polled until the process is stopped, keeping
+    the HTTP session, cache and country index between polls.
 
     Args:
         save (bool): Save downloaded data. Defaults to False.
         use_saved (bool): Use saved data. Defaults to False.
+        backfill_start (Optional[str]): Start date of backfill. Defaults to None (no backfill).
+        backfill_end (Optional[str]): End date of backfill. Defaults to None (today).
+        shards (int): Number of worker processes. Defaults to 1.
+        shard_by (str): Shard by event_type or countryiso. Defaults to event_type.
+        watch (bool): Poll the feed until stopped. Defaults to False.
 
     Returns:
         None
     """
+    # The HDX publishing machinery takes most of the start up time so it is
+    # only imported once it is needed
+    start = perf_counter()
+    from hdx.api.configuration import Configuration
+    from hdx.utilities.downloader import Download
+    from hdx.utilities.path import wheretostart_tempdir_batch
+    from http_cache import HTTPCache
 
+    startup["import_time"] += perf_counter() - start
     configuration = Configuration.read()
-    with State("last_build_date.txt", parse_date, iso_string_from_datetime) as state:
+    if shards > 1 and shard_by not in ("event_type", "countryiso"):
+        raise ValueError(f"Cannot shard by {shard_by}!")
+    if watch and backfill_start:
+        raise ValueError("Cannot backfill in watch mode!")
+    with EpisodeStore(
+        "episode_state.sqlite", "last_build_date.txt", "episode_state.json"
+    ) as store:
         with wheretostart_tempdir_batch(lookup) as info:
-            folder = info["folder"]
-            with Download() as downloader:
-                retriever = Retrieve(
-                    downloader, folder, "saved_data", folder, save, use_saved
+            with (
+                Download() as downloader,
+                HTTPCache.from_configuration(configuration) as cache,
+                ResourceFingerprints("resource_fingerprints.json") as fingerprints,
+            ):
+                if not watch:
+                    run_cycle(
+                        configuration,
+                        store,
+                        downloader,
+                        cache,
+                        fingerprints,
+                        info,
+                        get_country_index(configuration, now_utc()),
+                        save,
+                        use_saved,
+                        backfill_start,
+                        backfill_end,
+                        shards,
+                        shard_by,
+                    )
+                    return
+                stop = threading.Event()
+                signal.signal(signal.SIGTERM, lambda *args: stop.set())
+                watch_feed(
+                    configuration,
+                    store,
+                    downloader,
+                    cache,
+                    fingerprints,
+                    info,
+                    save,
+                    use_saved,
+                    shards,
+                    shard_by,
+                    stop,
                 )
-                today = now_utc()
-                adam = ADAM(configuration, retriever, today, folder)
-                adam.parse_feed(state.get())
-                adam.parse_eventtypes_feeds()
-                events = adam.get_events()
-                logger.info(f"Number of datasets: {len(events)}")
-
-                for _, event in progress_storing_folder(info, events, "event_id"):
-                    dataset, showcases = adam.generate_dataset(event)
-                    if not dataset:
-                        continue
-                    dataset.update_from_yaml(join("config", "hdx_dataset_static.yaml"))
-                    # ensure markdown has line breaks
-                    dataset["notes"] = dataset["notes"].replace("\n", "  \n")
-
-                    dataset.create_in_hdx(
-                        remove_additional_resources=True,
-                        hxl_update=False,
-                        updated_by_script=updated_by_script,
-                        batch=info["batch"],
+
+
+def watch_feed(
+    configuration,
+    store,
+    downloader,
+    cache,
+    fingerprints,
+    info,
+    save,
+    use_saved,
+    shards,
+    shard_by,
+    stop,
+):
+    """Poll the feed until stop is set, keeping the HTTP session, cache and
+    country index between polls. A poll that fails is logged and the next
+    poll is made as usual. If the country index cannot be refreshed, the poll
+    fails and the previous index is kept.
+
+    Args:
+        configuration (Configuration): HDX configuration
+        store (EpisodeStore): Episode store
+        downloader (Download): Download object
+        cache (HTTPCache): HTTP cache
+        fingerprints (ResourceFingerprints): Resource fingerprints
+        info (Dict): Dictionary containing folder and batch
+        save (bool): Save downloaded data
+        use_saved (bool): Use saved data
+        shards (int): Number of worker processes
+        shard_by (str): Shard by event_type or countryiso
+        stop (threading.Event): Event set to stop polling
+
+    Returns:
+        None
+    """
+    from hdx.utilities.uuid import get_uuid
+
+    interval = AdaptiveInterval.from_configuration(configuration)
+    country_index = None
+    while True:
+        # Each poll downloads to a fresh folder and is its own batch
+        folder = join(info["folder"], "poll")
+        makedirs(folder, exist_ok=True)
+        poll_info = {"folder": folder, "batch": get_uuid()}
+        try:
+            country_index = get_country_index(configuration, now_utc(), country_index)
+            no_events = run_cycle(
+                configuration,
+                store,
+                downloader,
+                cache,
+                fingerprints,
+                poll_info,
+                country_index,
+                save,
+                use_saved,
+                None,
+                None,
+                shards,
+                shard_by,
+            )
+        except Exception as ex:
+            logger.exception(f"Poll failed: {ex}")
+            no_events = 0
+        store.save()
+        cache.save()
+        fingerprints.save()
+        rmtree(folder, ignore_errors=True)
+        wait = interval.update(no_events)
+        logger.info(f"Polling again in {wait / 60:.1f} minutes")
+        if stop.wait(wait):
+            logger.info("Stopping")
+            break
+
+
+def get_country_index(configuration, today, country_index=None):
+    """Get country index, reusing the given one unless it is due to be
+    checked against the countries data again
+
+    Args:
+        configuration (Configuration): HDX configuration
+        today (datetime): Today's date
+        country_index (Optional[CountryIndex]): Index already loaded. Defaults to None.
+
+    Returns:
+        CountryIndex: Country index
+    """
+    max_age_days = configuration["country_index_max_age_days"]
+    if country_index and today - country_index.checked < timedelta(days=max_age_days):
+        return country_index
+    return CountryIndex.load("country_index.json", today, max_age_days)
+
+
+def run_cycle(
+    configuration,
+    store,
+    downloader,
+    cache,
+    fingerprints,
+    info,
+    country_index,
+    save,
+    use_saved,
+    backfill_start,
+    backfill_end,
+    shards,
+    shard_by,
+):
+    """Read the feeds and publish the datasets of events with new episodes
+
+    Args:
+        configuration (Configuration): HDX configuration
+        store (EpisodeStore): Episode store
+        downloader (Download): Downloader
+        cache (HTTPCache): HTTP cache
+        fingerprints (ResourceFingerprints): Resource fingerprints
+        info (Dict): Dictionary with folder for downloads and progress and batch
+        country_index (CountryIndex): Country index
+        save (bool): Save downloaded data
+        use_saved (bool): Use saved data
+        backfill_start (Optional[str]): Start date of backfill or None
+        backfill_end (Optional[str]): End date of backfill or None (today)
+        shards (int): Number of worker processes
+        shard_by (str): Shard by event_type or countryiso
+
+    Returns:
+        int: Number of events with new episodes
+    """
+    from http_cache import CachingRetrieve, SingleFlight
+
+    folder = info["folder"]
+    single_flight = SingleFlight()
+    retriever = CachingRetrieve(
+        downloader,
+        folder,
+        "saved_data",
+        folder,
+        save,
+        use_saved,
+        cache=cache,
+        single_flight=single_flight,
+    )
+    metrics = Metrics()
+    metrics.install(downloader.session)
+    try:
+        today = now_utc()
+        adam = ADAM(
+            configuration,
+            retriever,
+            today,
+            folder,
+            fingerprints,
+            country_index,
+            metrics,
+            store,
+            DiskBudget.from_configuration(configuration, folder),
+        )
+        unpublished = store.get_unpublished()
+        if unpublished:
+            logger.info(f"Resuming {len(unpublished)} unpublished episodes")
+        # A run resumed after a crash reuses the feeds read before the crash
+        snapshot_path = join(folder, "feed_snapshot.pickle")
+        snapshot_key = {
+            "batch": info["batch"],
+            "backfill_start": backfill_start,
+            "backfill_end": backfill_end,
+        }
+        with metrics.span("load_snapshot"):
+            resumed = adam.load_snapshot(snapshot_path, snapshot_key)
+        if not resumed:
+            read_feeds(configuration, adam, store, today, backfill_start, backfill_end)
+            adam.save_snapshot(snapshot_path, snapshot_key)
+        events = adam.get_events()
+        logger.info(f"Number of datasets: {len(events)}")
+        metrics_info = configuration["metrics"]
+        extra = {"startup": startup}
+        retry_showcases(configuration, store, metrics)
+        if shards > 1:
+
+            def get_key(event):
+                episode = adam.latest_episodes[event["event_id"]]
+                return getattr(episode, shard_by)
+
+            futures = []
+            # Workers are forked so they inherit the HDX configuration
+            with ProcessPoolExecutor(
+                max_workers=shards, mp_context=get_context("fork")
+            ) as executor:
+                for shard, (keys, shard_events) in enumerate(
+                    partition_events(events, get_key, shards)
+                ):
+                    logger.info(
+                        f"Shard {shard}: {len(shard_events)} events for {', '.join(keys)}"
+                    )
+                    latest_episodes = {
+                        x["event_id"]: adam.latest_episodes[x["event_id"]]
+                        for x in shard_events
+                    }
+                    future = executor.submit(
+                        run_shard,
+                        shard,
+                        keys,
+                        shard_events,
+                        latest_episodes,
+                        country_index,
+                        today,
+                        info,
+                        store.path,
+                        fingerprints.path,
+                        save,
+                        use_saved,
                     )
-                    for showcase in showcases:
-                        showcase.create_in_hdx()
-                        showcase.add_dataset(dataset)
-                state.set(now_utc())
+                    futures.append((shard, future))
+                results = []
+                failed_shards = []
+                for shard, future in futures:
+                    try:
+                        results.append(future.result())
+                    except Exception as ex:
+                        logger.exception(f"Shard {shard} failed: {ex}")
+                        failed_shards.append(shard)
+            shard_summaries = []
+            for result in results:
+                metrics.merge(result["spans"], result["counters"])
+                fingerprints.merge(result["fingerprints"])
+                cache.merge(**result["cache"])
+                shard_summaries.append(
+                    {
+                        "shard": result["shard"],
+                        "keys": result["keys"],
+                        "events": result["events"],
+                        "counters": result["counters"],
+                    }
+                )
+            extra["shards"] = shard_summaries
+            if failed_shards:
+                # Keep the last build date so the next run retries
+                metrics.save_report(metrics_info["report"], extra)
+                raise RuntimeError(f"Shards {failed_shards} failed!")
+        else:
+            leases_folder = configuration["sharding"]["leases_folder"]
+            with EventLeases(leases_folder) as leases:
+                publish(
+                    configuration,
+                    adam,
+                    store,
+                    fingerprints,
+                    metrics,
+                    info,
+                    events,
+                    leases,
+                )
+        add_single_flight_counters(metrics, single_flight)
+        if not backfill_start:
+            store.set_last_build_date(now_utc())
+        metrics.save_report(metrics_info["report"], extra)
+        if metrics_info["spans"]:
+            metrics.export_spans(metrics_info["spans"])
+    finally:
+        metrics.uninstall(downloader.session)
+    return len(events)
+
+
+def read_feeds(configuration, adam, store, today, backfill_start, backfill_end):
+    """Read the feed since the last build date, or the backfill period, and
+    the event details of the latest episodes
+
+    Args:
+        configuration (Configuration): HDX configuration
+        adam (ADAM): ADAM object
+        store (EpisodeStore): Episode store
+        today (datetime): Today's date
+        backfill_start (Optional[str]): Start date of backfill or None
+        backfill_end (Optional[str]): End date of backfill or None (today)
+
+    Returns:
+        None
+    """
+    if backfill_start:
+        if backfill_end:
+            end_date = parse_date(backfill_end)
+        else:
+            end_date = today
+        adam.parse_feed_windows(
+            parse_date(backfill_start),
+            end_date,
+            configuration["backfill_window_days"],
+            configuration["backfill_workers"],
+        )
+    else:
+        # Overlap with the previous run to pick up late episodes
+        lookback = timedelta(days=configuration["feed_lookback_days"])
+        mark_first_request()
+        adam.parse_feed(store.get_last_build_date() - lookback)
+    adam.parse_eventtypes_feeds()
+
+
+def add_single_flight_counters(metrics, single_flight):
+    """Add counts of downloads shared within the run to metrics
+
+    Args:
+        metrics (Metrics): Metrics
+        single_flight (SingleFlight): Single flight used by the run
+
+    Returns:
+        None
+    """
+    metrics.add("downloads_shared", single_flight.hits)
+    metrics.add("bytes_shared", single_flight.bytes_saved)
+    logger.info(
+        f"Single flight: {single_flight.hits} downloads shared, {single_flight.misses} downloaded"
+    )
+
+
+def retry_showcases(configuration, store, metrics):
+    """Publish showcases that failed to publish in previous runs
+
+    Args:
+        configuration (Configuration): HDX configuration
+        store (EpisodeStore): Episode store
+        metrics (Metrics): Metrics
+
+    Returns:
+        None
+    """
+    from showcase_publisher import ShowcasePublisher
+
+    publisher = ShowcasePublisher.from_configuration(configuration, store)
+    if publisher.retry_failed():
+        with metrics.span("showcases"):
+            failed = publisher.finish()
+        metrics.add("datasets_with_failed_showcases", len(failed))
+    else:
+        publisher.finish()
+
+
+def publish(configuration, adam, store, fingerprints, metrics, info, events, leases):
+    """Build datasets for events and create them in HDX along with their
+    showcases. An event is only built if its lease can be taken and its
+    latest episode has not been published by another worker. Its episode is
+    marked published, its lease released and its files deleted by the disk
+    budget of adam as soon as its dataset has been created in HDX or skipped. Showcases are
+    published in the background and those that fail are retried next run,
+    even if creating a later dataset fails.
+
+    Args:
+        configuration (Configuration): HDX configuration
+        adam (ADAM): ADAM object holding latest episodes of events
+        store (EpisodeStore): Episode store
+        fingerprints (ResourceFingerprints): Resource fingerprints
+        metrics (Metrics): Metrics
+        info (Dict): Dictionary with folder in which to store progress and batch
+        events (List[Dict]): Events to publish
+        leases (EventLeases): Event leases
+
+    Returns:
+        None
+    """
+    from showcase_publisher import ShowcasePublisher
+
+    disk_budget = adam.disk_budget
+
+    def build(event):
+        event_id = event["event_id"]
+        if not leases.acquire(event_id):
+            logger.warning(f"{event_id} is being published by another worker")
+            metrics.add("events_leased_elsewhere")
+            return None, None
+        guid = adam.latest_episodes[event_id].guid
+        if any(x[0] == guid for x in store.get_published(event_id)):
+            # Published by another worker since the feed was read
+            logger.info(f"{event_id} has already been published")
+            metrics.add("events_published_elsewhere")
+            return None, None
+        dataset, showcases = adam.generate_dataset(event)
+        if not dataset:
+            return None, None
+        dataset.update_from_yaml(join("config", "hdx_dataset_static.yaml"))
+        # ensure markdown has line breaks
+        dataset["notes"] = dataset["notes"].replace("\n", "  \n")
+        unchanged = store.mark_built(guid, hash_dataset(dataset, fingerprints))
+        if unchanged:
+            logger.info(f"{dataset['name']} is unchanged, not publishing")
+            store.mark_published(guid)
+            metrics.add("datasets_unchanged")
+            return None, None
+        return dataset, showcases
+
+    publisher = ShowcasePublisher.from_configuration(configuration, store)
+    try:
+        for _, event, (dataset, showcases) in pipelined(
+            info,
+            events,
+            "event_id",
+            build,
+            configuration.get("build_workers", 1),
+            configuration.get("max_inflight_datasets", 1),
+            disk_budget.is_over,
+        ):
+            metrics.add("events")
+            event_id = event["event_id"]
+            if not dataset:
+                leases.release(event_id)
+                metrics.add("bytes_deleted", disk_budget.release(event_id))
+                continue
+            for resource in dataset.get_resources():
+                path = resource.get_file_to_upload()
+                if path:
+                    metrics.add("bytes_uploaded", getsize(path))
+            with metrics.span("create_in_hdx", event_id):
+                dataset.create_in_hdx(
+                    remove_additional_resources=True,
+                    hxl_update=False,
+                    updated_by_script=updated_by_script,
+                    batch=info["batch"],
+                )
+            store.mark_published(adam.latest_episodes[event_id].guid)
+            metrics.add("datasets_published")
+            fingerprints.record(dataset)
+            leases.release(event_id)
+            metrics.add("bytes_deleted", disk_budget.release(event_id))
+            publisher.add(dataset, showcases)
+    finally:
+        logger.info(f"Peak disk usage of downloaded files: {disk_budget.peak} bytes")
+        # Showcases already queued are waited for even if publishing failed
+        # so that those that fail are recorded and retried next run
+        with metrics.span("showcases"):
+            failed = publisher.finish()
+        metrics.add("datasets_with_failed_showcases", len(failed))
+
+
+def run_shard(
+    shard,
+    keys,
+    events,
+    latest_episodes,
+    country_index,
+    today,
+    info,
+    store_path,
+    fingerprints_path,
+    save,
+    use_saved,
+):
+    """Publish a shard of events in a worker process. The shard has its own
+    folder, in which progress is stored, and its own database connection,
+    HTTP session and metrics. The fingerprints it recorded, its cache entries
+    and metrics are returned for the coordinator to merge.
+
+    Args:
+        shard (int): Shard number
+        keys (List[str]): Event types or countries in shard
+        events (List[Dict]): Events in shard
+        latest_episodes (Dict[str, Episode]): Latest episodes of events in shard
+        country_index (CountryIndex): Country index
+        today (datetime): Today's date
+        info (Dict): Dictionary from wheretostart_tempdir_batch of coordinator
+        store_path (str): Path of episode store of coordinator
+        fingerprints_path (str): Path of resource fingerprints of coordinator
+        save (bool): Save downloaded data
+        use_saved (bool): Use saved data
+
+    Returns:
+        Dict: Shard summary with spans, counters, recorded fingerprints and cache entries
+    """
+    from hdx.api.configuration import Configuration
+    from hdx.utilities.downloader import Download
+    from http_cache import CachingRetrieve, HTTPCache, SingleFlight
+
+    configuration = Configuration.read()
+    folder = join(info["folder"], f"shard-{shard}")
+    makedirs(folder, exist_ok=True)
+    shard_info = {"folder": folder, "batch": info["batch"]}
+    leases_folder = configuration["sharding"]["leases_folder"]
+    with (
+        EpisodeStore(store_path) as store,
+        Download() as downloader,
+        EventLeases(leases_folder) as leases,
+    ):
+        # The cache and fingerprints are not saved here as the coordinator
+        # merges them
+        cache = HTTPCache.from_configuration(configuration)
+        fingerprints = ResourceFingerprints(fingerprints_path)
+        single_flight = SingleFlight()
+        retriever = CachingRetrieve(
+            downloader,
+            folder,
+            "saved_data",
+            folder,
+            save,
+            use_saved,
+            cache=cache,
+            single_flight=single_flight,
+        )
+        metrics = Metrics()
+        metrics.install(downloader.session)
+        adam = ADAM(
+            configuration,
+            retriever,
+            today,
+            folder,
+            fingerprints,
+            country_index,
+            metrics,
+            store,
+            DiskBudget.from_configuration(configuration, folder),
+        )
+        adam.latest_episodes = latest_episodes
+        publish(
+            configuration,
+            adam,
+            store,
+            fingerprints,
+            metrics,
+            shard_info,
+            events,
+            leases,
+        )
+        add_single_flight_counters(metrics, single_flight)
+    return {
+        "shard": shard,
+        "keys": keys,
+        "events": len(events),
+        "spans": metrics.spans,
+        "counters": metrics.counters,
+        "fingerprints": fingerprints.get_recorded(),
+        "cache": {
+            "index": cache.index,
+            "hits": cache.hits,
+            "misses": cache.misses,
+            "bytes_saved": cache.bytes_saved,
+        },
+    }
+
+
+def nothing_to_publish():
+    """Check the feed for new episodes before the HDX publishing machinery is
+    initialised. If there are none and a previous run left no failed showcases
+    or unpublished episodes, the last build date is updated and a metrics
+    report with the start up times is saved as a full run would do.
+
+    Returns:
+        bool: True if there is nothing new to publish
+    """
+    from quick_check import (
+        count_new_episodes,
+        has_unfinished_work,
+        load_project_configuration,
+    )
+
+    configuration = load_project_configuration(
+        project_config_yaml,
+        join(expanduser("~"), ".cache", lookup, "project_configuration.pickle"),
+    )
+    today = now_utc()
+    # The country index is only rebuilt from the countries data in a full run
+    country_index = CountryIndex.load_saved("country_index.json")
+    if not country_index or not country_index.is_fresh(
+        today, configuration["country_index_max_age_days"]
+    ):
+        return False
+    with EpisodeStore(
+        "episode_state.sqlite", "last_build_date.txt", "episode_state.json"
+    ) as store:
+        if has_unfinished_work(store):
+            logger.info("Starting full run to retry unfinished work")
+            return False
+        mark_first_request()
+        no_events = count_new_episodes(
+            configuration, store, country_index, today, lookup
+        )
+        if no_events:
+            logger.info(f"{no_events} events with new episodes, starting full run")
+            return False
+        logger.info("No new episodes in feed")
+        store.set_last_build_date(now_utc())
+    metrics = Metrics()
+    metrics.save_report(configuration["metrics"]["report"], {"startup": startup})
+    return True
 
 
 if __name__ == "__main__":
+    # Runs that do more than check the feed since the last build skip the check
+    full_run_args = ("--save", "--use-saved", "--backfill-start", "--watch")
+    if not getenv("WHERETOSTART") and not any(
+        arg.split("=")[0] in full_run_args for arg in sys.argv[1:]
+    ):
+        logging.basicConfig(level=logging.INFO)
+        try:
+            if nothing_to_publish():
+                sys.exit(0)
+        except Exception as ex:
+            logger.warning(f"Quick check failed, starting full run: {ex}")
+        startup.pop("time_to_first_request", None)
+    start = perf_counter()
+    from hdx.facades.infer_arguments import facade
+
+    startup["import_time"] += perf_counter() - start
     facade(
         main,
         hdx_site="feature",
         user_agent_config_yaml=join(expanduser("~"), ".useragents.yaml"),
         user_agent_lookup=lookup,
-        project_config_yaml=join("config", "project_configuration.yaml"),
+        project_config_yaml=project_config_yaml,
     )
@@ -0,0 +1,125 @@
+#!/usr/bin/python
+"""
+Sharding:
+--------
+
+Partitions events between worker processes and provides file lock leases on
+events so that two workers, in the same or in concurrent runs, never publish
+the same event.
+
+"""
+import fcntl
+import logging
+import os
+import threading
+import time
+from os.path import join
+
+logger = logging.getLogger(__name__)
+
+
+def partition_events(events, get_key, no_shards):
+    """Partition events into shards so that all events with the same key eg.
+    event type or country are in the same shard. The largest groups of events
+    are assigned first, each to the shard with the fewest events. Events keep
+    their order within each shard.
+
+    Args:
+        events (List[Dict]): Events to partition
+        get_key (Callable[[Dict], str]): Function returning the key of an event
+        no_shards (int): Maximum number of shards
+
+    Returns:
+        List[Tuple[List[str], List[Dict]]]: (keys, events) of each non-empty shard
+    """
+    groups = {}
+    for event in events:
+        groups.setdefault(get_key(event), []).append(event)
+    shards = [([], []) for _ in range(no_shards)]
+    for key, group in sorted(groups.items(), key=lambda x: (-len(x[1]), x[0])):
+        keys, shard_events = min(shards, key=lambda x: len(x[1]))
+        keys.append(key)
+        shard_events.extend(group)
+    positions = {id(event): i for i, event in enumerate(events)}
+    for _, shard_events in shards:
+        shard_events.sort(key=lambda x: positions[id(x)])
+    return [shard for shard in shards if shard[1]]
+
+
+class EventLeases:
+    """Exclusive leases on events held as flock locks on a file per event. The
+    operating system releases the locks if the process dies, so leases never
+    need to expire. Use as a context manager so that all leases are released
+    at the end.
+
+    Args:
+        folder (str): Folder in which to keep lease files
+    """
+
+    def __init__(self, folder):
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.fds = {}
+        self.lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def get_path(self, event_id):
+        return join(self.folder, f"{event_id}.lease")
+
+    def acquire(self, event_id):
+        """Take the lease on an event without waiting
+
+        Args:
+            event_id (str): Event id
+
+        Returns:
+            bool: True if the lease is held, False if another holder has it
+        """
+        with self.lock:
+            if event_id in self.fds:
+                return True
+            path = self.get_path(event_id)
+            while True:
+                fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    os.close(fd)
+                    return False
+                # The previous holder removes the file on release so make
+                # sure the file locked is still the one at path
+                try:
+                    if os.fstat(fd).st_ino == os.stat(path).st_ino:
+                        break
+                except FileNotFoundError:
+                    pass
+                os.close(fd)
+            os.ftruncate(fd, 0)
+            os.write(fd, f"{os.getpid()} {time.time()}\n".encode("utf-8"))
+            self.fds[event_id] = fd
+            return True
+
+    def release(self, event_id):
+        """Release the lease on an event if held
+
+        Args:
+            event_id (str): Event id
+
+        Returns:
+            None
+        """
+        with self.lock:
+            fd = self.fds.pop(event_id, None)
+            if fd is None:
+                return
+            os.remove(self.get_path(event_id))
+            os.close(fd)
+
+    def close(self):
+        for event_id in list(self.fds):
+            self.release(event_id)
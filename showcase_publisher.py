@@ -0,0 +1,223 @@
+#!/usr/bin/python
+"""
+Showcase publisher:
+------------------
+
+Publishes showcases and links them to their datasets on worker threads so
+that HDX calls for showcases overlap with dataset publishing. Calls are rate
+limited by a token bucket and retried with exponential backoff when HDX
+responds with 429 or 5xx. Showcases whose metadata and dataset are unchanged
+since they were last published are skipped. Showcases that fail are recorded
+in the episode store and retried in the next run.
+
+"""
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from episode_store import hash_json
+from requests.exceptions import ConnectionError, Timeout
+
+logger = logging.getLogger(__name__)
+
+status_regex = re.compile(r"^\[.*?, (\d{3}), ")
+
+
+def get_retryable_status(ex):
+    """Get HTTP status from an exception (or one in its chain) raised by an HDX
+    call if it is worth retrying ie. 429 or 5xx. Connection errors and
+    timeouts are reported as status 0.
+
+    Args:
+        ex (Exception): Exception raised by HDX call
+
+    Returns:
+        Optional[int]: Status if call should be retried or None
+    """
+    while ex is not None:
+        if isinstance(ex, (ConnectionError, Timeout)):
+            return 0
+        # ckanapi reports unrecognised errors as repr([url, status, response])
+        match = status_regex.match(str(ex))
+        if match:
+            status = int(match.group(1))
+            if status == 429 or status >= 500:
+                return status
+            return None
+        ex = ex.__cause__ or ex.__context__
+    return None
+
+
+class TokenBucket:
+    """Thread-safe token bucket rate limiter
+
+    Args:
+        rate (float): Tokens added per second
+        capacity (int): Maximum tokens ie. largest burst of calls
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Take a token, waiting until one is available
+
+        Returns:
+            None
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class ShowcasePublisher:
+    """Publishes showcases concurrently. Call finish once all showcases have
+    been added to wait for them to be published.
+
+    Args:
+        store (Optional[EpisodeStore]): Store of showcase hashes. Defaults to None (always publish).
+        max_workers (int): Number of worker threads. Defaults to 4.
+        rate (float): Maximum HDX calls per second. Defaults to 5.
+        burst (int): Maximum burst of HDX calls. Defaults to 10.
+        max_retries (int): Maximum retries of a call. Defaults to 5.
+        backoff (float): Seconds to wait before first retry, doubling each time. Defaults to 1.
+    """
+
+    def __init__(
+        self, store=None, max_workers=4, rate=5, burst=10, max_retries=5, backoff=1
+    ):
+        self.store = store
+        self.limiter = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.futures = []
+        self.published = 0
+        self.skipped = 0
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_configuration(cls, configuration, store=None):
+        """Create publisher from showcases section of project configuration
+
+        Args:
+            configuration (Configuration): HDX configuration
+            store (Optional[EpisodeStore]): Store of showcase hashes. Defaults to None.
+
+        Returns:
+            ShowcasePublisher: Publisher
+        """
+        showcases_info = configuration["showcases"]
+        return cls(
+            store,
+            showcases_info["workers"],
+            showcases_info["rate"],
+            showcases_info["burst"],
+            showcases_info["max_retries"],
+            showcases_info["backoff"],
+        )
+
+    def call(self, function, *args):
+        retry = 0
+        while True:
+            self.limiter.acquire()
+            try:
+                return function(*args)
+            except Exception as ex:
+                status = get_retryable_status(ex)
+                retry += 1
+                if status is None or retry > self.max_retries:
+                    raise
+                wait = self.backoff * 2 ** (retry - 1)
+                logger.warning(
+                    f"HDX call failed with status {status}, retrying in {wait}s ({retry}/{self.max_retries})"
+                )
+                time.sleep(wait)
+
+    def publish_showcase(self, showcase, dataset):
+        name = showcase["name"]
+        showcase_hash = hash_json([showcase.data, dataset["id"]])
+        if self.store and self.store.get_showcase_hash(name) == showcase_hash:
+            with self.lock:
+                self.skipped += 1
+            return
+        self.call(showcase.create_in_hdx)
+        self.call(showcase.add_dataset, dataset)
+        if self.store:
+            self.store.set_showcase_hash(name, showcase_hash)
+        with self.lock:
+            self.published += 1
+
+    def add(self, dataset, showcases):
+        """Queue showcases of a dataset that has been created in HDX for
+        publishing
+
+        Args:
+            dataset (Dataset): Dataset created in HDX
+            showcases (List[Showcase]): Showcases to publish and link to dataset
+
+        Returns:
+            None
+        """
+        for showcase in showcases:
+            future = self.executor.submit(self.publish_showcase, showcase, dataset)
+            self.futures.append((dataset, showcase, future))
+
+    def retry_failed(self, showcase_class=None):
+        """Queue showcases that failed to publish in a previous run
+
+        Args:
+            showcase_class (Optional[Callable]): Creates showcase from metadata. Defaults to None (Showcase).
+
+        Returns:
+            int: Number of showcases queued
+        """
+        if not self.store:
+            return 0
+        if showcase_class is None:
+            from hdx.data.showcase import Showcase
+
+            showcase_class = Showcase
+        failed_showcases = self.store.get_failed_showcases()
+        for showcase_data, dataset in failed_showcases:
+            logger.info(f"Retrying showcase {showcase_data['name']}")
+            self.add(dataset, [showcase_class(showcase_data)])
+        return len(failed_showcases)
+
+    def finish(self):
+        """Wait for all queued showcases to be published. Failed showcases are
+        recorded in the store to be retried.
+
+        Returns:
+            Set[str]: Names of datasets where publishing a showcase failed
+        """
+        failed = set()
+        for dataset, showcase, future in self.futures:
+            try:
+                future.result()
+            except Exception as ex:
+                logger.exception(f"Error publishing showcase {showcase['name']}: {ex}")
+                if self.store:
+                    self.store.mark_showcase_failed(showcase.data, dataset)
+                failed.add(dataset["name"])
+        self.futures = []
+        self.executor.shutdown()
+        logger.info(
+            f"Published {self.published} showcases, skipped {self.skipped} unchanged"
+        )
+        return failed
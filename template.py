@@ -0,0 +1,147 @@
+#!/usr/bin/python
+"""
+Template:
+--------
+
+Compiles the name, title and description templates in the project
+configuration once into renderers. Only a restricted set of expressions is
+allowed inside {} so that templates are never evaluated as arbitrary code.
+
+"""
+import ast
+
+from hdx.utilities.dateparse import parse_date
+
+allowed_methods = {"lower", "upper", "title", "strip", "strftime"}
+
+
+def _compile_expression(node, keys):
+    """Compile an expression AST node into a function of properties. Supported
+    expressions are properties['key'], parse_date(expression) and calls of
+    allowed_methods with constant arguments on an expression.
+
+    Args:
+        node (ast.AST): Expression node
+        keys (Set[str]): Set to which the properties keys used are added
+
+    Returns:
+        Callable[[Dict], Any]: Function taking properties
+    """
+    if isinstance(node, ast.Subscript):
+        if (
+            isinstance(node.value, ast.Name)
+            and node.value.id == "properties"
+            and isinstance(node.slice, ast.Constant)
+            and isinstance(node.slice.value, str)
+        ):
+            key = node.slice.value
+            keys.add(key)
+            return lambda properties: properties[key]
+    elif isinstance(node, ast.Call) and not node.keywords:
+        func = node.func
+        if isinstance(func, ast.Name) and func.id == "parse_date":
+            if len(node.args) == 1:
+                inner = _compile_expression(node.args[0], keys)
+                return lambda properties: parse_date(inner(properties))
+        elif isinstance(func, ast.Attribute) and func.attr in allowed_methods:
+            if all(isinstance(arg, ast.Constant) for arg in node.args):
+                inner = _compile_expression(func.value, keys)
+                method = func.attr
+                args = tuple(arg.value for arg in node.args)
+                return lambda properties: getattr(inner(properties), method)(*args)
+    raise ValueError(f"Unsupported expression {ast.unparse(node)}!")
+
+
+def _split_template(template):
+    """Split a template into literal text and {} expressions, honouring {{ and
+    }} escapes and braces inside quoted strings.
+
+    Args:
+        template (str): Template
+
+    Returns:
+        List[Tuple[bool, str]]: List of (is expression, text)
+    """
+    parts = []
+    literal = []
+    i = 0
+    length = len(template)
+    while i < length:
+        char = template[i]
+        if char in "{}" and template[i : i + 2] == char * 2:
+            literal.append(char)
+            i += 2
+            continue
+        if char == "}":
+            raise ValueError(f"Single '}}' in template {template}!")
+        if char != "{":
+            literal.append(char)
+            i += 1
+            continue
+        quote = None
+        depth = 0
+        for j in range(i + 1, length):
+            char = template[j]
+            if quote:
+                if char == quote:
+                    quote = None
+            elif char in "'\"":
+                quote = char
+            elif char in "([":
+                depth += 1
+            elif char in ")]":
+                depth -= 1
+            elif char == "}" and depth == 0:
+                break
+        else:
+            raise ValueError(f"Unclosed '{{' in template {template}!")
+        if literal:
+            parts.append((False, "".join(literal)))
+            literal = []
+        parts.append((True, template[i + 1 : j]))
+        i = j + 1
+    if literal:
+        parts.append((False, "".join(literal)))
+    return parts
+
+
+class Template:
+    """A template in f-string syntax, compiled once and rendered many times
+    against a properties dictionary.
+
+    Args:
+        template (str): Template eg. "{properties['iso3']}-flood"
+    """
+
+    def __init__(self, template):
+        self.template = template
+        self.keys = set()
+        self.parts = []
+        for is_expression, text in _split_template(template):
+            if not is_expression:
+                self.parts.append(text)
+                continue
+            try:
+                node = ast.parse(text.strip(), mode="eval").body
+            except SyntaxError as ex:
+                raise ValueError(f"Invalid expression {text} in template!") from ex
+            self.parts.append(_compile_expression(node, self.keys))
+
+    def render(self, properties):
+        """Render template using properties
+
+        Args:
+            properties (Dict): Properties dictionary
+
+        Returns:
+            str: Rendered template
+        """
+        missing = self.keys.difference(properties)
+        if missing:
+            raise ValueError(
+                f"Properties {', '.join(sorted(missing))} missing for template {self.template}!"
+            )
+        return "".join(
+            part if isinstance(part, str) else format(part(properties))
+            for part in self.parts
+        )
@@ -0,0 +1,21 @@
+#!/usr/bin/python
+"""
+Smoke test for the offline benchmark.
+
+"""
+from benchmark import run_benchmark
+
+
+class TestBenchmark:
+    def test_run_benchmark(self):
+        results = run_benchmark(3, 1000, 10, episodes=2)
+        assert results["datasets"] == 3
+        assert list(results["timings"]) == [
+            "parse_feed",
+            "parse_eventtypes_feeds",
+            "generate_dataset",
+            "publish",
+        ]
+        assert results["hdx_calls"]["package_create"] == 3
+        assert results["bytes_uploaded"] > 1000
+        assert results["import_time"] > 0
@@ -0,0 +1,81 @@
+#!/usr/bin/python
+"""
+Unit tests for COG output.
+
+"""
+from os.path import join
+from zipfile import ZipFile
+
+import numpy as np
+import pytest
+from cog_output import COGConverter
+from hdx.utilities.path import temp_dir
+
+
+class TestCOGOutput:
+    def test_disabled(self):
+        converter = COGConverter(False)
+        assert converter.convert("flood.tiff", "flood-cog.tiff") is None
+
+    def test_get_description(self):
+        statistics = {
+            "width": 2048,
+            "height": 1024,
+            "valid_pixels": 1500000,
+            "min": 0.0,
+            "max": 3.5,
+            "mean": 0.123456,
+        }
+        assert (
+            COGConverter.get_description("flood.tiff", statistics)
+            == "flood.tiff is 2,048 by 1,024 pixels with 1,500,000 valid pixels ranging from 0 to 3.5 (mean 0.123)."
+        )
+        statistics["valid_pixels"] = 0
+        assert (
+            COGConverter.get_description("flood.tiff", statistics)
+            == "flood.tiff is 2,048 by 1,024 pixels with no data."
+        )
+
+    def test_convert(self):
+        rasterio = pytest.importorskip("rasterio")
+        from rasterio.transform import from_origin
+
+        data = np.arange(1200 * 1000, dtype="float32").reshape(1200, 1000) % 7
+        data[:100, :] = -9999
+        with temp_dir(
+            "test_cog_output", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            tiff_path = join(folder, "flood.tiff")
+            with rasterio.open(
+                tiff_path,
+                "w",
+                driver="GTiff",
+                width=1000,
+                height=1200,
+                count=1,
+                dtype="float32",
+                crs="EPSG:4326",
+                transform=from_origin(38.0, 9.0, 0.001, 0.001),
+                nodata=-9999,
+            ) as dataset:
+                dataset.write(data, 1)
+            zippath = join(folder, "flood.zip")
+            with ZipFile(zippath, "w") as zipfile:
+                zipfile.write(tiff_path, "output/flood.tiff")
+            converter = COGConverter(True, blocksize=256, statistics=True)
+            path = join(folder, "flood-cog.tiff")
+            statistics = converter.convert(f"/vsizip/{zippath}/output/flood.tiff", path)
+            valid = data[100:, :]
+            assert statistics["width"] == 1000
+            assert statistics["height"] == 1200
+            assert statistics["valid_pixels"] == valid.size
+            assert statistics["min"] == 0
+            assert statistics["max"] == 6
+            assert statistics["mean"] == pytest.approx(float(valid.mean()))
+            with rasterio.open(path) as dataset:
+                assert dataset.profile["tiled"] is True
+                assert dataset.profile["blockxsize"] == 256
+                assert dataset.profile["compress"] == "deflate"
+                assert dataset.overviews(1) != []
+                assert np.array_equal(dataset.read(1), data)
+            assert converter.convert(join(folder, "missing.tiff"), path) is None
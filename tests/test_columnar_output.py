@@ -0,0 +1,60 @@
+#!/usr/bin/python
+"""
+Unit tests for columnar output.
+
+"""
+import json
+from os.path import join
+
+import pytest
+from columnar_output import ColumnarConverter
+from hdx.utilities.path import temp_dir
+
+pyogrio = pytest.importorskip("pyogrio")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+class TestColumnarOutput:
+    @pytest.fixture(scope="function")
+    def source(self):
+        zippath = join("tests", "fixtures", "input", "20231114-fl-20231114-som-00.zip")
+        return f"/vsizip/{zippath}/FL-20231114-SOM-00.json"
+
+    def test_unknown_format(self):
+        with pytest.raises(ValueError):
+            ColumnarConverter(["shapefile"])
+
+    def test_convert(self, source):
+        info = pyogrio.read_info(source)
+        with temp_dir(
+            "test_columnar_output", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            converter = ColumnarConverter(["flatgeobuf", "geoparquet"], batch_size=2)
+            outputs = converter.convert(source, join(folder, "FL-20231114-SOM-00"))
+            fgb_path = join(folder, "FL-20231114-SOM-00.fgb")
+            parquet_path = join(folder, "FL-20231114-SOM-00.parquet")
+            assert outputs == [
+                (fgb_path, "FlatGeobuf File"),
+                (parquet_path, "GeoParquet File"),
+            ]
+
+            fgb_info = pyogrio.read_info(fgb_path)
+            assert fgb_info["features"] == info["features"]
+            assert fgb_info["capabilities"]["fast_spatial_filter"]
+            minx, miny, maxx, maxy = fgb_info["total_bounds"]
+            bbox = (minx, miny, (minx + maxx) / 2, (miny + maxy) / 2)
+            _, _, geometry, _ = pyogrio.raw.read(fgb_path, bbox=bbox)
+            assert 0 < len(geometry) < info["features"]
+
+            parquet_file = pq.ParquetFile(parquet_path)
+            assert parquet_file.metadata.num_rows == info["features"]
+            assert parquet_file.metadata.num_row_groups == (info["features"] + 1) // 2
+            geo = json.loads(parquet_file.schema_arrow.metadata[b"geo"])
+            assert geo["primary_column"] == "geometry"
+            column = geo["columns"]["geometry"]
+            assert column["encoding"] == "WKB"
+            assert column["covering"]["bbox"]["xmin"] == ["bbox", "xmin"]
+            table = parquet_file.read()
+            bboxes = table.column("bbox").combine_chunks()
+            assert min(bboxes.field("xmin").to_pylist()) == pytest.approx(minx)
+            assert max(bboxes.field("ymax").to_pylist()) == pytest.approx(maxy)
@@ -0,0 +1,43 @@
+#!/usr/bin/python
+"""
+Unit tests for CountryIndex.
+
+"""
+from os.path import join
+
+import pytest
+from country_index import CountryIndex
+from hdx.location.country import Country
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.path import temp_dir
+
+
+class TestCountryIndex:
+    @pytest.fixture(scope="function")
+    def countriesdata(self):
+        Country.countriesdata(use_live=False)
+
+    def test_country_index(self, countriesdata):
+        index = CountryIndex.from_countriesdata()
+        assert index.is_high_income("USA") is True
+        assert index.is_high_income("ETH") is False
+        assert index.get_country_name("ETH") == "Ethiopia"
+        assert index.get_country_name("XYZ") is None
+
+    def test_load(self, countriesdata):
+        with temp_dir(
+            "test_country_index", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "country_index.json")
+            today = parse_date("2023-11-17")
+            index = CountryIndex.load(path, today, 7)
+            assert index.checked == today
+            index = CountryIndex.load(path, parse_date("2023-11-20"), 7)
+            assert index.checked == today
+            assert index.get_country_name("SOM") == "Somalia"
+            assert "GBR" in index.high_income
+            later = parse_date("2023-11-25")
+            new_index = CountryIndex.load(path, later, 7)
+            assert new_index.checked == later
+            assert new_index.source_hash == index.source_hash
+            assert new_index.names == index.names
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+"""
+Unit tests for disk budget.
+
+"""
+from os import listdir, makedirs
+from os.path import exists, join
+
+from disk_budget import DiskBudget
+from hdx.utilities.path import temp_dir
+
+
+def write_file(path, size):
+    with open(path, "wb") as fp:
+        fp.write(b"x" * size)
+    return path
+
+
+class TestDiskBudget:
+    def test_add_release(self):
+        with temp_dir(
+            "test_disk_budget", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            tracked = join(folder, "tracked")
+            event_folder = join(tracked, "ethiopia-flood", "shp")
+            makedirs(event_folder)
+            saved = join(folder, "saved_data")
+            makedirs(saved)
+            budget = DiskBudget(tracked, 1000)
+            zippath = write_file(join(tracked, "flood.zip"), 300)
+            member = write_file(join(event_folder, "flood.shp"), 200)
+            saved_path = write_file(join(saved, "eq.csv"), 100)
+            assert budget.add("FL-1", zippath) == 300
+            assert budget.add("FL-1", member) == 200
+            assert budget.add("FL-1", member) == 200
+            assert budget.add("FL-1", join(tracked, "missing.tif")) == 0
+            assert budget.add("eq_1", saved_path) == 0
+            assert budget.usage == 500
+            assert budget.release("eq_1") == 0
+            assert budget.release("FL-1") == 500
+            assert budget.usage == 0
+            assert budget.peak == 500
+            assert budget.bytes_deleted == 500
+            assert listdir(tracked) == []
+            assert exists(saved_path)
+
+    def test_is_over(self):
+        with temp_dir(
+            "test_disk_budget", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            budget = DiskBudget(folder, 1000)
+            assert budget.is_over() is False
+            budget.add("eq_1", write_file(join(folder, "eq_1.csv"), 600))
+            assert budget.is_over() is False
+            budget.add("eq_2", write_file(join(folder, "eq_2.csv"), 400))
+            assert budget.is_over() is True
+            budget.release("eq_1")
+            assert budget.is_over() is False
+            budget = DiskBudget(folder, 0)
+            budget.add("eq_2", join(folder, "eq_2.csv"))
+            assert budget.is_over() is False
@@ -0,0 +1,56 @@
+#!/usr/bin/python
+"""
+Unit tests for episode records.
+
+"""
+import pytest
+from episode import Episode, episode_order
+from wfp import ADAM
+
+
+class TestEpisode:
+    @staticmethod
+    def make_episode(guid, episode_id):
+        event_id = guid.split("_")[0]
+        return Episode(
+            guid,
+            event_id,
+            episode_id,
+            "cyclones",
+            "PHL",
+            "2023-11-13T08:33:55",
+            f"https://x/cyclones/{event_id}",
+        )
+
+    def test_episode_order(self):
+        assert sorted(["10", "9", "a", "100", "1"], key=episode_order) == [
+            "1",
+            "9",
+            "10",
+            "100",
+            "a",
+        ]
+
+    def test_latest_episode(self):
+        latest_episodes = {}
+        for guid, episode_id in (
+            ("1001032_9", "9"),
+            ("1001032_10", "10"),
+            ("1001032_2", "2"),
+            ("1001033_1", "1"),
+        ):
+            episode = self.make_episode(guid, episode_id)
+            ADAM.add_latest_episode(latest_episodes, episode)
+        assert {k: v.guid for k, v in latest_episodes.items()} == {
+            "1001032": "1001032_10",
+            "1001033": "1001033_1",
+        }
+        earthquake = self.make_episode("eq_us7000l9ku", None)
+        assert earthquake.is_later_than(latest_episodes["1001033"]) is False
+        assert latest_episodes["1001033"].is_later_than(earthquake) is True
+
+    def test_slots(self):
+        episode = self.make_episode("1001032_9", "9")
+        assert not hasattr(episode, "__dict__")
+        with pytest.raises(AttributeError):
+            episode.extra = 1
@@ -0,0 +1,191 @@
+#!/usr/bin/python
+"""
+Unit tests for the episode store.
+
+"""
+from os import remove
+from os.path import join
+
+import pytest
+from episode import Episode
+from episode_store import EpisodeStore, hash_dataset
+from fingerprints import ResourceFingerprints
+from hdx.api.configuration import Configuration
+from hdx.data.dataset import Dataset
+from hdx.data.resource import Resource
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import temp_dir
+from hdx.utilities.saver import save_json, save_text
+
+
+class TestEpisodeStore:
+    @pytest.fixture(scope="function")
+    def configuration(self):
+        Configuration._create(
+            hdx_read_only=True,
+            user_agent="test",
+            project_config_yaml=join("config", "project_configuration.yaml"),
+        )
+        return Configuration.read()
+
+    def test_store(self):
+        with temp_dir(
+            "test_episode_store", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            legacy_path = join(folder, "last_build_date.txt")
+            save_text("2024-07-24", legacy_path)
+            path = join(folder, "episode_state.sqlite")
+            episode = Episode(
+                "1001032_4",
+                "1001032",
+                "4",
+                "cyclones",
+                "PHL",
+                "2023-11-13T08:33:55",
+                "https://x/cyclones/1001032",
+            )
+            with EpisodeStore(path, legacy_path) as store:
+                assert store.get_last_build_date() == parse_date("2024-07-24")
+                store.set_last_build_date(parse_date("2024-08-01"))
+                store.mark_fetched(episode, {"properties": {"a": 1}})
+                assert store.get_unpublished() == ["1001032_4"]
+                assert store.mark_built("1001032_4", "hash1") is False
+                assert store.get_published("1001032") == []
+            # A failed run leaves the episode unpublished for the next run
+            with EpisodeStore(path, legacy_path) as store:
+                assert store.get_last_build_date() == parse_date("2024-08-01")
+                assert store.get_unpublished() == ["1001032_4"]
+                store.mark_published("1001032_4")
+                assert store.get_unpublished() == []
+                assert store.get_published("1001032") == [("1001032_4", "4")]
+                # Fetching again does not undo publishing
+                store.mark_fetched(episode, {"properties": {"a": 2}})
+                assert store.get_unpublished() == []
+                episode = Episode(
+                    "1001032_5",
+                    "1001032",
+                    "5",
+                    "cyclones",
+                    "PHL",
+                    "2023-11-14T08:33:55",
+                    "https://x/cyclones/1001032",
+                )
+                store.mark_fetched(episode, {"properties": {"a": 3}})
+                # Dataset is identical to the one already published
+                assert store.mark_built("1001032_5", "hash1") is True
+                assert store.mark_built("1001032_5", "hash2") is False
+
+    def test_snapshot(self):
+        with temp_dir(
+            "test_episode_store", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "episode_state.sqlite")
+            snapshot_path = join(folder, "episode_state.json")
+            episode = Episode(
+                "1001032_4",
+                "1001032",
+                "4",
+                "cyclones",
+                "PHL",
+                "2023-11-13T08:33:55",
+                "https://x/cyclones/1001032",
+            )
+            with EpisodeStore(path, snapshot_path=snapshot_path) as store:
+                store.set_last_build_date(parse_date("2024-08-01"))
+                store.mark_fetched(episode, {"properties": {"a": 1}})
+                store.mark_built("1001032_4", "hash1")
+                store.mark_published("1001032_4")
+                store.mark_showcase_failed(
+                    {"name": "showcase"}, {"id": "1", "name": "dataset"}
+                )
+            snapshot = load_json(snapshot_path)
+            assert snapshot["meta"] == [
+                {"key": "last_build_date", "value": "2024-08-01"}
+            ]
+            assert snapshot["episodes"][0]["guid"] == "1001032_4"
+            assert snapshot["episodes"][0]["status"] == "published"
+            # A fresh checkout has only the snapshot
+            remove(path)
+            with EpisodeStore(path, snapshot_path=snapshot_path) as store:
+                assert store.get_last_build_date() == parse_date("2024-08-01")
+                assert store.get_published("1001032") == [("1001032_4", "4")]
+                assert store.mark_built("1001032_4", "hash1") is True
+                assert store.get_failed_showcases() == [
+                    ({"name": "showcase"}, {"id": "1", "name": "dataset"})
+                ]
+                store.set_last_build_date(parse_date("2024-08-02"))
+            assert load_json(snapshot_path) != snapshot
+            # A newer snapshot replaces the database
+            save_json(snapshot, snapshot_path)
+            with EpisodeStore(path, snapshot_path=snapshot_path) as store:
+                assert store.get_last_build_date() == parse_date("2024-08-01")
+            # An older one does not eg. if a run crashed before saving it
+            with EpisodeStore(path) as store:
+                store.set_last_build_date(parse_date("2024-08-03"))
+            with EpisodeStore(path, snapshot_path=snapshot_path) as store:
+                assert store.get_last_build_date() == parse_date("2024-08-03")
+
+    def test_published_by_legacy(self):
+        with temp_dir(
+            "test_episode_store", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            legacy_path = join(folder, "last_build_date.txt")
+            save_text("2023-11-14T00:00:00", legacy_path)
+            path = join(folder, "episode_state.sqlite")
+
+            def make_episode(episode_id, pub_date):
+                return Episode(
+                    f"1001032_{episode_id}",
+                    "1001032",
+                    episode_id,
+                    "cyclones",
+                    "PHL",
+                    pub_date,
+                    "https://x/cyclones/1001032",
+                )
+
+            old_episode = make_episode("4", "2023-11-13T08:33:55")
+            new_episode = make_episode("5", "2023-11-14T08:33:55")
+            with EpisodeStore(path) as store:
+                assert store.published_by_legacy(old_episode) is False
+                store.set_last_build_date(parse_date("2023-11-10"))
+            # The store already had a last build date so nothing is imported
+            with EpisodeStore(path, legacy_path) as store:
+                assert store.published_by_legacy(old_episode) is False
+            path = join(folder, "episode_state2.sqlite")
+            with EpisodeStore(path, legacy_path) as store:
+                assert store.published_by_legacy(old_episode) is True
+                assert store.published_by_legacy(new_episode) is False
+                assert store.get_published("1001032") == [("1001032_4", "4")]
+                store.set_last_build_date(parse_date("2023-11-15"))
+            with EpisodeStore(path, legacy_path) as store:
+                assert store.published_by_legacy(old_episode) is True
+                assert store.published_by_legacy(new_episode) is False
+
+    def test_hash_dataset(self, configuration):
+        with temp_dir(
+            "test_episode_store", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "a.csv")
+            save_text("a,b\n1,2\n", path)
+
+            def make_dataset():
+                dataset = Dataset({"name": "test", "title": "Test"})
+                resource = Resource(
+                    {"name": "a.csv", "description": "A", "format": "csv"}
+                )
+                resource.set_file_to_upload(path)
+                dataset.add_update_resource(resource)
+                return dataset
+
+            digest = hash_dataset(make_dataset())
+            assert hash_dataset(make_dataset()) == digest
+            # The file hash computed by the fingerprint check is reused
+            fingerprints = ResourceFingerprints(join(folder, "fingerprints.json"))
+            assert fingerprints.check("test", "a.csv", path) is None
+            assert hash_dataset(make_dataset(), fingerprints) == digest
+            fingerprints.pending["test/a.csv"]["hash"] = "reused"
+            assert hash_dataset(make_dataset(), fingerprints) != digest
+            save_text("a,b\n1,3\n", path)
+            assert hash_dataset(make_dataset()) != digest
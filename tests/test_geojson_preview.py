@@ -0,0 +1,174 @@
+#!/usr/bin/python
+"""
+Unit tests for GeoJSON preview simplification.
+
+"""
+import json
+from collections import Counter
+from io import BytesIO
+from os.path import getsize, join
+from zipfile import ZipFile
+
+import numpy as np
+import pytest
+from geojson_preview import GeoJSONSimplifier, douglas_peucker, is_valid_polygon
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import temp_dir
+
+
+class TestGeoJSONPreview:
+    @pytest.fixture(scope="function")
+    def input_folder(self):
+        return join("tests", "fixtures", "input")
+
+    def test_douglas_peucker(self):
+        points = np.array([[0, 0], [1, 0.01], [2, -0.01], [3, 5], [4, 6], [5, 7]])
+        keep = douglas_peucker(points, 0.1)
+        assert keep.tolist() == [True, False, True, True, False, True]
+
+    def test_simplify_geometry(self):
+        simplifier = GeoJSONSimplifier(0.5, 2)
+        # Square with noisy edges and a tiny triangular hole
+        exterior = [
+            [0, 0],
+            [5, 0.1],
+            [10, 0],
+            [10, 10],
+            [5, 9.9],
+            [0, 10],
+            [0, 0],
+        ]
+        hole = [[2, 2], [2.2, 2], [2, 2.2], [2, 2]]
+        geometry = {"type": "Polygon", "coordinates": [exterior, hole]}
+        simplified = simplifier.simplify_geometry(geometry)
+        assert simplified == {
+            "type": "Polygon",
+            "coordinates": [
+                [[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]],
+                [[2, 2], [2.2, 2], [2, 2.2], [2, 2]],
+            ],
+        }
+        geometry = {"type": "LineString", "coordinates": [[0.001, 0.001], [0, 0]]}
+        assert simplifier.simplify_geometry(geometry) is None
+        geometry = {"type": "Point", "coordinates": [1.23456, 2.34567]}
+        assert simplifier.simplify_geometry(geometry) == {
+            "type": "Point",
+            "coordinates": [1.23, 2.35],
+        }
+
+    def test_simplify_adjacent_polygons(self):
+        simplifier = GeoJSONSimplifier(0.5, 2)
+        # Left polygon meets the two right polygons at (10.4, 5), which is
+        # within tolerance of the left polygon's edge
+        left = [[0, 0], [10, 0], [10.2, 2.5], [10.4, 5], [9.8, 7.5], [10, 10]]
+        left += [[0, 10], [0, 0]]
+        bottom = [[10, 0], [20, 0], [20, 5], [10.4, 5], [10.2, 2.5], [10, 0]]
+        top = [[10.4, 5], [20, 5], [20, 10], [10, 10], [9.8, 7.5], [10.4, 5]]
+        geometries = [
+            {"type": "Polygon", "coordinates": [ring]} for ring in (left, bottom, top)
+        ]
+        simplified = simplifier.simplify_geometries(geometries)
+        assert simplifier.junctions.tolist() == [
+            [10, 0],
+            [10, 10],
+            [10.4, 5],
+            [20, 5],
+        ]
+        assert [10.4, 5] in simplified[0]["coordinates"][0]
+        assert simplifier.positions_out < simplifier.positions_in
+        # Every edge not on the outside is shared by two polygons so there
+        # are no gaps or overlaps
+        edges = Counter()
+        for geometry in simplified:
+            ring = [tuple(x) for x in geometry["coordinates"][0]]
+            edges.update(frozenset(edge) for edge in zip(ring, ring[1:]))
+        for edge, count in edges.items():
+            outside = any(
+                all(point[i] == value for point in edge)
+                for i, value in ((0, 0), (0, 20), (1, 0), (1, 10))
+            )
+            assert count == (1 if outside else 2)
+
+    def test_simplify_polygon_with_hole(self):
+        simplifier = GeoJSONSimplifier(1.5, 2)
+        # The bump in the exterior holding the hole is within tolerance
+        exterior = [[0, 0], [4, 0], [5, -1.2], [6, 0], [10, 0], [10, 10], [0, 10]]
+        exterior.append([0, 0])
+        hole = [[4.9, -0.9], [5.1, -0.9], [5, -0.6], [4.9, -0.9]]
+        geometry = {"type": "Polygon", "coordinates": [exterior, hole]}
+        assert is_valid_polygon([np.array(exterior), np.array(hole)])
+        simplified = simplifier.simplify_geometries([geometry])[0]
+        rings = [np.array(ring) for ring in simplified["coordinates"]]
+        assert is_valid_polygon(rings)
+        assert [5, -1.2] in simplified["coordinates"][0]
+        assert simplifier.invalid == 0
+        # Without the hole, the bump is removed
+        geometry = {"type": "Polygon", "coordinates": [exterior]}
+        simplified = GeoJSONSimplifier(1.5, 2).simplify_geometries([geometry])[0]
+        assert [5, -1.2] not in simplified["coordinates"][0]
+
+    def test_is_valid_polygon(self):
+        square = np.array([[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]])
+        bowtie = np.array([[0, 0], [10, 10], [10, 0], [0, 10], [0, 0]])
+        hole = np.array([[2, 2], [3, 2], [3, 3], [2, 2]])
+        outside = hole + 20
+        crossing = np.array([[8, 8], [12, 8], [12, 9], [8, 8]])
+        assert is_valid_polygon([square, hole])
+        assert not is_valid_polygon([bowtie])
+        assert not is_valid_polygon([square, outside])
+        assert not is_valid_polygon([square, crossing])
+        assert not is_valid_polygon([square[:3]])
+
+    def test_is_valid_polygon_cost(self):
+        # Outline of a disc of pixels with 200,000 edges, many of which lie
+        # on the same row or column
+        angles = np.linspace(0, 2 * np.pi, 160000, endpoint=False)
+        pixels = np.round(20000 * np.column_stack((np.cos(angles), np.sin(angles))))
+        pixels = pixels[np.any(pixels != np.roll(pixels, 1, axis=0), axis=1)]
+        corners = np.column_stack((np.roll(pixels, -1, axis=0)[:, 0], pixels[:, 1]))
+        ring = np.stack((pixels, corners), axis=1).reshape(-1, 2)
+        ring = ring[np.any(ring != np.roll(ring, 1, axis=0), axis=1)]
+        ring = np.concatenate((ring, ring[:1])) * 0.0002
+        no_edges = len(ring) - 1
+        assert no_edges > 150000
+        # The cost grows with the number of edges
+        assert is_valid_polygon([ring], 10 * no_edges) is True
+        bowtie = ring.copy()
+        bowtie[[1, 2]] = bowtie[[2, 1]]
+        assert is_valid_polygon([bowtie], 10 * no_edges) is False
+        # Every edge of a star crosses the bounding boxes of all the others
+        angles = np.linspace(0, 2 * np.pi, 2000, endpoint=False)
+        radii = np.where(np.arange(2000) % 2, 10, 0.001)
+        star = radii[:, None] * np.column_stack((np.cos(angles), np.sin(angles)))
+        star = np.concatenate((star, star[:1]))
+        assert is_valid_polygon([star], 100000) is None
+        simplifier = GeoJSONSimplifier(0.5, 2, 100000)
+        geometry = {"type": "Polygon", "coordinates": [star.tolist()]}
+        with pytest.raises(ValueError):
+            simplifier.simplify_geometries([geometry])
+
+    def test_simplify(self, input_folder):
+        zippath = join(input_folder, "20231114-fl-20231114-som-00.zip")
+        with temp_dir(
+            "test_geojson_preview", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "preview.geojson")
+            simplifier = GeoJSONSimplifier(0.0005, 5)
+            with ZipFile(zippath) as zipfile:
+                zipinfo = zipfile.getinfo("FL-20231114-SOM-00.json")
+                with zipfile.open(zipinfo) as fp:
+                    simplifier.simplify(fp, path)
+                original = json.load(BytesIO(zipfile.read(zipinfo)))
+            assert getsize(path) < zipinfo.file_size / 2
+            assert simplifier.positions_out < simplifier.positions_in
+            assert simplifier.invalid == 0
+            simplified = load_json(path)
+            assert simplified["crs"] == original["crs"]
+            assert len(simplified["features"]) == len(original["features"])
+            for feature in simplified["features"]:
+                geometry = feature["geometry"]
+                polygons = geometry["coordinates"]
+                if geometry["type"] == "Polygon":
+                    polygons = [polygons]
+                for polygon in polygons:
+                    assert is_valid_polygon([np.array(ring) for ring in polygon])
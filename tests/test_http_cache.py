@@ -0,0 +1,149 @@
+#!/usr/bin/python
+"""
+Unit tests for the HTTP cache.
+
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os import remove
+from os.path import join
+
+import pytest
+from hdx.utilities.base_downloader import DownloadError
+from hdx.utilities.downloader import Download
+from hdx.utilities.loader import load_text
+from hdx.utilities.path import temp_dir
+from http_cache import CachingRetrieve, HTTPCache, SingleFlight
+
+
+class Handler(BaseHTTPRequestHandler):
+    files = {}
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path not in self.files:
+            self.send_error(404)
+            return
+        content, etag = self.files[self.path]
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header("ETag", etag)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestHTTPCache:
+    @pytest.fixture(scope="function")
+    def server(self):
+        Handler.files = {
+            "/a.csv": (b"a" * 1000, '"a1"'),
+            "/b.csv": (b"b" * 2000, '"b1"'),
+            "/c.json": (b'{"c": 1}', '"c1"'),
+        }
+        Handler.requests = []
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+
+    def test_cache(self, server):
+        with temp_dir(
+            "test_http_cache", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            cache_folder = join(folder, "cache")
+            with Download(user_agent="test") as downloader:
+                with HTTPCache(cache_folder, 10000, 86400) as cache:
+                    retriever = CachingRetrieve(
+                        downloader, folder, folder, folder, cache=cache
+                    )
+                    path = retriever.download_file(f"{server}/a.csv")
+                    assert load_text(path) == "a" * 1000
+                    assert retriever.download_json(f"{server}/c.json") == {"c": 1}
+                    assert (cache.hits, cache.misses) == (0, 2)
+                with HTTPCache(cache_folder, 10000, 86400) as cache:
+                    retriever = CachingRetrieve(
+                        downloader, folder, folder, folder, cache=cache
+                    )
+                    path = retriever.download_file(f"{server}/a.csv")
+                    assert load_text(path) == "a" * 1000
+                    assert (cache.hits, cache.misses) == (1, 0)
+                    assert cache.bytes_saved == 1000
+                    Handler.files["/a.csv"] = (b"A" * 500, '"a2"')
+                    path = retriever.download_file(f"{server}/a.csv")
+                    assert load_text(path) == "A" * 500
+                    assert (cache.hits, cache.misses) == (1, 1)
+                    clone = retriever.clone(Download(session=downloader.session))
+                    clone.download_file(f"{server}/a.csv")
+                    assert cache.hits == 2
+                assert Handler.requests == [
+                    ("/a.csv", None),
+                    ("/c.json", None),
+                    ("/a.csv", '"a1"'),
+                    ("/a.csv", '"a1"'),
+                    ("/a.csv", '"a2"'),
+                ]
+
+    def test_evict(self, server):
+        with temp_dir(
+            "test_http_cache", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download(user_agent="test") as downloader:
+                with HTTPCache(join(folder, "cache"), 2500, 86400) as cache:
+                    cache.download_file(
+                        downloader, f"{server}/a.csv", join(folder, "a.csv")
+                    )
+                    cache.download_file(
+                        downloader, f"{server}/b.csv", join(folder, "b.csv")
+                    )
+                    cache.evict()
+                    assert list(cache.index) == [f"{server}/b.csv"]
+                    cache.max_age = -1
+                    cache.evict()
+                    assert cache.index == {}
+
+    def test_single_flight(self, server):
+        with temp_dir(
+            "test_http_cache", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download(user_agent="test") as downloader:
+                single_flight = SingleFlight()
+                retriever = CachingRetrieve(
+                    downloader, folder, folder, folder, single_flight=single_flight
+                )
+                url = f"{server}/b.csv"
+
+                def download(_):
+                    clone = retriever.clone(Download(session=downloader.session))
+                    return clone.download_file(url)
+
+                with ThreadPoolExecutor(max_workers=4) as executor:
+                    paths = list(executor.map(download, range(4)))
+                assert len(set(paths)) == 4
+                assert all(load_text(x) == "b" * 2000 for x in paths)
+                assert Handler.requests == [("/b.csv", None)]
+                assert (single_flight.hits, single_flight.misses) == (3, 1)
+                assert single_flight.bytes_saved == 6000
+                # Each requester can delete its file without affecting others
+                downloaded = join(folder, "b.csv")
+                for path in paths:
+                    if path != downloaded:
+                        remove(path)
+                assert load_text(retriever.download_file(url)) == "b" * 2000
+                assert len(Handler.requests) == 1
+                remove(downloaded)
+                retriever.download_file(url)
+                assert len(Handler.requests) == 2
+                for _ in range(2):
+                    with pytest.raises(DownloadError):
+                        retriever.download_file(f"{server}/missing.csv")
+                assert len(Handler.requests) == 4
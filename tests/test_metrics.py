@@ -0,0 +1,111 @@
+#!/usr/bin/python
+"""
+Unit tests for run metrics.
+
+"""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+
+import pytest
+from hdx.utilities.downloader import Download
+from hdx.utilities.loader import load_json
+from hdx.utilities.path import temp_dir
+from metrics import Metrics, percentile
+
+
+class Handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        content = b"x" * 1234
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestMetrics:
+    @pytest.fixture(scope="function")
+    def server(self):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        assert percentile(values, 0.5) == 50
+        assert percentile(values, 0.95) == 95
+        assert percentile([3], 0.95) == 3
+
+    def test_report(self):
+        metrics = Metrics()
+        for event_id in ("ev1", "ev2"):
+            with metrics.span("generate_dataset", event_id):
+                with metrics.span("download", event_id, url="http://x"):
+                    pass
+            with metrics.span("create_in_hdx", event_id):
+                pass
+        with pytest.raises(ValueError):
+            with metrics.span("generate_dataset", "ev3"):
+                raise ValueError("bad")
+        metrics.add("bytes_uploaded", 100)
+        metrics.add("bytes_uploaded", 50)
+        report = metrics.report()
+        assert report["stages"]["generate_dataset"]["count"] == 3
+        assert report["stages"]["download"]["count"] == 2
+        assert set(report["stages"]["create_in_hdx"]) == {
+            "count",
+            "total",
+            "p50",
+            "p95",
+            "max",
+        }
+        assert report["counters"] == {"bytes_uploaded": 150}
+        slowest = report["slowest_events"]
+        assert len(slowest) == 3
+        for event in slowest:
+            if event["event_id"] == "ev3":
+                continue
+            assert event["total"] == pytest.approx(
+                event["generate_dataset"] + event["create_in_hdx"]
+            )
+            assert "download" in event
+        assert slowest[0]["total"] >= slowest[-1]["total"]
+
+        with temp_dir(
+            "test_metrics", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "report.json")
+            metrics.save_report(path)
+            assert load_json(path)["counters"] == {"bytes_uploaded": 150}
+            path = join(folder, "spans.jsonl")
+            metrics.export_spans(path)
+            with open(path) as fp:
+                spans = [json.loads(line) for line in fp]
+            assert len(spans) == 7
+            span_ids = {span["spanId"] for span in spans}
+            for span in spans:
+                assert span["traceId"] == metrics.trace_id
+                assert span["endTimeUnixNano"] >= span["startTimeUnixNano"]
+                if span["name"] == "download":
+                    assert span["parentSpanId"] in span_ids
+                    assert span["attributes"]["url"] == "http://x"
+                else:
+                    assert span["parentSpanId"] == ""
+            errors = [x for x in spans if x["status"]["code"] == "ERROR"]
+            assert errors[0]["attributes"]["event_id"] == "ev3"
+
+    def test_install(self, server):
+        metrics = Metrics()
+        with Download(user_agent="test") as downloader:
+            metrics.install(downloader.session)
+            downloader.download(f"{server}/a")
+            downloader.download(f"{server}/b")
+            metrics.uninstall(downloader.session)
+            downloader.download(f"{server}/a")
+        assert metrics.counters == {"requests": 2, "bytes_downloaded": 2468}
@@ -0,0 +1,101 @@
+#!/usr/bin/python
+"""
+Unit tests for the build/publish pipeline.
+
+"""
+import threading
+from os.path import join
+
+import pytest
+from hdx.utilities.loader import load_text
+from hdx.utilities.path import temp_dir
+from hdx.utilities.saver import save_text
+from pipeline import pipelined
+
+
+class TestPipeline:
+    @pytest.fixture(scope="function")
+    def events(self):
+        return [{"event_id": f"ev{i}"} for i in range(10)]
+
+    def test_pipelined(self, events):
+        lock = threading.Lock()
+        started = []
+
+        def build(event):
+            with lock:
+                started.append(event["event_id"])
+            return event["event_id"].upper()
+
+        with temp_dir(
+            "test_pipeline", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            info = {"folder": folder}
+            results = []
+            for _, event, result in pipelined(info, events, "event_id", build, 4, 3):
+                progress = load_text(join(folder, "progress.txt"))
+                assert progress == f"event_id={event['event_id']}"
+                results.append(result)
+                with lock:
+                    assert len(started) - len(results) < 3
+            assert results == [f"EV{i}" for i in range(10)]
+
+    def test_pipelined_throttle(self, events):
+        lock = threading.Lock()
+        started = []
+
+        def build(event):
+            with lock:
+                started.append(event["event_id"])
+            return event["event_id"]
+
+        with temp_dir(
+            "test_pipeline", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            info = {"folder": folder}
+            results = []
+            for _, _, result in pipelined(
+                info, events, "event_id", build, 4, 3, lambda: True
+            ):
+                results.append(result)
+                # Only the event being yielded was built
+                with lock:
+                    assert started == results
+            assert results == [f"ev{i}" for i in range(10)]
+
+    def test_pipelined_resume(self, events):
+        built = []
+
+        def build(event):
+            built.append(event["event_id"])
+            return event["event_id"]
+
+        with temp_dir(
+            "test_pipeline", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            save_text("event_id=ev7", join(folder, "progress.txt"))
+            info = {"folder": folder}
+            results = [
+                result
+                for _, _, result in pipelined(info, events, "event_id", build, 2, 4)
+            ]
+            assert results == ["ev7", "ev8", "ev9"]
+            assert sorted(built) == ["ev7", "ev8", "ev9"]
+
+    def test_pipelined_error(self, events):
+        def build(event):
+            if event["event_id"] == "ev2":
+                raise ValueError("bad event")
+            return event["event_id"]
+
+        with temp_dir(
+            "test_pipeline", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            info = {"folder": folder}
+            results = []
+            with pytest.raises(ValueError):
+                for _, _, result in pipelined(info, events, "event_id", build, 2, 2):
+                    results.append(result)
+            assert results == ["ev0", "ev1"]
+            progress = load_text(join(folder, "progress.txt"))
+            assert progress == "event_id=ev2"
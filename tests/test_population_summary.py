@@ -0,0 +1,81 @@
+#!/usr/bin/python
+"""
+Unit tests for population summary.
+
+"""
+from os.path import join
+
+import numpy as np
+import pytest
+from hdx.utilities.dictandlist import read_list_from_csv
+from hdx.utilities.path import temp_dir
+from population_summary import PopulationSummary
+
+
+class TestPopulationSummary:
+    @pytest.fixture(scope="function")
+    def input_folder(self):
+        return join("tests", "fixtures", "input")
+
+    def test_read(self, input_folder):
+        path = join(input_folder, "sm-us7000l9ku-sm-us7000l9ku-pop-estimation.csv")
+        # Chunks smaller than the file to check totals are accumulated
+        summary = PopulationSummary.read(path, chunk_size=3)
+        assert summary.rows == 4
+        assert summary.intensities == [3, 4, 5, 6]
+        assert summary.totals.tolist() == [2008, 4874, 4, 0]
+        assert summary.get_total() == 6886
+        assert list(summary.admin_totals) == [("Indonesia", "Maluku")]
+        assert summary.get_description() == (
+            "Estimated population exposed by intensity is MMI 3: 2,008, MMI 4: "
+            "4,874, MMI 5: 4, MMI 6: 0 (total 6,886). Most exposed areas are "
+            "Maluku, Indonesia (6,886)."
+        )
+        with temp_dir(
+            "test_population_summary", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = summary.save(join(folder, "summary.csv"))
+            assert read_list_from_csv(path) == [
+                ["ADM0_NAME", "ADM1_NAME", "3_MMI", "4_MMI", "5_MMI", "6_MMI", "Total"],
+                [
+                    "#country+name",
+                    "#adm1+name",
+                    "#affected+mmi_3",
+                    "#affected+mmi_4",
+                    "#affected+mmi_5",
+                    "#affected+mmi_6",
+                    "#affected+total",
+                ],
+                ["Indonesia", "Maluku", "2008", "4874", "4", "0", "6886"],
+            ]
+
+    def test_add(self):
+        summary = PopulationSummary(["ADM1_NAME"], ["5_MMI", "7_MMI"])
+        admins = np.array([["A"], ["B"], ["A"]], dtype=object)
+        values = np.array([["1", ""], ["2", "3"], ["4", "5"]], dtype=object)
+        summary.add(admins, values)
+        admins = np.array([["B"]], dtype=object)
+        summary.add(admins, np.array([["10", "1"]], dtype=object))
+        assert summary.rows == 4
+        assert summary.totals.tolist() == [17, 9]
+        assert {k: v.tolist() for k, v in summary.admin_totals.items()} == {
+            ("A",): [5, 5],
+            ("B",): [12, 4],
+        }
+        assert summary.get_description(1) == (
+            "Estimated population exposed by intensity is MMI 5: 17, MMI 7: 9 "
+            "(total 26). Most exposed areas are B (16)."
+        )
+
+    def test_invalid(self):
+        with temp_dir(
+            "test_population_summary", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "ragged.csv")
+            with open(path, "w") as fp:
+                fp.write("ADM1_NAME,3_MMI\nA,1\nB\n")
+            with pytest.raises(ValueError):
+                PopulationSummary.read(path)
+            with open(path, "w") as fp:
+                fp.write("ADM1_NAME,population\nA,1\n")
+            assert PopulationSummary.read(path) is None
@@ -0,0 +1,157 @@
+#!/usr/bin/python
+"""
+Unit tests for quick check.
+
+"""
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from os.path import join
+from shutil import copyfile
+
+import pytest
+from country_index import CountryIndex
+from episode_store import EpisodeStore
+from hdx.location.country import Country
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.path import temp_dir
+from quick_check import (
+    count_new_episodes,
+    has_unfinished_work,
+    load_project_configuration,
+)
+from wfp import ADAM
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves the feed gzipped whatever the dates requested"""
+
+    feed = b""
+    requests = []
+
+    def do_GET(self):
+        self.requests.append((self.path, self.headers.get("User-Agent")))
+        content = gzip.compress(self.feed)
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestQuickCheck:
+    @pytest.fixture(scope="function")
+    def input_folder(self):
+        return join("tests", "fixtures", "input")
+
+    @pytest.fixture(scope="function")
+    def server(self, input_folder):
+        path = join(
+            input_folder, "events-feed-start-date-2023-11-08-end-date-2023-11-17.json"
+        )
+        with open(path, "rb") as fp:
+            Handler.feed = fp.read()
+        Handler.requests = []
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}/events/"
+        server.shutdown()
+
+    def test_load_project_configuration(self):
+        with temp_dir(
+            "test_quick_check", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            path = join(folder, "project_configuration.yaml")
+            copyfile(join("config", "project_configuration.yaml"), path)
+            snapshot_path = join(folder, "cache", "project_configuration.pickle")
+            configuration = load_project_configuration(path, snapshot_path)
+            assert configuration["feed_lookback_days"] == 7
+            assert configuration["event_types"]["floods"]["event_id_index"] == 0
+            with open(snapshot_path, "wb") as fp:
+                fp.write(b"corrupt")
+            assert load_project_configuration(path, snapshot_path) == configuration
+            assert load_project_configuration(path, snapshot_path) == configuration
+            with open(path) as fp:
+                text = fp.read()
+            with open(path, "w") as fp:
+                fp.write(text.replace("feed_lookback_days: 7", "feed_lookback_days: 3"))
+            configuration = load_project_configuration(path, snapshot_path)
+            assert configuration["feed_lookback_days"] == 3
+
+    def test_count_new_episodes(self, server):
+        Country.countriesdata(use_live=False)
+        country_index = CountryIndex.from_countriesdata()
+        with temp_dir(
+            "test_quick_check", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            configuration = load_project_configuration(
+                join("config", "project_configuration.yaml"),
+                join(folder, "project_configuration.pickle"),
+            )
+            configuration["url"] = server
+            today = parse_date("2023-11-17")
+            with EpisodeStore(join(folder, "episode_state.sqlite")) as store:
+                store.set_last_build_date(parse_date("2023-11-15"))
+                assert (
+                    count_new_episodes(
+                        configuration, store, country_index, today, "test"
+                    )
+                    == 6
+                )
+                assert Handler.requests == [
+                    ("/events/feed?start_date=2023-11-08&end_date=2023-11-17", "test")
+                ]
+                # Events whose latest episode is published are not counted
+                adam = ADAM(
+                    configuration, None, today, None, country_index=country_index
+                )
+                adam.add_feed_items(json.loads(Handler.feed), parse_date("2023-11-08"))
+                episode = next(iter(adam.latest_episodes.values()))
+                store.mark_fetched(episode, {})
+                store.mark_published(episode.guid)
+                assert (
+                    count_new_episodes(
+                        configuration, store, country_index, today, "test"
+                    )
+                    == 5
+                )
+
+    def test_has_unfinished_work(self, input_folder):
+        Country.countriesdata(use_live=False)
+        country_index = CountryIndex.from_countriesdata()
+        with temp_dir(
+            "test_quick_check", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            configuration = load_project_configuration(
+                join("config", "project_configuration.yaml"),
+                join(folder, "project_configuration.pickle"),
+            )
+            adam = ADAM(
+                configuration,
+                None,
+                parse_date("2023-11-17"),
+                None,
+                country_index=country_index,
+            )
+            path = join(
+                input_folder,
+                "events-feed-start-date-2023-11-08-end-date-2023-11-17.json",
+            )
+            with open(path) as fp:
+                adam.add_feed_items(json.load(fp), parse_date("2023-11-08"))
+            episode = next(iter(adam.latest_episodes.values()))
+            with EpisodeStore(join(folder, "episode_state.sqlite")) as store:
+                assert has_unfinished_work(store) is False
+                store.mark_fetched(episode, {})
+                assert has_unfinished_work(store) is True
+                store.mark_published(episode.guid)
+                assert has_unfinished_work(store) is False
+                store.mark_showcase_failed(
+                    {"name": "showcase"}, {"id": "1234", "name": "dataset"}
+                )
+                assert has_unfinished_work(store) is True
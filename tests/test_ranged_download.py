@@ -0,0 +1,168 @@
+#!/usr/bin/python
+"""
+Unit tests for ranged downloads.
+
+"""
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from os.path import join
+from zipfile import ZIP_STORED, ZipFile
+
+import pytest
+from hdx.utilities.base_downloader import DownloadError
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from ranged_download import RangedDownloader
+
+
+class Handler(BaseHTTPRequestHandler):
+    """Serves files, dropping the connection after drop_after bytes for the
+    first no_drops responses. If changed is True, Range requests get the whole
+    file without Content-Length as if the file had changed."""
+
+    files = {}
+    ranges = True
+    changed = False
+    drop_after = 0
+    no_drops = 0
+    requests = []
+    lock = threading.Lock()
+
+    def do_GET(self):
+        content = self.files[self.path]
+        size = len(content)
+        start = 0
+        end = size - 1
+        match = re.match(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        with self.lock:
+            self.requests.append(self.headers.get("Range"))
+            drop = self.no_drops > 0
+            if drop:
+                Handler.no_drops -= 1
+        if match and self.changed:
+            self.send_response(200)
+            self.end_headers()
+            self.wfile.write(content)
+            self.close_connection = True
+            return
+        if match and self.ranges:
+            start, end = int(match.group(1)), int(match.group(2))
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        else:
+            self.send_response(200)
+        if self.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", '"v1"')
+        self.send_header("Content-Length", str(end + 1 - start))
+        self.end_headers()
+        body = content[start : end + 1]
+        if drop:
+            self.wfile.write(body[: self.drop_after])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_zip(no_bytes):
+    output = BytesIO()
+    with ZipFile(output, "w", ZIP_STORED) as zipfile:
+        zipfile.writestr("data.txt", bytes(i % 251 for i in range(no_bytes)))
+    return output.getvalue()
+
+
+class TestRangedDownload:
+    @pytest.fixture(scope="function")
+    def server(self):
+        Handler.files = {"/a.zip": make_zip(100000)}
+        Handler.ranges = True
+        Handler.changed = False
+        Handler.no_drops = 0
+        Handler.drop_after = 30000
+        Handler.requests = []
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_port}"
+        server.shutdown()
+
+    def download(self, server, downloader, folder, ranged_downloader):
+        response = downloader.setup(f"{server}/a.zip", stream=True)
+        path = join(folder, "a.zip")
+        ranged_downloader.download(downloader.session, response, path)
+        with open(path, "rb") as fp:
+            return fp.read()
+
+    def test_resume(self, server):
+        Handler.no_drops = 2
+        ranged_downloader = RangedDownloader(chunk_size=10000, backoff=0)
+        with temp_dir(
+            "test_ranged_download", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download(user_agent="test") as downloader:
+                content = self.download(server, downloader, folder, ranged_downloader)
+        assert content == Handler.files["/a.zip"]
+        size = len(content)
+        assert Handler.requests == [
+            None,
+            f"bytes=30000-{size - 1}",
+            f"bytes=60000-{size - 1}",
+        ]
+
+    def test_changed_without_content_length(self, server):
+        Handler.changed = True
+        Handler.no_drops = 1
+        ranged_downloader = RangedDownloader(chunk_size=10000, backoff=0)
+        with temp_dir(
+            "test_ranged_download", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download(user_agent="test") as downloader:
+                content = self.download(server, downloader, folder, ranged_downloader)
+        assert content == Handler.files["/a.zip"]
+        assert Handler.requests == [None, f"bytes=30000-{len(content) - 1}"]
+
+    def test_parts(self, server):
+        Handler.no_drops = 3
+        Handler.drop_after = 5000
+        ranged_downloader = RangedDownloader(
+            part_size=25000, parallel_min_size=50000, chunk_size=1000, backoff=0
+        )
+        with temp_dir(
+            "test_ranged_download", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download(user_agent="test") as downloader:
+                content = self.download(server, downloader, folder, ranged_downloader)
+        assert content == Handler.files["/a.zip"]
+        # Initial request, 5 parts, 2 resumed parts (first drop is the initial request)
+        assert len(Handler.requests) == 8
+
+    def test_no_ranges(self, server):
+        Handler.ranges = False
+        Handler.no_drops = 1
+        ranged_downloader = RangedDownloader(backoff=0)
+        with temp_dir(
+            "test_ranged_download", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download(user_agent="test") as downloader:
+                with pytest.raises(DownloadError):
+                    self.download(server, downloader, folder, ranged_downloader)
+                content = self.download(server, downloader, folder, ranged_downloader)
+        assert content == Handler.files["/a.zip"]
+
+    def test_bad_crc(self, server):
+        content = bytearray(Handler.files["/a.zip"])
+        content[1000] ^= 0xFF
+        Handler.files["/a.zip"] = bytes(content)
+        ranged_downloader = RangedDownloader(backoff=0)
+        with temp_dir(
+            "test_ranged_download", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download(user_agent="test") as downloader:
+                with pytest.raises(DownloadError, match="CRC"):
+                    self.download(server, downloader, folder, ranged_downloader)
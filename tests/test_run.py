@@ -0,0 +1,277 @@
+#!/usr/bin/python
+"""
+Unit tests for run cycles against a synthetic feed and stub HDX API.
+
+"""
+import threading
+from http.server import ThreadingHTTPServer
+from os import listdir, makedirs
+from os.path import join
+
+import pytest
+import run
+from benchmark import StubHDX, SyntheticADAM, make_handler, setup_hdx
+from country_index import CountryIndex
+from episode_store import EpisodeStore
+from fingerprints import ResourceFingerprints
+from hdx.data.hdxobject import HDXError
+from hdx.utilities.dateparse import parse_date
+from hdx.utilities.downloader import Download
+from hdx.utilities.path import temp_dir
+from hdx.utilities.uuid import get_uuid
+from http_cache import HTTPCache
+
+
+class FailingShowcasesHDX(StubHDX):
+    """Stub HDX API on which creating showcases fails while fail is True"""
+
+    fail = True
+
+    def action(self, name, data):
+        if self.fail and name == "ckanext_showcase_create":
+            return None
+        return super().action(name, data)
+
+
+class FailingDatasetHDX(FailingShowcasesHDX):
+    """Stub HDX API on which creating showcases fails and creating any dataset
+    after the first two fails"""
+
+    def action(self, name, data):
+        if name == "package_create" and self.calls.get(name, 0) >= 2:
+            return None
+        return super().action(name, data)
+
+
+class LeaseCountingHDX(StubHDX):
+    """Stub HDX API recording the number of leases held each time a dataset
+    is created"""
+
+    leases_folder = None
+
+    def __init__(self):
+        super().__init__()
+        self.leases_held = []
+
+    def action(self, name, data):
+        if name == "package_create":
+            self.leases_held.append(len(listdir(self.leases_folder)))
+        return super().action(name, data)
+
+
+class HDXProxy:
+    """Passes HDX API calls to the stub HDX API of the current test"""
+
+    api = None
+
+    def action(self, name, data):
+        return self.api.action(name, data)
+
+
+class TestRun:
+    @pytest.fixture(scope="function")
+    def world(self):
+        """Serve a synthetic feed and stub HDX API and yield a function that
+        sets them up in a folder returning the configuration and stub"""
+        files = {}
+        proxy = HDXProxy()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(files, proxy))
+        base_url = f"http://127.0.0.1:{server.server_port}"
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+
+        def setup(folder, no_events, hdx_class=StubHDX):
+            proxy.api = hdx_class()
+            generator = SyntheticADAM(folder, base_url, no_events, 1000, 10, 2)
+            files.update(generator.generate())
+            configuration = setup_hdx(base_url)
+            configuration["http_cache"]["folder"] = join(folder, "cache")
+            configuration["sharding"]["leases_folder"] = join(folder, "leases")
+            configuration["metrics"]["report"] = join(folder, "metrics_report.json")
+            configuration["showcases"]["backoff"] = 0
+            return configuration, proxy.api
+
+        yield setup
+        server.shutdown()
+        server.server_close()
+
+    @staticmethod
+    def run_cycle(configuration, folder, store, fingerprints, shards=1):
+        batch = get_uuid()
+        batch_folder = join(folder, batch)
+        makedirs(batch_folder)
+        with (
+            Download(user_agent="test") as downloader,
+            HTTPCache.from_configuration(configuration) as cache,
+        ):
+            return run.run_cycle(
+                configuration,
+                store,
+                downloader,
+                cache,
+                fingerprints,
+                {"folder": batch_folder, "batch": batch},
+                CountryIndex.from_countriesdata(),
+                False,
+                False,
+                None,
+                None,
+                shards,
+                "event_type",
+            )
+
+    def test_failed_showcases(self, world):
+        with temp_dir(
+            "test_run", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            configuration, hdx = world(folder, 3, FailingShowcasesHDX)
+            with (
+                EpisodeStore(join(folder, "episode_state.sqlite")) as store,
+                ResourceFingerprints(join(folder, "fingerprints.json")) as fingerprints,
+            ):
+                store.set_last_build_date(parse_date("2023-11-01"))
+                assert self.run_cycle(configuration, folder, store, fingerprints) == 3
+                # Datasets are published even though their showcases failed
+                assert hdx.calls["package_create"] == 3
+                assert store.get_unpublished() == []
+                failed_showcases = store.get_failed_showcases()
+                assert len(failed_showcases) == 5
+                # The next run only retries the showcases
+                hdx.fail = False
+                assert self.run_cycle(configuration, folder, store, fingerprints) == 0
+                assert hdx.calls["package_create"] == 3
+                assert store.get_failed_showcases() == []
+                assert len(hdx.showcases) == 10
+
+    def test_failed_dataset(self, world):
+        with temp_dir(
+            "test_run", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            configuration, hdx = world(folder, 3, FailingDatasetHDX)
+            with (
+                EpisodeStore(join(folder, "episode_state.sqlite")) as store,
+                ResourceFingerprints(join(folder, "fingerprints.json")) as fingerprints,
+            ):
+                store.set_last_build_date(parse_date("2023-11-01"))
+                with pytest.raises(HDXError):
+                    self.run_cycle(configuration, folder, store, fingerprints)
+                assert len(store.get_unpublished()) == 1
+                # The showcases of the datasets already published are recorded
+                # as failed so that they are retried next run
+                failed_showcases = store.get_failed_showcases()
+                assert len(failed_showcases) != 0
+                assert len({dataset["name"] for _, dataset in failed_showcases}) == 2
+
+    def test_leases_released(self, world):
+        with temp_dir(
+            "test_run", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            configuration, hdx = world(folder, 6, LeaseCountingHDX)
+            hdx.leases_folder = configuration["sharding"]["leases_folder"]
+            with (
+                EpisodeStore(join(folder, "episode_state.sqlite")) as store,
+                ResourceFingerprints(join(folder, "fingerprints.json")) as fingerprints,
+            ):
+                store.set_last_build_date(parse_date("2023-11-01"))
+                assert self.run_cycle(configuration, folder, store, fingerprints) == 6
+            # The lease of each published event is released before the next
+            # event is published
+            assert len(hdx.leases_held) == 6
+            assert hdx.leases_held[-1] == 1
+            assert listdir(hdx.leases_folder) == []
+
+    def test_shards(self, world):
+        with temp_dir(
+            "test_run", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            configuration, hdx = world(folder, 6)
+            with (
+                EpisodeStore(join(folder, "episode_state.sqlite")) as store,
+                ResourceFingerprints(join(folder, "fingerprints.json")) as fingerprints,
+            ):
+                store.set_last_build_date(parse_date("2023-11-01"))
+                assert (
+                    self.run_cycle(configuration, folder, store, fingerprints, 2) == 6
+                )
+                assert hdx.calls["package_create"] == 6
+                # The shards publish to the store of the coordinator
+                assert store.get_unpublished() == []
+                assert (
+                    self.run_cycle(configuration, folder, store, fingerprints, 2) == 0
+                )
+                assert hdx.calls["package_create"] == 6
+
+    def test_shards_merge_fingerprints(self, world):
+        with temp_dir(
+            "test_run", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            configuration, hdx = world(folder, 6)
+            fingerprints_path = join(folder, "fingerprints.json")
+            with (
+                EpisodeStore(join(folder, "episode_state.sqlite")) as store,
+                ResourceFingerprints(fingerprints_path) as fingerprints,
+            ):
+                store.set_last_build_date(parse_date("2023-11-01"))
+                assert self.run_cycle(configuration, folder, store, fingerprints) == 6
+                for fingerprint in fingerprints.fingerprints.values():
+                    fingerprint["hash"] = "stale"
+                    fingerprint["size"] = -1
+            # Publish the events again in shards, each of which loads the
+            # stale fingerprints of the events in the other shard
+            configuration, hdx = world(folder, 6)
+            with (
+                EpisodeStore(join(folder, "episode_state2.sqlite")) as store,
+                ResourceFingerprints(fingerprints_path) as fingerprints,
+            ):
+                store.set_last_build_date(parse_date("2023-11-01"))
+                assert (
+                    self.run_cycle(configuration, folder, store, fingerprints, 2) == 6
+                )
+                assert len(fingerprints.fingerprints) != 0
+                for fingerprint in fingerprints.fingerprints.values():
+                    assert fingerprint["hash"] != "stale"
+
+    def test_watch_failed_poll(self, world, monkeypatch):
+        with temp_dir(
+            "test_run", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            configuration, hdx = world(folder, 3)
+            configuration["watch"]["min_interval_minutes"] = 0
+            configuration["watch"]["max_interval_minutes"] = 0
+            stop = threading.Event()
+            polls = []
+
+            def get_country_index(configuration, today, country_index=None):
+                polls.append(country_index)
+                if len(polls) == 1:
+                    raise OSError("Countries data unavailable")
+                if len(polls) == 3:
+                    stop.set()
+                return country_index or CountryIndex.from_countriesdata()
+
+            monkeypatch.setattr(run, "get_country_index", get_country_index)
+            with (
+                EpisodeStore(join(folder, "episode_state.sqlite")) as store,
+                ResourceFingerprints(join(folder, "fingerprints.json")) as fingerprints,
+                Download(user_agent="test") as downloader,
+                HTTPCache.from_configuration(configuration) as cache,
+            ):
+                store.set_last_build_date(parse_date("2023-11-01"))
+                run.watch_feed(
+                    configuration,
+                    store,
+                    downloader,
+                    cache,
+                    fingerprints,
+                    {"folder": folder, "batch": get_uuid()},
+                    False,
+                    False,
+                    1,
+                    "event_type",
+                    stop,
+                )
+            # The loop keeps polling after the first poll fails and the
+            # country index is kept between polls
+            assert len(polls) == 3
+            assert polls[2] is not None
+            assert hdx.calls["package_create"] == 3
@@ -0,0 +1,62 @@
+#!/usr/bin/python
+"""
+Unit tests for sharding.
+
+"""
+from multiprocessing import get_context
+from os import listdir
+
+from hdx.utilities.path import temp_dir
+from sharding import EventLeases, partition_events
+
+
+def try_lease(folder, event_id):
+    with EventLeases(folder) as leases:
+        return leases.acquire(event_id)
+
+
+class TestSharding:
+    def test_partition_events(self):
+        event_types = {
+            "eq_1": "earthquakes",
+            "1": "cyclones",
+            "FL-1": "floods",
+            "eq_2": "earthquakes",
+            "FL-2": "floods",
+            "eq_3": "earthquakes",
+        }
+        events = [{"event_id": x} for x in event_types]
+
+        def get_key(event):
+            return event_types[event["event_id"]]
+
+        shards = partition_events(events, get_key, 2)
+        assert [(keys, [x["event_id"] for x in events]) for keys, events in shards] == [
+            (["earthquakes"], ["eq_1", "eq_2", "eq_3"]),
+            (["floods", "cyclones"], ["1", "FL-1", "FL-2"]),
+        ]
+        shards = partition_events(events, get_key, 5)
+        assert [keys for keys, _ in shards] == [
+            ["earthquakes"],
+            ["floods"],
+            ["cyclones"],
+        ]
+        assert partition_events([], get_key, 2) == []
+
+    def test_event_leases(self):
+        with temp_dir(
+            "test_sharding", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with get_context("fork").Pool(1) as pool:
+                with EventLeases(folder) as leases:
+                    assert leases.acquire("eq_1") is True
+                    assert leases.acquire("eq_1") is True
+                    # Another holder in this or another process cannot take it
+                    assert EventLeases(folder).acquire("eq_1") is False
+                    assert pool.apply(try_lease, (folder, "eq_1")) is False
+                    assert pool.apply(try_lease, (folder, "eq_2")) is True
+                    leases.release("eq_1")
+                    assert pool.apply(try_lease, (folder, "eq_1")) is True
+                    assert leases.acquire("eq_1") is True
+                    assert listdir(folder) == ["eq_1.lease"]
+                assert listdir(folder) == []
@@ -0,0 +1,109 @@
+#!/usr/bin/python
+"""
+Unit tests for the showcase publisher.
+
+"""
+import time
+from os.path import join
+
+from ckanapi.errors import CKANAPIError
+from episode_store import EpisodeStore
+from hdx.data.hdxobject import HDXError
+from hdx.utilities.path import temp_dir
+from showcase_publisher import ShowcasePublisher, TokenBucket, get_retryable_status
+
+
+def hdx_error(status):
+    try:
+        try:
+            raise CKANAPIError(repr(["https://hdx/api/action", status, "<html>"]))
+        except CKANAPIError as ex:
+            raise HDXError("Failed when trying to create showcase") from ex
+    except HDXError as ex:
+        return ex
+
+
+class FakeShowcase(dict):
+    """Records calls instead of calling HDX, failing with the given statuses
+    first"""
+
+    def __init__(self, name, statuses=()):
+        super().__init__(name=name, title=name)
+        self.statuses = list(statuses)
+        self.calls = []
+
+    @property
+    def data(self):
+        return dict(self)
+
+    def create_in_hdx(self):
+        if self.statuses:
+            raise hdx_error(self.statuses.pop(0))
+        self.calls.append("create")
+
+    def add_dataset(self, dataset):
+        self.calls.append(f"add {dataset['id']}")
+
+
+class TestShowcasePublisher:
+    def test_get_retryable_status(self):
+        assert get_retryable_status(hdx_error(429)) == 429
+        assert get_retryable_status(hdx_error(503)) == 503
+        assert get_retryable_status(hdx_error(400)) is None
+        assert get_retryable_status(ValueError("x")) is None
+
+    def test_token_bucket(self):
+        bucket = TokenBucket(100, 5)
+        start = time.monotonic()
+        for _ in range(15):
+            bucket.acquire()
+        # 5 tokens in the initial burst then 10 at 100 per second
+        assert time.monotonic() - start >= 0.09
+
+    def test_publish(self):
+        with temp_dir(
+            "test_showcase_publisher", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with EpisodeStore(join(folder, "episode_state.sqlite")) as store:
+                publisher = ShowcasePublisher(store, 2, 1000, 1000, 2, 0)
+                dataset1 = {"id": "1", "name": "dataset-1"}
+                dataset2 = {"id": "2", "name": "dataset-2"}
+                showcase1 = FakeShowcase("map", [429, 502])
+                showcase2 = FakeShowcase("wind", [429, 429, 429])
+                showcase3 = FakeShowcase("report", [400])
+                publisher.add(dataset1, [showcase1])
+                publisher.add(dataset2, [showcase2, showcase3])
+                assert publisher.finish() == {"dataset-2"}
+                assert showcase1.calls == ["create", "add 1"]
+                assert showcase2.calls == []
+                assert showcase3.calls == []
+                assert publisher.published == 1
+                assert store.get_failed_showcases() == [
+                    ({"name": "report", "title": "report"}, dataset2),
+                    ({"name": "wind", "title": "wind"}, dataset2),
+                ]
+
+                publisher = ShowcasePublisher(store, 2, 1000, 1000, 2, 0)
+                showcase1 = FakeShowcase("map")
+                showcase2 = FakeShowcase("wind")
+                publisher.add(dataset1, [showcase1])
+                publisher.add(dataset2, [showcase2])
+                assert publisher.finish() == set()
+                assert showcase1.calls == []
+                assert showcase2.calls == ["create", "add 2"]
+                assert (publisher.published, publisher.skipped) == (1, 1)
+                # Showcases that failed are retried even if their dataset is not
+                # published again
+                showcases = []
+
+                def make_showcase(data):
+                    showcase = FakeShowcase(data["name"])
+                    showcases.append(showcase)
+                    return showcase
+
+                publisher = ShowcasePublisher(store, 2, 1000, 1000, 2, 0)
+                assert publisher.retry_failed(make_showcase) == 1
+                assert publisher.finish() == set()
+                assert showcases[0].calls == ["create", "add 2"]
+                assert store.get_failed_showcases() == []
+                assert ShowcasePublisher().retry_failed(make_showcase) == 0
@@ -0,0 +1,45 @@
+#!/usr/bin/python
+"""
+Unit tests for Template.
+
+"""
+import pytest
+from template import Template
+
+
+class TestTemplate:
+    def test_render(self):
+        properties = {
+            "iso3": "PHL",
+            "event_id": "1001032",
+            "storm_status": "Tropical Depression",
+            "from_date": "2023-11-12",
+            "mag": 6.7,
+        }
+        template = Template("{properties['iso3']}-cyclone-{properties['event_id']}")
+        assert template.keys == {"iso3", "event_id"}
+        assert template.render(properties) == "PHL-cyclone-1001032"
+        template = Template(
+            "Cyclone ({properties['storm_status'].lower()}) from "
+            "{parse_date(properties['from_date']).strftime('%b %d %Y')} {{braces}}"
+        )
+        assert (
+            template.render(properties)
+            == "Cyclone (tropical depression) from Nov 12 2023 {braces}"
+        )
+        template = Template("{properties['mag']}M")
+        assert template.render(properties) == "6.7M"
+        with pytest.raises(ValueError, match="Properties place missing"):
+            Template("{properties['place']}").render(properties)
+
+    def test_invalid(self):
+        for template in (
+            "{__import__('os').system('ls')}",
+            "{properties['iso3'].replace('P', 'Q')}",
+            "{properties[0]}",
+            "{properties['iso3']",
+            "{properties['iso3'}",
+            "text }",
+        ):
+            with pytest.raises(ValueError):
+                Template(template)
@@ -0,0 +1,28 @@
+#!/usr/bin/python
+"""
+Unit tests for watch mode.
+
+"""
+from os.path import join
+
+import pytest
+from hdx.api.configuration import Configuration
+from watch import AdaptiveInterval
+
+
+class TestWatch:
+    @pytest.fixture(scope="function")
+    def configuration(self):
+        Configuration._create(
+            hdx_read_only=True,
+            user_agent="test",
+            project_config_yaml=join("config", "project_configuration.yaml"),
+        )
+        return Configuration.read()
+
+    def test_adaptive_interval(self, configuration):
+        interval = AdaptiveInterval.from_configuration(configuration)
+        assert interval.interval == 120
+        assert [interval.update(0) for _ in range(5)] == [240, 480, 960, 1800, 1800]
+        assert interval.update(3) == 120
+        assert interval.update(0) == 240
@@ -4,9 +4,14 @@ Unit tests for WFP ADAM.
 
 """
 from datetime import datetime, timezone
-from os.path import join
+from os.path import exists, getsize, join
+from zipfile import ZipFile
 
 import pytest
+from disk_budget import DiskBudget
+from episode import Episode
+from episode_store import EpisodeStore
+from fingerprints import ResourceFingerprints, hash_file
 from hdx.api.configuration import Configuration
 from hdx.api.locations import Locations
 from hdx.data.vocabulary import Vocabulary
@@ -42,6 +47,7 @@ class TestADAM:
                 {"name": "eth", "title": "eth"},
                 {"name": "idn", "title": "idn"},
                 {"name": "phl", "title": "phl"},
+                {"name": "som", "title": "som"},
             ]
         )
         configuration = Configuration.read()
@@ -103,13 +109,20 @@ class TestADAM:
                 resources = dataset.get_resources()
                 assert resources == [
                     {
-                        "dataset_preview_enabled": "True",
                         "description": "GeoJSON File",
                         "format": "geojson",
                         "name": "FL-20231114-ETH-01.geojson",
                         "resource_type": "file.upload",
                         "url_type": "upload",
                     },
+                    {
+                        "dataset_preview_enabled": "True",
+                        "description": "Simplified GeoJSON File for Preview",
+                        "format": "geojson",
+                        "name": "FL-20231114-ETH-01-preview.geojson",
+                        "resource_type": "file.upload",
+                        "url_type": "upload",
+                    },
                     {
                         "description": "GeoTIFF File",
                         "format": "geotiff",
@@ -158,13 +171,15 @@ class TestADAM:
                     ],
                     "data_update_frequency": "-1",
                     "dataset_date": "[2023-11-08T00:00:00 TO 2023-11-08T00:00:00]",
-                    "dataset_preview": "no_preview",
+                    "dataset_preview": "resource_id",
                     "groups": [{"name": "idn"}],
                     "maintainer": "196196be-6037-4488-8b71-d786adf4c081",
                     "name": "indonesia-earthquake-eq-us7000l9ku",
                     "notes": "**ADAM ID: eq\\_us7000l9ku**  Magnitude 6.7 earthquake at 10.0 depth occurred on Nov 08 2023 in "
                     "Banda Sea. It impacted 0 people. The epicentre was at latitude "
-                    "-6.1455 longitude 129.9137.",
+                    "-6.1455 longitude 129.9137.  Estimated population exposed by intensity "
+                    "is MMI 3: 2,008, MMI 4: 4,874, MMI 5: 4, MMI 6: 0 (total 6,886). Most "
+                    "exposed areas are Maluku, Indonesia (6,886).",
                     "owner_org": "1ca198b6-e490-4cd0-9c1a-5b91bad9879a",
                     "subnational": "1",
                     "tags": [
@@ -178,13 +193,20 @@ class TestADAM:
                 resources = dataset.get_resources()
                 assert resources == [
                     {
-                        "dataset_preview_enabled": "False",
                         "description": "Population Estimation",
                         "format": "csv",
                         "name": "sm-us7000l9ku-sm-us7000l9ku-pop-estimation.csv",
                         "resource_type": "file.upload",
                         "url_type": "upload",
-                    }
+                    },
+                    {
+                        "dataset_preview_enabled": "True",
+                        "description": "Population Estimation by Admin 1",
+                        "format": "csv",
+                        "name": "sm-us7000l9ku-sm-us7000l9ku-pop-estimation-summary.csv",
+                        "resource_type": "file.upload",
+                        "url_type": "upload",
+                    },
                 ]
                 assert showcases == [
                     {
@@ -279,3 +301,248 @@ class TestADAM:
                         "url": "https://adam-project-prod.s3-eu-west-1.amazonaws.com/adam_ts/events/2023/11/1001032_6/adam_ts_1001032_6_rain5d.jpg",
                     },
                 ]
+
+    def test_parse_eventtypes_feeds_isolates_failures(
+        self,
+        configuration,
+        input_folder,
+    ):
+        with temp_dir(
+            "test_wfp_adam", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                today = parse_date("2023-11-17")
+                adam = ADAM(configuration, retriever, today, folder)
+                adam.parse_feed(parse_date("2023-11-08"))
+                episode = adam.latest_episodes["eq_us7000l9h2"]
+                episode.event_details = episode.event_details.replace(
+                    "us7000l9h2", "missing"
+                )
+                adam.parse_eventtypes_feeds()
+                events = adam.get_events()
+                assert [event["event_id"] for event in events] == [
+                    "FL-20231114-ETH-01",
+                    "FL-20231114-SOM-00",
+                    "1001032",
+                    "FL-20231109-ETH-00",
+                    "eq_us7000l9ku",
+                ]
+
+    def test_disk_budget(
+        self,
+        configuration,
+        input_folder,
+    ):
+        with temp_dir(
+            "test_wfp_adam", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                today = parse_date("2023-11-17")
+                disk_budget = DiskBudget(folder, 0)
+                adam = ADAM(
+                    configuration, retriever, today, folder, disk_budget=disk_budget
+                )
+                adam.parse_feed(parse_date("2023-11-08"))
+                adam.parse_eventtypes_feeds()
+                events = adam.get_events()
+                dataset, _ = adam.generate_dataset(events[0])
+                event_folder = join(folder, "ethiopia-flood-fl-20231114-eth-01")
+                paths = [x.get_file_to_upload() for x in dataset.get_resources()]
+                assert all(x.startswith(event_folder) for x in paths)
+                # Saved data is read from the input folder so is not tracked
+                assert disk_budget.usage == sum(getsize(x) for x in paths)
+                assert disk_budget.release("FL-20231114-ETH-01") == disk_budget.peak
+                assert not exists(event_folder)
+
+    def test_unchanged_resources(
+        self,
+        configuration,
+        input_folder,
+    ):
+        with temp_dir(
+            "test_wfp_adam", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                csv_name = "sm-us7000l9h2-sm-us7000l9h2-pop-estimation.csv"
+                path = join(input_folder, csv_name)
+                url = (
+                    f"https://data.humdata.org/dataset/x/resource/y/download/{csv_name}"
+                )
+                fingerprints = ResourceFingerprints(join(folder, "fingerprints.json"))
+                fingerprints.fingerprints = {
+                    f"indonesia-earthquake-eq-us7000l9h2/{csv_name}": {
+                        "hash": hash_file(path),
+                        "size": 215,
+                        "url": url,
+                    }
+                }
+                today = parse_date("2023-11-17")
+                adam = ADAM(configuration, retriever, today, folder, fingerprints)
+                adam.parse_feed(parse_date("2023-11-08"))
+                adam.parse_eventtypes_feeds()
+                events = adam.get_events()
+                event = [x for x in events if x["event_id"] == "eq_us7000l9h2"][0]
+                dataset, _ = adam.generate_dataset(event)
+                resource = dataset.get_resources()[0]
+                assert resource["url"] == url
+                assert resource.get_file_to_upload() is None
+                assert fingerprints.skipped == 1
+
+                event = [x for x in events if x["event_id"] == "eq_us7000l9ku"][0]
+                dataset, _ = adam.generate_dataset(event)
+                resource = dataset.get_resources()[0]
+                assert "url" not in resource
+                assert resource.get_file_to_upload().endswith(".csv")
+                resource["url"] = "https://data.humdata.org/uploaded.csv"
+                summary = dataset.get_resources()[1]
+                summary["url"] = "https://data.humdata.org/uploaded-summary.csv"
+                fingerprints.record(dataset)
+                fingerprints.save()
+                key = "indonesia-earthquake-eq-us7000l9ku/sm-us7000l9ku-sm-us7000l9ku-pop-estimation.csv"
+                assert fingerprints.fingerprints[key]["url"] == resource["url"]
+                # Summary of first dataset was not recorded as it was not uploaded
+                assert list(fingerprints.pending) == [
+                    "indonesia-earthquake-eq-us7000l9h2/sm-us7000l9h2-sm-us7000l9h2-pop-estimation-summary.csv"
+                ]
+                assert ResourceFingerprints(fingerprints.path).fingerprints[key] == (
+                    fingerprints.fingerprints[key]
+                )
+
+                with ZipFile(
+                    join(input_folder, "20231114-fl-20231114-som-00.zip")
+                ) as zipfile:
+                    zipinfo = zipfile.getinfo("FL-20231114-SOM-00.tiff")
+                key = "somalia-flood-fl-20231114-som-00/FL-20231114-SOM-00.tiff"
+                fingerprints.fingerprints[key] = {
+                    "hash": "abc",
+                    "size": zipinfo.file_size,
+                    "crc": zipinfo.CRC,
+                    "url": url,
+                }
+                event = [x for x in events if x["event_id"] == "FL-20231114-SOM-00"][0]
+                dataset, _ = adam.generate_dataset(event)
+                resources = dataset.get_resources()
+                assert resources[2]["url"] == url
+                assert fingerprints.skipped == 2
+                event_folder = join(folder, "somalia-flood-fl-20231114-som-00")
+                assert not exists(join(event_folder, "FL-20231114-SOM-00.tiff"))
+                path = resources[3].get_file_to_upload()
+                assert path == join(event_folder, "FL-20231114-SOM-00.gpkg")
+                key = "somalia-flood-fl-20231114-som-00/FL-20231114-SOM-00.gpkg"
+                assert fingerprints.pending[key] == {
+                    "hash": hash_file(path),
+                    "size": 266240,
+                    "crc": 4027481993,
+                }
+
+    def test_parse_feed_windows(
+        self,
+        configuration,
+        input_folder,
+    ):
+        with temp_dir(
+            "test_wfp_adam", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                today = parse_date("2023-11-17")
+                adam = ADAM(configuration, retriever, today, folder)
+                adam.parse_feed(parse_date("2023-11-08"))
+                expected = {
+                    event_id: episode.guid
+                    for event_id, episode in adam.latest_episodes.items()
+                }
+                adam = ADAM(configuration, retriever, today, folder)
+                adam.parse_feed_windows(
+                    parse_date("2023-11-08"), parse_date("2023-11-17"), 5, 2
+                )
+                assert {
+                    event_id: episode.guid
+                    for event_id, episode in adam.latest_episodes.items()
+                } == expected
+                assert len(expected) == 6
+
+    def test_snapshot(
+        self,
+        configuration,
+        input_folder,
+    ):
+        with temp_dir(
+            "test_wfp_adam", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                today = parse_date("2023-11-17")
+                adam = ADAM(configuration, retriever, today, folder)
+                adam.parse_feed(parse_date("2023-11-08"))
+                adam.parse_eventtypes_feeds()
+                path = join(folder, "feed_snapshot.pickle")
+                key = {"batch": "1234", "backfill_start": None, "backfill_end": None}
+                adam.save_snapshot(path, key)
+                resumed = ADAM(configuration, retriever, today, folder)
+                assert resumed.load_snapshot(path, {**key, "batch": "5678"}) is False
+                assert resumed.load_snapshot(path, key) is True
+                assert resumed.get_events() == adam.get_events()
+                assert resumed.latest_episodes == adam.latest_episodes
+                episode = resumed.latest_episodes["FL-20231114-ETH-01"]
+                assert episode.title == adam.latest_episodes[episode.event_id].title
+                dataset, _ = resumed.generate_dataset(resumed.get_events()[2])
+                assert dataset["name"] == "philippines-cyclone-1001032"
+                with open(path, "wb") as fp:
+                    fp.write(b"corrupt")
+                assert resumed.load_snapshot(path, key) is False
+                assert resumed.load_snapshot(join(folder, "missing"), key) is False
+
+    def test_published_episodes(
+        self,
+        configuration,
+        input_folder,
+    ):
+        with temp_dir(
+            "test_wfp_adam", delete_on_success=True, delete_on_failure=False
+        ) as folder:
+            with Download() as downloader:
+                retriever = Retrieve(
+                    downloader, folder, input_folder, folder, False, True
+                )
+                today = parse_date("2023-11-17")
+                with EpisodeStore(join(folder, "episode_state.sqlite")) as store:
+                    adam = ADAM(configuration, retriever, today, folder, store=store)
+                    adam.parse_feed(parse_date("2023-11-08"))
+                    adam.parse_eventtypes_feeds()
+                    assert len(store.get_unpublished()) == 6
+                    store.mark_published("eq_us7000l9ku")
+                    # A later episode of the cyclone has already been published
+                    later_episode = Episode(
+                        "1001032_5",
+                        "1001032",
+                        "5",
+                        "cyclones",
+                        "PHL",
+                        "2023-11-13T10:00:00",
+                        "https://x/cyclones/1001032",
+                    )
+                    store.mark_fetched(later_episode, {})
+                    store.mark_published("1001032_5")
+
+                    adam = ADAM(configuration, retriever, today, folder, store=store)
+                    adam.parse_feed(parse_date("2023-11-08"))
+                    assert sorted(adam.latest_episodes) == [
+                        "FL-20231109-ETH-00",
+                        "FL-20231114-ETH-01",
+                        "FL-20231114-SOM-00",
+                        "eq_us7000l9h2",
+                    ]
@@ -0,0 +1,61 @@
+#!/usr/bin/python
+"""
+Watch:
+-----
+
+Adaptive polling interval for watch mode. The feed is polled at the minimum
+interval while new episodes are appearing and the interval backs off towards
+the maximum while the feed is quiet.
+
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class AdaptiveInterval:
+    """Interval between polls of the feed
+
+    Args:
+        min_interval (float): Interval in seconds while new episodes are appearing
+        max_interval (float): Longest interval in seconds
+        factor (float): Factor by which interval grows after a quiet poll. Defaults to 2.
+    """
+
+    def __init__(self, min_interval, max_interval, factor=2):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.factor = factor
+        self.interval = min_interval
+
+    @classmethod
+    def from_configuration(cls, configuration):
+        """Create interval from watch section of project configuration
+
+        Args:
+            configuration (Configuration): HDX configuration
+
+        Returns:
+            AdaptiveInterval: Interval
+        """
+        watch_info = configuration["watch"]
+        return cls(
+            watch_info["min_interval_minutes"] * 60,
+            watch_info["max_interval_minutes"] * 60,
+            watch_info["backoff_factor"],
+        )
+
+    def update(self, no_events):
+        """Update interval after a poll
+
+        Args:
+            no_events (int): Number of events with new episodes found by poll
+
+        Returns:
+            float: Seconds to wait before next poll
+        """
+        if no_events:
+            self.interval = self.min_interval
+        else:
+            self.interval = min(self.interval * self.factor, self.max_interval)
+        return self.interval
@@ -7,140 +7,423 @@ Reads WFP ADAM data and creates datasets.
 
 """
 import logging
+import pickle
 import re
-from os import rename
-from os.path import basename, splitext
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from os import makedirs, replace
+from os.path import basename, exists, join, splitext
+from shutil import copyfileobj
 from zipfile import ZipFile
 
-from hdx.data.dataset import Dataset
-from hdx.data.resource import Resource
-from hdx.data.showcase import Showcase
-from hdx.location.country import Country
+import ijson
+from cog_output import COGConverter
+from columnar_output import ColumnarConverter
+from country_index import CountryIndex
+from episode import Episode, episode_order
 from hdx.utilities.base_downloader import DownloadError
 from hdx.utilities.dateparse import parse_date
+from metrics import Metrics
 from slugify import slugify
+from template import Template
 
 logger = logging.getLogger(__name__)
 
 
-def lazy_fstr(template, properties):
-    return eval(f'f"""{template}"""')
+def extract_member(zipfile, zipinfo, path, chunk_size=1048576):
+    """Extract a zip member directly to path in fixed size chunks
+
+    Args:
+        zipfile (ZipFile): Open zip file
+        zipinfo (ZipInfo): Member to extract
+        path (str): Path to write member to
+        chunk_size (int): Size of chunks to copy. Defaults to 1048576.
+
+    Returns:
+        str: path
+    """
+    with zipfile.open(zipinfo) as source, open(path, "wb") as destination:
+        copyfileobj(source, destination, chunk_size)
+    return path
 
 
 class ADAM:
     regex = re.compile(r".*/(.*)/(.*)")
 
-    def __init__(self, configuration, retriever, today, folder):
+    def __init__(
+        self,
+        configuration,
+        retriever,
+        today,
+        folder,
+        fingerprints=None,
+        country_index=None,
+        metrics=None,
+        store=None,
+        disk_budget=None,
+    ):
         self.configuration = configuration
         self.retriever = retriever
+        self.fingerprints = fingerprints
+        if country_index is None:
+            country_index = CountryIndex.from_countriesdata()
+        self.country_index = country_index
+        if metrics is None:
+            metrics = Metrics()
+        self.metrics = metrics
+        self.store = store
+        self.disk_budget = disk_budget
+        self.thread_local = threading.local()
         self.today = today.date().isoformat()
         self.folder = folder
         self.last_build_date = None
         self.latest_episodes = {}
         self.events = []
+        self.columnar_converter = ColumnarConverter.from_configuration(configuration)
+        self.cog_converter = COGConverter.from_configuration(configuration)
+        self.templates = {}
+        for event_type, eventtype_info in configuration["event_types"].items():
+            templates = {}
+            for key in ("name", "title", "description"):
+                try:
+                    templates[key] = Template(eventtype_info[key])
+                except ValueError as ex:
+                    raise ValueError(f"{event_type} {key}: {ex}") from ex
+            self.templates[event_type] = templates
 
-    def parse_feed(self, previous_build_date):
+    def get_retriever(self):
+        # Download keeps the current response on the object so each worker
+        # thread gets its own clone that shares the HTTP session
+        if threading.current_thread() is threading.main_thread():
+            return self.retriever
+        retriever = getattr(self.thread_local, "retriever", None)
+        if retriever is None:
+            from hdx.utilities.downloader import Download
+
+            session = self.retriever.downloader.session
+            retriever = self.retriever.clone(Download(session=session))
+            self.thread_local.retriever = retriever
+        return retriever
+
+    def iterate_feed(self, url):
+        # Stream the feed to disk and parse it item by item so that memory use
+        # does not grow with the size of the feed
+        retriever = self.get_retriever()
+        filename, _ = retriever.get_filename(url, None, ("json",), file_prefix="")
+        path = retriever.download_file(url, filename=filename)
+        with open(path, "rb") as fp:
+            yield from ijson.items(fp, "item", use_float=True)
+
+    def get_feed_url(self, start_date, end_date):
         url = self.configuration["url"]
+        return f"{url}feed?start_date={start_date}&end_date={end_date}"
+
+    def parse_feed_item(self, event, previous_build_date):
+        countryiso = event["eventISO3"]
+        if not countryiso:
+            logger.error(f"Blank eventISO3!")
+            return None
+        if not self.country_index.get_country_name(countryiso):
+            logger.error(f"Unknown eventISO3 {countryiso}!")
+            return None
+        if self.country_index.is_high_income(countryiso):
+            logger.info(f"ignoring high income country {countryiso}!")
+            return None
+        published = parse_date(event["pubDate"])
+        if published <= previous_build_date:
+            return None
+        m = self.regex.match(event["eventDetails"])
+        event_type = m.group(1)
+        eventtype_info = self.configuration["event_types"].get(event_type)
+        if not eventtype_info:
+            return None
+        guid = event["guid"]
+        parts = guid.split("_")
+        event_id_index = eventtype_info["event_id_index"]
+        event_id = parts[event_id_index]
+        prefix_index = eventtype_info["prefix_index"]
+        if prefix_index is not None:
+            prefix = parts[prefix_index]
+            if prefix not in eventtype_info["allowed_prefixes"]:
+                return None
+            event_id = f"{prefix}_{event_id}"
+        episode_id_index = eventtype_info["episode_id_index"]
+        if episode_id_index is None:
+            episode_id = None
+        else:
+            episode_id = parts[episode_id_index]
+        return Episode(
+            guid,
+            event_id,
+            episode_id,
+            event_type,
+            countryiso,
+            event["pubDate"],
+            event["eventDetails"],
+        )
+
+    @staticmethod
+    def add_latest_episode(latest_episodes, episode):
+        prev_episode = latest_episodes.get(episode.event_id)
+        if prev_episode is None or episode.is_later_than(prev_episode):
+            latest_episodes[episode.event_id] = episode
+
+    def parse_feed(self, previous_build_date):
         start_date = previous_build_date.date().isoformat()
-        url = f"{url}feed?start_date={start_date}&end_date={self.today}"
-        for event in self.retriever.download_json(url):
-            countryiso = event["eventISO3"]
-            if not countryiso:
-                logger.error(f"Blank eventISO3!")
-                continue
-            countryinfo = Country.get_country_info_from_iso3(countryiso)
-            income_level = countryinfo["#indicator+incomelevel"]
-            if income_level.lower() == "high":
-                logger.info(f"ignoring high income country {countryiso}!")
-                continue
-            published = parse_date(event["pubDate"])
-            if published <= previous_build_date:
-                continue
-            m = self.regex.match(event["eventDetails"])
-            event_type = m.group(1)
-            eventtype_info = self.configuration["event_types"].get(event_type)
-            if not eventtype_info:
+        url = self.get_feed_url(start_date, self.today)
+        with self.metrics.span("parse_feed"):
+            self.add_feed_items(self.iterate_feed(url), previous_build_date)
+        self.drop_published()
+
+    def add_feed_items(self, items, previous_build_date):
+        for event in items:
+            episode = self.parse_feed_item(event, previous_build_date)
+            if episode:
+                self.add_latest_episode(self.latest_episodes, episode)
+
+    def drop_published(self):
+        # Drop events whose latest episode, or a later one, has already been
+        # published. Feed items may be seen again because run.py overlaps the
+        # feed with the previous run to pick up late episodes.
+        if self.store is None:
+            return
+        no_dropped = 0
+        for event_id, episode in list(self.latest_episodes.items()):
+            if self.store.published_by_legacy(episode):
+                del self.latest_episodes[event_id]
+                no_dropped += 1
                 continue
-            event["event_type"] = event_type
-            guid = event["guid"]
-            parts = guid.split("_")
-            event_id_index = eventtype_info["event_id_index"]
-            event_id = parts[event_id_index]
-            prefix_index = eventtype_info["prefix_index"]
-            if prefix_index is not None:
-                prefix = parts[prefix_index]
-                if prefix not in eventtype_info["allowed_prefixes"]:
-                    continue
-                event_id = f"{prefix}_{event_id}"
-            episode_id_index = eventtype_info["episode_id_index"]
-            if episode_id_index is None:
-                episode_id = None
-            else:
-                episode_id = parts[episode_id_index]
-            prev_event = self.latest_episodes.get(event_id)
-            if prev_event is None or (
-                episode_id and episode_id > prev_event["episode_id"]
-            ):
-                event["event_id"] = event_id
-                event["episode_id"] = episode_id
-                self.latest_episodes[event_id] = event
-
-    def parse_eventtype_feed(self, event):
-        json = self.retriever.download_json(event["eventDetails"])
+            episode_id = episode.episode_id
+            for guid, published_episode_id in self.store.get_published(event_id):
+                if guid == episode.guid or (
+                    episode_id
+                    and published_episode_id
+                    and episode_order(episode_id) <= episode_order(published_episode_id)
+                ):
+                    del self.latest_episodes[event_id]
+                    no_dropped += 1
+                    break
+        logger.info(f"Skipping {no_dropped} events already published")
+
+    def parse_feed_window(self, start_date, end_date, previous_build_date):
+        url = self.get_feed_url(start_date.isoformat(), end_date.isoformat())
+        latest_episodes = {}
+        no_items = 0
+        with self.metrics.span(
+            "parse_feed",
+            start_date=start_date.isoformat(),
+            end_date=end_date.isoformat(),
+        ):
+            for event in self.iterate_feed(url):
+                no_items += 1
+                episode = self.parse_feed_item(event, previous_build_date)
+                if episode:
+                    self.add_latest_episode(latest_episodes, episode)
+        return latest_episodes, no_items
+
+    def parse_feed_windows(self, start_date, end_date, window_days, max_workers=1):
+        """Backfill by splitting start_date to end_date into windows of
+        window_days days whose feeds are fetched concurrently. The episodes
+        of all windows are merged keeping the latest episode of each event.
+
+        Args:
+            start_date (datetime): Start date
+            end_date (datetime): End date
+            window_days (int): Number of days in each window
+            max_workers (int): Number of windows to fetch at once. Defaults to 1.
+
+        Returns:
+            None
+        """
+        windows = []
+        window_start = start_date.date()
+        last_date = end_date.date()
+        while True:
+            window_end = min(window_start + timedelta(days=window_days), last_date)
+            windows.append((window_start, window_end))
+            if window_end >= last_date:
+                break
+            window_start = window_end
+        no_windows = len(windows)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.parse_feed_window, *window, start_date)
+                for window in windows
+            ]
+            # Merge in window order so that the result is deterministic
+            for i, (window, future) in enumerate(zip(windows, futures)):
+                latest_episodes, no_items = future.result()
+                for episode in latest_episodes.values():
+                    self.add_latest_episode(self.latest_episodes, episode)
+                logger.info(
+                    f"Window {i + 1}/{no_windows} {window[0]} to {window[1]}: "
+                    f"{no_items} feed items, {len(latest_episodes)} episodes"
+                )
+        self.drop_published()
+
+    def parse_eventtype_feed(self, episode):
+        with self.metrics.span("parse_eventtype_feed", episode.event_id):
+            return self._parse_eventtype_feed(episode)
+
+    def _parse_eventtype_feed(self, episode):
+        json = self.get_retriever().download_json(episode.event_details)
+        if self.store:
+            self.store.mark_fetched(episode, json)
         features = json.get("features")
         if features:
             episode_ids = []
             for feature in features:
                 episode_ids.append(feature["properties"]["episode_id"])
             if not episode_ids:
-                return
+                return None
             properties = features[0]["properties"]
         else:
             episode_ids = None
             properties = json["properties"]
         countryiso = properties["iso3"]
         if not countryiso:
-            properties["iso3"] = event["eventISO3"]
-        event_id = event["event_id"]
+            properties["iso3"] = episode.countryiso
+        event_id = episode.event_id
         if event_id not in properties:
             properties["event_id"] = event_id
-        event["properties"] = properties
-        event_type = event["event_type"]
-        eventtype_info = self.configuration["event_types"].get(event_type)
-        name = eventtype_info["name"]
-        event["name"] = lazy_fstr(name, properties)
-        title = eventtype_info["title"]
-        event["title"] = lazy_fstr(title, properties)
-        description = eventtype_info["description"]
-        event["description"] = lazy_fstr(description, properties)
-        self.events.append(
-            {"event_id": event_id, "title": title, "episode_ids": episode_ids}
-        )
+        episode.properties = properties
+        templates = self.templates[episode.event_type]
+        episode.name = templates["name"].render(properties)
+        episode.title = templates["title"].render(properties)
+        episode.description = templates["description"].render(properties)
+        return {
+            "event_id": event_id,
+            "title": episode.title,
+            "episode_ids": episode_ids,
+        }
 
     def parse_eventtypes_feeds(self):
-        for event in self.latest_episodes.values():
-            self.parse_eventtype_feed(event)
+        episodes = list(self.latest_episodes.values())
+        max_workers = self.configuration.get("fetch_workers", 1)
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(self.parse_eventtype_feed, episode)
+                for episode in episodes
+            ]
+            # Collect in feed order so that self.events is deterministic
+            for episode, future in zip(episodes, futures):
+                try:
+                    event = future.result()
+                except Exception as ex:
+                    logger.exception(f"Error parsing {episode.event_details}: {ex}")
+                    continue
+                if event:
+                    self.events.append(event)
 
     def get_events(self):
         return self.events
 
-    def generate_dataset(
+    def save_snapshot(self, path, key):
+        """Save latest episodes, with their rendered names, titles,
+        descriptions and properties, and events so that a resumed run does
+        not need to read the feeds again
+
+        Args:
+            path (str): Path of snapshot
+            key (Dict): Arguments the feeds were read with
+
+        Returns:
+            None
+        """
+        snapshot = {
+            "key": key,
+            "latest_episodes": self.latest_episodes,
+            "events": self.events,
+        }
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "wb") as fp:
+            pickle.dump(snapshot, fp, protocol=pickle.HIGHEST_PROTOCOL)
+        replace(temp_path, path)
+
+    def load_snapshot(self, path, key):
+        """Load latest episodes and events from snapshot if it was saved with
+        the same arguments
+
+        Args:
+            path (str): Path of snapshot
+            key (Dict): Arguments the feeds would be read with
+
+        Returns:
+            bool: True if snapshot was loaded
+        """
+        if not exists(path):
+            return False
+        try:
+            with open(path, "rb") as fp:
+                snapshot = pickle.load(fp)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError) as ex:
+            logger.warning(f"Ignoring unreadable snapshot {path}: {ex}")
+            return False
+        if snapshot["key"] != key:
+            logger.info(f"Ignoring snapshot {path} made with different arguments")
+            return False
+        self.latest_episodes = snapshot["latest_episodes"]
+        self.events = snapshot["events"]
+        logger.info(f"Loaded {len(self.events)} events from snapshot {path}")
+        return True
+
+    def simplify_geojson(self, zipfile, zipinfo, path, event_id):
+        """Make simplified GeoJSON for preview from zip member
+
+        Args:
+            zipfile (ZipFile): Open zip file
+            zipinfo (ZipInfo): GeoJSON member
+            path (str): Path to write simplified GeoJSON to
+            event_id (str): Event id
+
+        Returns:
+            Optional[str]: path or None if GeoJSON could not be simplified
+        """
+        from geojson_preview import GeoJSONSimplifier
+
+        preview_info = self.configuration["geojson_preview"]
+        simplifier = GeoJSONSimplifier(
+            preview_info["tolerance"],
+            preview_info["precision"],
+            preview_info["max_comparisons"],
+        )
+        try:
+            with self.metrics.span("simplify", event_id):
+                with zipfile.open(zipinfo) as fp:
+                    return simplifier.simplify(fp, path)
+        except (ValueError, KeyError, IndexError) as ex:
+            logger.exception(f"Could not simplify {zipinfo.filename}: {ex}")
+            return None
+
+    def generate_dataset(self, event):
+        with self.metrics.span("generate_dataset", event["event_id"]):
+            return self._generate_dataset(event)
+
+    def _generate_dataset(
         self,
         event,
     ):
         """ """
+        # Imported here as the HDX data stack and NumPy are slow to import
+        # and are not needed to check the feed
+        from hdx.data.dataset import Dataset
+        from hdx.data.resource import Resource
+        from hdx.data.showcase import Showcase
+        from population_summary import PopulationSummary
+
         event_id = event["event_id"]
         episode = self.latest_episodes[event_id]
-        properties = episode["properties"]
-        name = episode["name"]
-        title = episode["title"]
+        properties = episode.properties
+        name = episode.name
+        title = episode.title
         countryiso = properties["iso3"]
-        countryname = Country.get_country_name_from_iso3(countryiso)
+        countryname = self.country_index.get_country_name(countryiso)
         slugified_name = slugify(f"{countryname}{name[3:]}")
         title = f"{countryname}{title[3:]}"
         logger.info(f"Creating dataset: {title}")
-        guid = episode["guid"].replace("_", "\_")
-        description = f"**ADAM ID: {guid}**  {episode['description']}"
+        guid = episode.guid.replace("_", "\_")
+        description = f"**ADAM ID: {guid}**  {episode.description}"
         dataset = Dataset(
             {
                 "name": slugified_name,
@@ -153,7 +436,7 @@ class ADAM:
         dataset.set_expected_update_frequency("Never")
         dataset.set_subnational(True)
         dataset.add_country_location(countryiso)
-        event_type = episode["event_type"]
+        event_type = episode.event_type
         tags = [event_type]
         from_date = properties.get("from_date")
         to_date = properties.get("to_date")
@@ -163,7 +446,12 @@ class ADAM:
         else:
             dataset.set_time_period(published_at)
 
-        def add_resource(path, description, preview=False):
+        def track(path):
+            # Files are deleted by the disk budget once the event is published
+            if self.disk_budget:
+                self.disk_budget.add(event_id, path)
+
+        def add_resource(path, description, preview=False, member=None):
             name = basename(path)
             filename, extension = splitext(name)
             resource = Resource(
@@ -177,7 +465,26 @@ class ADAM:
             else:
                 extension = extension[1:]
             resource.set_file_type(extension)
-            resource.set_file_to_upload(path)
+            url = None
+            crc = None
+            if member:
+                zipfile, zipinfo = member
+                crc = zipinfo.CRC
+                if self.fingerprints:
+                    url = self.fingerprints.check_member(slugified_name, name, zipinfo)
+                if not url:
+                    with self.metrics.span("extract", event_id, member=name):
+                        extract_member(zipfile, zipinfo, path)
+            if self.fingerprints and not url:
+                url = self.fingerprints.check(slugified_name, name, path, crc)
+            if url:
+                # File is unchanged so keep previously uploaded file
+                resource["url"] = url
+                resource["url_type"] = "upload"
+                resource["resource_type"] = "file.upload"
+            else:
+                resource.set_file_to_upload(path)
+            track(path)
             dataset.add_update_resource(resource)
             if preview:
                 resource.enable_dataset_preview()
@@ -185,12 +492,52 @@ class ADAM:
 
         def add_resource_with_url(url, description):
             try:
-                path = self.retriever.download_file(url)
+                with self.metrics.span("download", event_id, url=url):
+                    path = self.get_retriever().download_file(url)
                 add_resource(path, description)
-                return True
+                return path
             except DownloadError as ex:
                 logger.exception(ex)
+                return None
+
+        def add_columnar_resources(source, path_stem):
+            with self.metrics.span("convert", event_id):
+                outputs = self.columnar_converter.convert(source, path_stem)
+            for path, description in outputs:
+                add_resource(path, description)
+
+        def add_geotiff_resource(zippath, member, path):
+            # GDAL reads the member without extracting it
+            source = f"/vsizip/{zippath}/{member[1].filename}"
+            with self.metrics.span("cog", event_id):
+                statistics = self.cog_converter.convert(source, path)
+            if statistics is None:
+                add_resource(path, "GeoTIFF File", member=member)
+                return
+            add_resource(path, "Cloud-Optimized GeoTIFF File")
+            if statistics:
+                description = self.cog_converter.get_description(
+                    basename(path), statistics
+                )
+                dataset["notes"] = f"{dataset['notes']}  {description}"
+
+        def add_population_summary(path):
+            try:
+                with self.metrics.span("summarise", event_id):
+                    summary = PopulationSummary.read(path)
+            except ValueError as ex:
+                logger.exception(ex)
+                return False
+            if summary is None:
+                return False
+            dataset["notes"] = f"{dataset['notes']}  {summary.get_description()}"
+            if not summary.admin_totals:
                 return False
+            # Saved data may be read from a different folder so write to ours
+            filename = f"{splitext(basename(path))[0]}-summary.csv"
+            summary_path = summary.save(join(self.folder, filename))
+            add_resource(summary_path, "Population Estimation by Admin 1", preview=True)
+            return True
 
         showcases = []
 
@@ -213,26 +560,58 @@ class ADAM:
         analysis_output = properties.get("analysis_output")
         if analysis_output:
             url_dict = None
+            # Members are extracted to a folder per dataset as different
+            # events have members with the same name eg. metadata.txt
+            event_folder = join(self.folder, slugified_name)
+            makedirs(event_folder, exist_ok=True)
             try:
-                zippath = self.retriever.download_file(analysis_output)
+                with self.metrics.span("download", event_id, url=analysis_output):
+                    zippath = self.get_retriever().download_file(analysis_output)
+                track(zippath)
                 with ZipFile(zippath, "r") as zipfile:
-                    filenamelist = zipfile.namelist()
                     order = ["json", "tiff", "gpkg", ".txt"]
-                    filenames = {x[-4:]: x for x in filenamelist if x[-4:] in order}
-                    sorted_extensions = sorted(filenames, key=lambda x: order.index(x))
+                    zipinfos = {
+                        x.filename[-4:]: x
+                        for x in zipfile.infolist()
+                        if x.filename[-4:] in order
+                    }
+                    sorted_extensions = sorted(zipinfos, key=lambda x: order.index(x))
                     for extension in sorted_extensions:
-                        path = zipfile.extract(filenames[extension], path=self.folder)
+                        zipinfo = zipinfos[extension]
+                        path = join(event_folder, basename(zipinfo.filename))
+                        member = (zipfile, zipinfo)
                         if path.endswith("json"):
-                            oldpath = path
-                            path = oldpath.replace("json", "geojson")
-                            rename(oldpath, path)
-                            add_resource(path, "GeoJSON File", preview=True)
+                            preview_path = f"{path[:-5]}-preview.geojson"
+                            path = f"{path[:-4]}geojson"
+                            preview_path = self.simplify_geojson(
+                                zipfile, zipinfo, preview_path, event_id
+                            )
+                            add_resource(
+                                path,
+                                "GeoJSON File",
+                                preview=preview_path is None,
+                                member=member,
+                            )
+                            if preview_path:
+                                add_resource(
+                                    preview_path,
+                                    "Simplified GeoJSON File for Preview",
+                                    preview=True,
+                                )
                         elif path.endswith("tiff"):
-                            add_resource(path, "GeoTIFF File")
+                            add_geotiff_resource(zippath, member, path)
                         elif path.endswith("gpkg"):
-                            add_resource(path, "Geopackage File")
+                            add_resource(path, "Geopackage File", member=member)
                         else:
-                            add_resource(path, "Metadata File")
+                            add_resource(path, "Metadata File", member=member)
+                    zipinfo = zipinfos.get("json")
+                    if zipinfo:
+                        # GDAL reads the member without extracting it
+                        stem = splitext(basename(zipinfo.filename))[0]
+                        add_columnar_resources(
+                            f"/vsizip/{zippath}/{zipinfo.filename}",
+                            join(event_folder, stem),
+                        )
             except DownloadError as ex:
                 logger.exception(ex)
                 success = False
@@ -254,13 +633,23 @@ class ADAM:
                 logger.error(f"{title} has no data files for dataset!")
                 return None, None
             if shape_url:
-                success = add_resource_with_url(shape_url, "Shape File")
+                path = add_resource_with_url(shape_url, "Shape File")
+                success = path is not None
+                if path:
+                    stem = splitext(basename(path))[0]
+                    add_columnar_resources(f"/vsizip/{path}", join(self.folder, stem))
                 tags.append("geodata")
 
+            summarised = False
             if url:
-                success = add_resource_with_url(url, "Population Estimation")
+                path = add_resource_with_url(url, "Population Estimation")
+                success = path is not None
+                if path and path.endswith(".csv"):
+                    summarised = add_population_summary(path)
                 tags.append("affected population")
-            dataset.preview_off()
+            if not summarised:
+                # Otherwise summary is previewed so it can be shown in QuickCharts
+                dataset.preview_off()
         if not success:
             return None, None
         dataset.add_tags(tags)